@@ -0,0 +1,271 @@
+// Site override of the theme's search: queries the sharded index written by
+// search_index.py under /search/ instead of downloading index.json whole.
+// Without the shards it falls back to the theme's Fuse search over index.json.
+var manifest;
+var fuse;
+var shards = {};
+var showButton = document.getElementById("search-button");
+var showButtonMobile = document.getElementById("search-button-mobile");
+var hideButton = document.getElementById("close-search-button");
+var wrapper = document.getElementById("search-wrapper");
+var modal = document.getElementById("search-modal");
+var input = document.getElementById("search-query");
+var output = document.getElementById("search-results");
+var first = output.firstChild;
+var last = output.lastChild;
+var searchVisible = false;
+var indexed = false;
+var hasResults = false;
+
+// Listen for events
+showButton? showButton.addEventListener("click", displaySearch) : null;
+showButtonMobile? showButtonMobile.addEventListener("click", displaySearch) : null;
+hideButton.addEventListener("click", hideSearch);
+wrapper.addEventListener("click", hideSearch);
+modal.addEventListener("click", function (event) {
+  event.stopPropagation();
+  event.stopImmediatePropagation();
+  return false;
+});
+document.addEventListener("keydown", function (event) {
+  // Forward slash to open search wrapper
+  if (event.key == "/") {
+    if (!searchVisible) {
+      event.preventDefault();
+      displaySearch();
+    }
+  }
+
+  // Esc to close search wrapper
+  if (event.key == "Escape") {
+    hideSearch();
+  }
+
+  // Down arrow to move down results list
+  if (event.key == "ArrowDown") {
+    if (searchVisible && hasResults) {
+      event.preventDefault();
+      if (document.activeElement == input) {
+        first.focus();
+      } else if (document.activeElement == last) {
+        last.focus();
+      } else {
+        document.activeElement.parentElement.nextSibling.firstElementChild.focus();
+      }
+    }
+  }
+
+  // Up arrow to move up results list
+  if (event.key == "ArrowUp") {
+    if (searchVisible && hasResults) {
+      event.preventDefault();
+      if (document.activeElement == input) {
+        input.focus();
+      } else if (document.activeElement == first) {
+        input.focus();
+      } else {
+        document.activeElement.parentElement.previousSibling.firstElementChild.focus();
+      }
+    }
+  }
+
+  // Enter to get to results
+  if (event.key == "Enter") {
+    if (searchVisible && hasResults) {
+      event.preventDefault();
+      if (document.activeElement == input) {
+        first.focus();
+      } else {
+        document.activeElement.click();
+      }
+    }
+  }
+
+});
+
+// Update search on each keypress
+input.onkeyup = function (event) {
+  executeQuery(this.value);
+};
+
+function displaySearch() {
+  if (!indexed) {
+    buildIndex();
+  }
+  if (!searchVisible) {
+    document.body.style.overflow = "hidden";
+    wrapper.style.visibility = "visible";
+    input.focus();
+    searchVisible = true;
+  }
+}
+
+function hideSearch() {
+  if (searchVisible) {
+    document.body.style.overflow = "visible";
+    wrapper.style.visibility = "hidden";
+    input.value = "";
+    output.innerHTML = "";
+    document.activeElement.blur();
+    searchVisible = false;
+  }
+}
+
+function fetchJSON(path, callback, fallback) {
+  var httpRequest = new XMLHttpRequest();
+  httpRequest.onreadystatechange = function () {
+    if (httpRequest.readyState === 4) {
+      if (httpRequest.status === 200) {
+        var data = JSON.parse(httpRequest.responseText);
+        if (callback) callback(data);
+      } else if (fallback) {
+        fallback();
+      }
+    }
+  };
+  httpRequest.open("GET", path);
+  httpRequest.send();
+}
+
+function searchURL(path) {
+  var baseURL = wrapper.getAttribute("data-url");
+  return baseURL.replace(/\/?$/, '/') + "search/" + path;
+}
+
+function buildIndex() {
+  fetchJSON(searchURL("manifest.json"), function (data) {
+    manifest = data;
+    indexed = true;
+    executeQuery(input.value);
+  }, buildFuseIndex);
+}
+
+// The theme's search, for a site built without static/search
+function buildFuseIndex() {
+  var baseURL = wrapper.getAttribute("data-url");
+  fetchJSON(baseURL.replace(/\/?$/, '/') + "index.json", function (data) {
+    fuse = new Fuse(data, {
+      shouldSort: true,
+      ignoreLocation: true,
+      threshold: 0.0,
+      includeMatches: true,
+      keys: [
+        { name: "title", weight: 0.8 },
+        { name: "section", weight: 0.2 },
+        { name: "summary", weight: 0.6 },
+        { name: "content", weight: 0.4 },
+      ],
+    });
+    indexed = true;
+    executeQuery(input.value);
+  });
+}
+
+// Fetch the shards for every word of the query, then call back once all arrived
+function loadShards(words, callback) {
+  var pending = 1;
+  function done() {
+    if (--pending == 0) callback();
+  }
+  words.forEach(function (word) {
+    var key = word.slice(0, manifest.prefix);
+    if (!(key in manifest.shards) || key in shards) return;
+    shards[key] = null;
+    pending++;
+    fetchJSON(searchURL(key + ".json?v=" + manifest.shards[key]), function (data) {
+      shards[key] = data;
+      done();
+    }, done);
+  });
+  done();
+}
+
+// Posts containing every word (the last one as a prefix, for type-ahead), best match first
+function search(words) {
+  var scores = null;
+  var docs = {};
+  words.forEach(function (word, position) {
+    var shard = shards[word.slice(0, manifest.prefix)];
+    var matches = {};
+    if (shard) {
+      for (var token in shard.terms) {
+        if (token == word || (position == words.length - 1 && token.startsWith(word))) {
+          for (var name in shard.terms[token]) {
+            matches[name] = (matches[name] || 0) + shard.terms[token][name];
+            docs[name] = shard.docs[name];
+          }
+        }
+      }
+    }
+    if (scores === null) {
+      scores = matches;
+    } else {
+      for (var name in scores) {
+        if (name in matches) scores[name] += matches[name];
+        else delete scores[name];
+      }
+    }
+  });
+  return Object.keys(scores || {})
+    .sort(function (a, b) { return scores[b] - scores[a]; })
+    .map(function (name) {
+      var doc = docs[name];
+      return { item: { title: doc[0], permalink: doc[1], date: doc[2], section: "Posts", summary: "" } };
+    });
+}
+
+function executeQuery(term) {
+  if (!indexed) return;
+  if (fuse) {
+    showResults(fuse.search(term));
+    return;
+  }
+  // Same tokens as search_index.py: two or more word characters, not all digits
+  var words = (term.toLowerCase().match(/[\p{L}\p{N}_]{2,}/gu) || []).filter(function (word) {
+    return !/^\d+$/.test(word);
+  });
+  loadShards(words, function () {
+    if (input.value == term) showResults(words.length ? search(words) : []);
+  });
+}
+
+function showResults(results) {
+  let resultsHTML = "";
+
+  if (results.length > 0) {
+    results.forEach(function (value, key) {
+      var html = value.item.summary;
+      var div = document.createElement("div");
+      div.innerHTML = html;
+      value.item.summary = div.textContent || div.innerText || "";
+      var title = value.item.externalUrl?  value.item.title + '<span class="text-xs ml-2 align-center cursor-default text-neutral-400 dark:text-neutral-500">'+value.item.externalUrl+'</span>' : value.item.title;
+      var linkconfig = value.item.externalUrl? 'target="_blank" rel="noopener" href="'+value.item.externalUrl+'"' : 'href="'+value.item.permalink+'"';
+      resultsHTML =
+        resultsHTML +
+        `<li class="mb-2">
+          <a class="flex items-center px-3 py-2 rounded-md appearance-none bg-neutral-100 dark:bg-neutral-700 focus:bg-primary-100 hover:bg-primary-100 dark:hover:bg-primary-900 dark:focus:bg-primary-900 focus:outline-dotted focus:outline-transparent focus:outline-2" 
+          ${linkconfig} tabindex="0">
+            <div class="grow">
+              <div class="-mb-1 text-lg font-bold">
+                ${title}
+              </div>
+              <div class="text-sm text-neutral-500 dark:text-neutral-400">${value.item.section}<span class="px-2 text-primary-500">&middot;</span>${value.item.date? value.item.date : ""}</span></div>
+              <div class="text-sm italic">${value.item.summary}</div>
+            </div>
+            <div class="ml-2 ltr:block rtl:hidden text-neutral-500">&rarr;</div>
+            <div class="mr-2 ltr:hidden rtl:block text-neutral-500">&larr;</div>
+          </a>
+        </li>`;
+    });
+    hasResults = true;
+  } else {
+    resultsHTML = "";
+    hasResults = false;
+  }
+
+  output.innerHTML = resultsHTML;
+  if (results.length > 0) {
+    first = output.firstChild.firstElementChild;
+    last = output.lastChild.firstElementChild;
+  }
+}
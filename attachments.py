@@ -0,0 +1,130 @@
+"""
+Vault-wide attachment index.
+
+Obsidian stores attachments anywhere in the vault and links them by bare
+file name, so embeds are resolved through a basename -> path dict built
+from one os.scandir walk of the vault. The walk is cached on disk next to
+~/.markdown_processor_config.json; on later runs only directories whose
+mtime changed (a file was added, removed or renamed in them) are rescanned.
+"""
+import json
+import os
+
+from wikilinks import ATTACHMENT_EXTENSIONS
+
+cache_file = os.path.join(os.path.expanduser('~'), '.markdown_processor_attachments.json')
+
+SKIPPED_DIRS = {".obsidian", ".trash", ".git"}
+
+
+class AttachmentIndex:
+    def __init__(self, vault: str, cache_path: str = cache_file):
+        self.vault = os.path.abspath(vault)
+        self.cache_path = cache_path
+        # vault-relative dir -> {"mtime_ns", "files", "subdirs"}
+        self.dirs = {}
+        self.by_name = {}
+        self.by_path = set()
+
+    @classmethod
+    def load(cls, vault: str, cache_path: str = cache_file) -> "AttachmentIndex":
+        """Load the cached scan of the vault and bring it up to date"""
+        index = cls(vault, cache_path)
+        if os.path.exists(cache_path):
+            try:
+                with open(cache_path, "r") as file:
+                    index.dirs = json.load(file).get(index.vault, {})
+            except (json.JSONDecodeError, OSError):
+                index.dirs = {}
+        if index.refresh():
+            index.save()
+        return index
+
+    def save(self):
+        data = {}
+        if os.path.exists(self.cache_path):
+            try:
+                with open(self.cache_path, "r") as file:
+                    data = json.load(file)
+            except (json.JSONDecodeError, OSError):
+                data = {}
+        data[self.vault] = self.dirs
+        tmp_path = self.cache_path + ".tmp"
+        with open(tmp_path, "w") as file:
+            json.dump(data, file)
+        os.replace(tmp_path, self.cache_path)
+
+    def refresh(self) -> bool:
+        """Rescan directories whose mtime changed. Returns True if anything did."""
+        changed = False
+        pending = ["."]
+        seen = set()
+        while pending:
+            rel_dir = pending.pop()
+            seen.add(rel_dir)
+            abs_dir = os.path.join(self.vault, rel_dir)
+            try:
+                mtime_ns = os.stat(abs_dir).st_mtime_ns
+            except FileNotFoundError:
+                continue
+            entry = self.dirs.get(rel_dir)
+            if entry is None or entry["mtime_ns"] != mtime_ns:
+                entry = self._scan_dir(abs_dir, mtime_ns)
+                self.dirs[rel_dir] = entry
+                changed = True
+            pending.extend(os.path.normpath(os.path.join(rel_dir, d)) for d in entry["subdirs"])
+
+        for rel_dir in set(self.dirs) - seen:
+            del self.dirs[rel_dir]
+            changed = True
+
+        self._build_lookup()
+        return changed
+
+    @staticmethod
+    def _scan_dir(abs_dir: str, mtime_ns: int) -> dict:
+        files = []
+        subdirs = []
+        with os.scandir(abs_dir) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.name not in SKIPPED_DIRS and not entry.name.startswith("."):
+                        subdirs.append(entry.name)
+                elif entry.name.lower().endswith(ATTACHMENT_EXTENSIONS):
+                    files.append(entry.name)
+        return {"mtime_ns": mtime_ns, "files": sorted(files), "subdirs": sorted(subdirs)}
+
+    def _build_lookup(self):
+        self.by_name = {}
+        self.by_path = set()
+        for rel_dir in sorted(self.dirs, key=lambda d: (d.count(os.sep), d)):
+            for name in self.dirs[rel_dir]["files"]:
+                rel_path = os.path.normpath(os.path.join(rel_dir, name))
+                self.by_path.add(rel_path)
+                # Shallowest match wins, like Obsidian's shortest-path links
+                self.by_name.setdefault(name.lower(), []).append(rel_path)
+
+    def resolve(self, link: str, note_dir: str | None = None) -> str | None:
+        """
+        Return the absolute path an attachment link points at, or None.
+
+        Vault-relative links ("assets/a.png") match exactly; bare names
+        prefer a file next to the note, then the shallowest one in the vault.
+        """
+        rel_link = os.path.normpath(link.replace("/", os.sep))
+        if rel_link in self.by_path:
+            return os.path.join(self.vault, rel_link)
+        candidates = self.by_name.get(os.path.basename(rel_link).lower())
+        if not candidates:
+            return None
+        if note_dir is not None:
+            rel_note_dir = os.path.relpath(os.path.abspath(note_dir), self.vault)
+            for rel_path in candidates:
+                if os.path.dirname(rel_path) == os.path.normpath(rel_note_dir):
+                    return os.path.join(self.vault, rel_path)
+        return os.path.join(self.vault, candidates[0])
+
+    def __getstate__(self):
+        # Workers only need the lookup tables, not the per-directory scan
+        return {"vault": self.vault, "cache_path": self.cache_path, "dirs": {},
+                "by_name": self.by_name, "by_path": self.by_path}
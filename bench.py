@@ -0,0 +1,849 @@
+"""
+Micro-benchmarks for the importer hot paths.
+
+    python bench.py rewrite [--paragraphs N] [--links M]
+    python bench.py copy [--files N] [--size KIB]
+    python bench.py posts [--posts N]
+    python bench.py publish [--posts N] [--changed K]
+    python bench.py render [--posts N]
+    python bench.py search [--posts N]
+    python bench.py related [--posts N]
+    python bench.py minify [--pages N] [--workers W]
+    python bench.py pipeline [--notes N] [--images M] [--json OUT] [--compare BASELINE]
+    python bench.py startup [--runs N]
+    python bench.py links [--notes N]
+    python bench.py catalog [--notes N]
+    python bench.py daemon [--notes N] [--runs N]
+    python bench.py media [--notes N] [--images M]
+
+`pipeline` times every stage from vault to gh-pages on a synthetic vault
+and can write the timings and deploy sizes as JSON; --compare fails when
+a stage got slower than a saved run by more than --tolerance.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from attachments import AttachmentIndex
+from catalog import Catalog
+import daemon
+import engine
+from engine import note_slug, resolve_attachment, resolve_site_structure, write_bundle
+from fastcopy import copy_file
+from images import ImageOptions, encode_variant, plan_variants
+from mala import GitDeployer
+from link_graph import LinkGraph
+from media import MEDIA_DIR, MediaStore
+from minify import Minifier, format_report
+from post_index import PostIndex
+from publish import BACKENDS, NothingToPublish, publish
+from related import RelatedIndex, RelatedPosts
+from render import Renderer
+from search_index import SearchIndex, shard_key
+from virtual_list import PrefixIndex
+from wikilinks import rewrite_links
+
+
+def synthetic_note(paragraphs: int, links: int, seed: int = 0) -> str:
+    """A large note with `links` image and note wikilinks spread through it"""
+    rng = random.Random(seed)
+    words = ["obsidian", "hugo", "vault", "blog", "image", "post", "markdown", "theme"]
+    blocks = [" ".join(rng.choice(words) for _ in range(60)) for _ in range(paragraphs)]
+    for i in range(links):
+        kind = i % 4
+        if kind == 0:
+            link = f"[[Pasted image {i}.png]]"
+        elif kind == 1:
+            link = f"![[photo {i}.jpg|400]]"
+        elif kind == 2:
+            link = f"[[Note {i}#Heading|alias]]"
+        else:
+            link = f"![[diagram {i}.png]]"
+        blocks[rng.randrange(paragraphs)] += " " + link
+    return "\n\n".join(blocks)
+
+
+def legacy_rewrite(content: str) -> str:
+    """The original process_files() loop: one full str.replace per image"""
+    images = re.findall(r'\[\[([^]]*\.png)\]\]', content)
+    for image in images:
+        encoded_image = image.replace(' ', '%20')
+        markdown_image = f"![Image Description]({encoded_image})"
+        content = content.replace(f"[[{image}]]", markdown_image)
+    return content
+
+
+def timeit(func, *args, repeat: int = 5) -> float:
+    """Best wall-clock time of `repeat` runs, in seconds"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def bench_rewrite(paragraphs: int, links: int):
+    note = synthetic_note(paragraphs, links)
+    legacy = timeit(legacy_rewrite, note)
+    single_pass = timeit(rewrite_links, note)
+    print(f"note: {len(note) / 1024:.0f} KiB, {links} links")
+    print(f"  legacy findall + str.replace: {legacy * 1000:8.2f} ms")
+    print(f"  single-pass rewriter:         {single_pass * 1000:8.2f} ms")
+
+
+def bench_copy(files: int, size_kib: int):
+    with tempfile.TemporaryDirectory(dir=os.getcwd()) as tmp:
+        source_dir = os.path.join(tmp, "vault")
+        os.makedirs(source_dir)
+        sources = []
+        for i in range(files):
+            path = os.path.join(source_dir, f"image {i}.png")
+            with open(path, "wb") as file:
+                file.write(os.urandom(size_kib * 1024))
+            sources.append(path)
+
+        def copy_all(target_dir, copy):
+            os.makedirs(target_dir, exist_ok=True)
+            methods = {}
+            for path in sources:
+                method = copy(path, os.path.join(target_dir, os.path.basename(path)))
+                methods[method] = methods.get(method, 0) + 1
+            return methods
+
+        def timed(label, target_dir, copy):
+            start = time.perf_counter()
+            methods = copy_all(target_dir, copy)
+            elapsed = time.perf_counter() - start
+            used = ", ".join(f"{method or 'skipped'}: {count}" for method, count in methods.items())
+            print(f"  {label:<28}{elapsed * 1000:8.2f} ms  ({used})")
+
+        print(f"{files} files x {size_kib} KiB")
+        timed("shutil.copy", os.path.join(tmp, "shutil"), lambda s, t: shutil.copy(s, t) and "shutil")
+        timed("fastcopy", os.path.join(tmp, "fast"), copy_file)
+        timed("fastcopy, unchanged rerun", os.path.join(tmp, "fast"), copy_file)
+        timed("fastcopy --hardlink", os.path.join(tmp, "linked"),
+              lambda s, t: copy_file(s, t, hardlink=True))
+
+
+def bench_posts(count: int):
+    with tempfile.TemporaryDirectory(dir=os.getcwd()) as tmp:
+        posts_dir = os.path.join(tmp, "posts")
+        for i in range(count):
+            post_dir = os.path.join(posts_dir, f"post-{i}")
+            os.makedirs(post_dir)
+            with open(os.path.join(post_dir, "index.md"), "w", encoding="utf-8") as file:
+                file.write(f"---\ntitle: Synthetic post {i}\ndate: 2024-{i % 12 + 1:02d}-01\n"
+                           f"draft: {'true' if i % 9 == 0 else 'false'}\ntags: [tag{i % 20}]\n---\nBody\n")
+        cache_path = os.path.join(tmp, "posts.json")
+
+        start = time.perf_counter()
+        PostIndex.load(posts_dir, cache_path)
+        cold = time.perf_counter() - start
+        start = time.perf_counter()
+        index = PostIndex.load(posts_dir, cache_path)
+        warm = time.perf_counter() - start
+        posts = index.query()
+
+        start = time.perf_counter()
+        search = PrefixIndex(posts, lambda post: (post["title"], post["name"].replace("-", " ")))
+        build = time.perf_counter() - start
+        lookup = timeit(search.find, "synth 12")
+
+        print(f"{count} posts")
+        print(f"  cold index load:     {cold * 1000:8.2f} ms")
+        print(f"  warm index load:     {warm * 1000:8.2f} ms")
+        print(f"  prefix index build:  {build * 1000:8.2f} ms")
+        print(f"  type-ahead lookup:   {lookup * 1000:8.2f} ms")
+
+
+def git(*args, cwd=None) -> str:
+    return subprocess.run(["git", *args], cwd=cwd, check=True, capture_output=True, text=True).stdout
+
+
+def make_site(tmp: str, posts: int) -> tuple[str, str]:
+    """A site clone with `posts` bundles and a built public/ tree, pushed to a local bare remote"""
+    remote = os.path.join(tmp, "remote.git")
+    site = os.path.join(tmp, "site")
+    git("init", "-q", "--bare", "-b", "master", remote)
+    git("clone", "-q", remote, site)
+    git("config", "user.name", "bench", cwd=site)
+    git("config", "user.email", "bench@example.com", cwd=site)
+    for i in range(posts):
+        for folder in ("content/posts", "public/posts"):
+            post_dir = os.path.join(site, folder, f"post-{i}")
+            os.makedirs(post_dir)
+            with open(os.path.join(post_dir, "index.md" if folder == "content/posts" else "index.html"), "w") as file:
+                file.write(f"---\ntitle: Post {i}\n---\n" + "text " * 200)
+    git("add", ".", cwd=site)
+    git("commit", "-q", "-m", "initial", cwd=site)
+    git("push", "-q", "-u", "origin", "master", cwd=site)
+    return remote, site
+
+
+def touch_posts(site: str, changed: int, round_: int) -> list[str]:
+    written = []
+    for i in range(changed):
+        path = os.path.join(site, "content", "posts", f"post-{i}", "index.md")
+        with open(path, "a") as file:
+            file.write(f"edit {round_}\n")
+        written.append(path)
+    return written
+
+
+def bench_publish(posts: int, changed: int):
+    with tempfile.TemporaryDirectory(dir=os.getcwd()) as tmp:
+        _, site = make_site(tmp, posts)
+
+        def legacy():
+            for cmd in (["add", "."], ["commit", "-q", "-m", "update"], ["pull", "-q"],
+                        ["push", "-q", "-u", "origin", "master"]):
+                git(*cmd, cwd=site)
+
+        def timed(label, func):
+            start = time.perf_counter()
+            func()
+            print(f"  {label:<34}{(time.perf_counter() - start) * 1000:8.2f} ms")
+
+        print(f"{posts} posts, {changed} changed per publish")
+        touch_posts(site, changed, 0)
+        timed("add . / commit / pull / push", legacy)
+
+        available = ["git"]
+        for name, backend in BACKENDS.items():
+            try:
+                backend(site)
+                available.append(name)
+            except ImportError:
+                pass
+        for round_, backend in enumerate(available, 1):
+            written = touch_posts(site, changed, round_)
+            timed(f"publish ({backend})", lambda: publish(site, written, "update", backend=backend))
+
+        def nothing():
+            try:
+                publish(site, [], "update")
+            except NothingToPublish:
+                pass
+        timed("publish, nothing changed", nothing)
+
+
+def bench_render(count: int):
+    """Full public/ rebuild against patching it for one new post, on a synthetic site"""
+    repo = os.path.dirname(os.path.abspath(__file__))
+    with tempfile.TemporaryDirectory(dir=os.getcwd()) as tmp:
+        site = os.path.join(tmp, "site")
+        shutil.copytree(os.path.join(repo, "config"), os.path.join(site, "config"))
+        shutil.copytree(os.path.join(repo, "public"), os.path.join(site, "public"))
+        posts_dir = os.path.join(site, "content", "posts")
+        for i in range(count):
+            os.makedirs(os.path.join(posts_dir, f"post-{i}"))
+            with open(os.path.join(posts_dir, f"post-{i}", "index.md"), "w", encoding="utf-8") as file:
+                file.write(f"---\ntitle: Synthetic post {i}\ndate: 2024-{i % 12 + 1:02d}-{i % 28 + 1:02d}\n"
+                           f"tags: [tag{i % 50}, blog]\n---\n" + synthetic_note(5, 0, seed=i))
+        cache_path = os.path.join(tmp, "render.json")
+
+        def timed(label, everything=False):
+            start = time.perf_counter()
+            changed = Renderer(site, cache_path).render(everything)
+            print(f"  {label:<34}{(time.perf_counter() - start) * 1000:9.2f} ms  ({len(changed)} files written)")
+
+        print(f"{count} posts")
+        timed("full render, cold cache", everything=True)
+        timed("full render, warm cache", everything=True)
+        timed("no changes")
+        os.makedirs(os.path.join(posts_dir, "new-post"))
+        with open(os.path.join(posts_dir, "new-post", "index.md"), "w", encoding="utf-8") as file:
+            file.write("---\ntitle: New post\ndate: 2024-12-31\ntags: [tag1]\n---\n" + synthetic_note(5, 0))
+        timed("one new post")
+
+        if shutil.which("hugo"):
+            start = time.perf_counter()
+            subprocess.run(["hugo", "--quiet", "--source", site, "--themesDir", os.path.join(repo, "themes"),
+                            "--destination", os.path.join(tmp, "hugo-public")], check=True)
+            print(f"  {'hugo full build':<34}{(time.perf_counter() - start) * 1000:9.2f} ms")
+
+
+def bench_search(count: int):
+    """Sharded search index: full build, one-post update and what a query downloads"""
+    with tempfile.TemporaryDirectory(dir=os.getcwd()) as tmp:
+        site = os.path.join(tmp, "site")
+        posts_dir = os.path.join(site, "content", "posts")
+        full_text = []
+        for i in range(count):
+            os.makedirs(os.path.join(posts_dir, f"post-{i}"))
+            body = synthetic_note(5, 0, seed=i) + f" unique{i}"
+            full_text.append({"title": f"Synthetic post {i}", "permalink": f"/posts/post-{i}/", "content": body})
+            with open(os.path.join(posts_dir, f"post-{i}", "index.md"), "w", encoding="utf-8") as file:
+                file.write(f"---\ntitle: Synthetic post {i}\ndate: 2024-01-01\n---\n{body}")
+        cache_path = os.path.join(tmp, "search.json")
+
+        def timed(label):
+            start = time.perf_counter()
+            changed = SearchIndex.load(site, cache_path).update()
+            print(f"  {label:<30}{(time.perf_counter() - start) * 1000:9.2f} ms  ({len(changed)} files written)")
+
+        print(f"{count} posts")
+        timed("full build")
+        timed("no changes")
+        with open(os.path.join(posts_dir, "post-7", "index.md"), "a", encoding="utf-8") as file:
+            file.write("\nA freshly edited paragraph about zebras.\n")
+        timed("one post edited")
+
+        shard_dir = os.path.join(site, "static", "search")
+        sizes = {name: os.path.getsize(os.path.join(shard_dir, name)) for name in os.listdir(shard_dir)}
+        query = [shard_key("obsidian"), shard_key("zebras")]
+        downloaded = sizes["manifest.json"] + sum(sizes[f"{key}.json"] for key in query)
+        print(f"  index.json with full text:    {len(json.dumps(full_text)) / 1024:9.0f} KiB")
+        print(f"  all shards:                   {sum(sizes.values()) / 1024:9.0f} KiB in {len(sizes)} files")
+        print(f"  query 'obsidian zebras':      {downloaded / 1024:9.0f} KiB")
+
+
+def bench_links(count: int):
+    """Note link graph: re-parsing every note against an incremental refresh"""
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory(dir=os.getcwd()) as tmp:
+        vault = os.path.join(tmp, "vault")
+        for i in range(count):
+            folder = os.path.join(vault, f"area {i % 20}")
+            os.makedirs(folder, exist_ok=True)
+            links = " ".join(f"[[Note {rng.randrange(count)}]]" for _ in range(5))
+            with open(os.path.join(folder, f"Note {i}.md"), "w", encoding="utf-8") as file:
+                file.write(f"---\ntitle: Note {i}\n---\n{synthetic_note(10, 0, i)}\n{links}\n")
+        cache_path = os.path.join(tmp, "links.json")
+        edited = os.path.join(vault, "area 7", "Note 7.md")
+
+        full = timeit(lambda: LinkGraph(vault, cache_path).refresh(), repeat=3)
+        LinkGraph.load(vault, cache_path)
+        unchanged = timeit(lambda: LinkGraph.load(vault, cache_path, refresh=False).refresh(), repeat=3)
+        graph = LinkGraph.load(vault, cache_path, refresh=False)
+        with open(edited, "a", encoding="utf-8") as file:
+            file.write("\n[[Note 1]]\n")
+        start = time.perf_counter()
+        changes = graph.refresh()
+        affected = graph.affected(changes)
+        one_edit = time.perf_counter() - start
+        watched = timeit(lambda: graph.refresh([edited]), repeat=3)
+        print(f"{count} notes")
+        print(f"  {'parse every note':<30}{full * 1000:9.2f} ms")
+        print(f"  {'refresh, nothing changed':<30}{unchanged * 1000:9.2f} ms")
+        print(f"  {'refresh, one note edited':<30}{one_edit * 1000:9.2f} ms  ({len(affected)} notes to rebuild)")
+        print(f"  {'refresh of watched paths':<30}{watched * 1000:9.2f} ms")
+
+
+def bench_catalog(count: int):
+    """Vault catalog: refreshes and queries against reading every note to search it"""
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory(dir=os.getcwd()) as tmp:
+        vault = os.path.join(tmp, "vault")
+        for i in range(count):
+            folder = os.path.join(vault, f"area {i % 50}")
+            os.makedirs(folder, exist_ok=True)
+            publish = "" if i % 4 else "publish: false\n"
+            with open(os.path.join(folder, f"Note {i}.md"), "w", encoding="utf-8") as file:
+                file.write(f"---\ntitle: Note {i}\ntags: [tag{rng.randrange(100)}]\n{publish}---\n"
+                           f"{synthetic_note(4, 0, i)}\n")
+        catalog = Catalog(os.path.join(tmp, "catalog.db"))
+        edited = os.path.join(vault, "area 7", "Note 7.md")
+
+        def scan_search():
+            found = []
+            for dirpath, _, filenames in os.walk(vault):
+                for filename in filenames:
+                    with open(os.path.join(dirpath, filename), "r", encoding="utf-8") as file:
+                        if "obsidian" in file.read().lower():
+                            found.append(filename)
+            return found
+
+        def edit():
+            with open(edited, "a", encoding="utf-8") as file:
+                file.write("\nzeppelin\n")
+            catalog.refresh(vault)
+
+        print(f"{count} notes")
+        rows = [
+            ("read every note to search", timeit(scan_search, repeat=1)),
+            ("first refresh", timeit(catalog.refresh, vault, repeat=1)),
+            ("refresh, nothing changed", timeit(catalog.refresh, vault, repeat=3)),
+            ("refresh, one note edited", timeit(edit, repeat=3)),
+            ("search, every note matches", timeit(catalog.query, vault, "hugo theme", repeat=20)),
+            ("search, one note matches", timeit(catalog.query, vault, "zepp", repeat=20)),
+            ("tag filter", timeit(lambda: catalog.query(vault, tag="tag42"), repeat=20)),
+            ("publishable, changed since", timeit(lambda: catalog.query(vault, publishable=True,
+                                                                         changed_since=time.time() - 60), repeat=20)),
+        ]
+        for label, seconds in rows:
+            print(f"  {label:<30}{seconds * 1000:9.2f} ms")
+        catalog.close()
+
+
+def bench_related(count: int):
+    """Related posts: all-pairs scoring like Hugo against the inverted index, full and incremental"""
+    rng = random.Random(0)
+    tags = [f"tag{i}" for i in range(200)]
+    with tempfile.TemporaryDirectory(dir=os.getcwd()) as tmp:
+        site = os.path.join(tmp, "site")
+        posts_dir = os.path.join(site, "content", "posts")
+        os.makedirs(posts_dir)
+        shutil.copy(os.path.join(os.path.dirname(os.path.abspath(__file__)), "hugo.toml"), site)
+        for i in range(count):
+            os.makedirs(os.path.join(posts_dir, f"post-{i}"))
+            with open(os.path.join(posts_dir, f"post-{i}", "index.md"), "w", encoding="utf-8") as file:
+                file.write(f"---\ntitle: Synthetic post {i}\ndate: {2020 + i % 5}-{1 + i % 12:02d}-{1 + i % 28:02d}\n"
+                           f"tags: [{', '.join(rng.sample(tags, 3))}]\ncategories: [cat{rng.randrange(10)}]\n---\n"
+                           f"## Section {i % 7}\n\nBody\n")
+        cache_path = os.path.join(tmp, "related.json")
+
+        def timed(label, everything=False):
+            start = time.perf_counter()
+            changed = RelatedPosts(site, cache_path=cache_path).update(everything)
+            print(f"  {label:<30}{(time.perf_counter() - start) * 1000:9.2f} ms  ({len(changed)} files written)")
+
+        print(f"{count} posts")
+        related = RelatedPosts(site, cache_path=cache_path)
+        index = RelatedIndex.load(related.posts_dir, cache_path)
+        related.build(index.posts)
+        sample = related.order[:50]
+        start = time.perf_counter()
+        for post in sample:
+            for other in related.order:
+                sum(spec["weight"] * len(related.keywords(post, spec, False) & related.keywords(other, spec, True))
+                    for spec in related.indices)
+        all_pairs = (time.perf_counter() - start) / len(sample) * len(related.order)
+        print(f"  {'all pairs (extrapolated)':<30}{all_pairs * 1000:9.2f} ms")
+        os.remove(cache_path)
+
+        timed("full precompute")
+        timed("no changes")
+        with open(os.path.join(posts_dir, "post-7", "index.md"), "w", encoding="utf-8") as file:
+            file.write("---\ntitle: Synthetic post 7\ndate: 2022-08-08\ntags: [tag1, tag2]\n---\nBody\n")
+        timed("one post retagged")
+        output_dir = os.path.join(site, "data", "related")
+        incremental = {name: open(os.path.join(output_dir, name), "rb").read() for name in os.listdir(output_dir)}
+        timed("full rescore", everything=True)
+        full = {name: open(os.path.join(output_dir, name), "rb").read() for name in os.listdir(output_dir)}
+        print(f"  incremental matches full:     {incremental == full}")
+
+
+def bench_minify(pages: int, workers: int | None):
+    """Minify and precompress a public/ of copies of the real pages: cold, warm and after one Hugo rewrite"""
+    source = os.path.join(os.path.dirname(os.path.abspath(__file__)), "public")
+    with tempfile.TemporaryDirectory(dir=os.getcwd()) as tmp:
+        public = os.path.join(tmp, "public")
+        shutil.copytree(source, public)
+        with open(os.path.join(source, "index.html"), "r", encoding="utf-8") as file:
+            page = file.read()
+        for i in range(pages):
+            os.makedirs(os.path.join(public, "posts", f"post-{i}"))
+            with open(os.path.join(public, "posts", f"post-{i}", "index.html"), "w", encoding="utf-8") as file:
+                file.write(page.replace("</main>", f"<p>Synthetic post {i}</p></main>"))
+        cache_path = os.path.join(tmp, "minify.json")
+
+        def timed(label, count=None):
+            start = time.perf_counter()
+            changed, report = Minifier.load(public, cache_path).run(count)
+            print(f"  {label:<30}{(time.perf_counter() - start) * 1000:9.2f} ms  ({len(changed)} files written)")
+            return report
+
+        print(f"{pages} extra pages, {workers or os.cpu_count()} workers")
+        backup = os.path.join(tmp, "backup")
+        shutil.copytree(public, backup)
+        timed("cold, 1 worker", 1)
+        shutil.rmtree(public)
+        os.replace(backup, public)
+        os.remove(cache_path)
+        report = timed("cold, process pool", workers)
+        timed("no changes", workers)
+        # Hugo rewriting a page resets its mtime and content
+        with open(os.path.join(public, "posts", "post-7", "index.html"), "w", encoding="utf-8") as file:
+            file.write(page)
+        timed("one page rebuilt", workers)
+        print(format_report(report))
+
+
+# What each entry point imports before it can do anything (Tk itself excluded)
+STARTUP_IMPORTS = {
+    "python": "pass",
+    "engine": "import engine",
+    "obby.py modules": "import engine, post_index, tracing, virtual_list",
+    "blog_obsidian.py": "import blog_obsidian",
+    "watch.py": "import watch",
+    "mala.py": "import mala",
+}
+
+
+def bench_startup(runs: int):
+    """Fresh-interpreter import time of each entry point, and the imports that dominate it"""
+    here = os.path.dirname(os.path.abspath(__file__))
+    for label, statement in STARTUP_IMPORTS.items():
+        best = float("inf")
+        for _ in range(runs):
+            start = time.perf_counter()
+            subprocess.run([sys.executable, "-c", statement], cwd=here, check=True)
+            best = min(best, time.perf_counter() - start)
+        print(f"  {label:<28}{best * 1000:8.1f} ms")
+
+    # -X importtime lines: "import time: self | cumulative | name"
+    report = subprocess.run([sys.executable, "-X", "importtime", "-c", STARTUP_IMPORTS["obby.py modules"]],
+                            cwd=here, check=True, capture_output=True, text=True).stderr
+    rows = []
+    for line in report.splitlines()[1:]:
+        _, self_us, _, name = re.split(r"[:|]", line, maxsplit=3)
+        rows.append((int(self_us), name.strip()))
+    print("  slowest imports of the obby.py modules (self time):")
+    for self_us, name in sorted(rows, reverse=True)[:8]:
+        print(f"    {name:<34}{self_us / 1000:6.1f} ms")
+
+    with tempfile.TemporaryDirectory(dir=os.getcwd()) as tmp:
+        os.makedirs(os.path.join(tmp, "content", "posts"))
+        engine._content_paths.clear()
+        probe = timeit(lambda: (engine._content_paths.clear(), resolve_site_structure(tmp)), repeat=200)
+        cached = timeit(resolve_site_structure, tmp, repeat=200)
+        print(f"  {'resolve_site_structure':<28}{probe * 1e6:8.1f} us probing, {cached * 1e6:.1f} us cached")
+
+
+def bench_daemon(notes: int, runs: int):
+    """Re-importing a vault with a fresh engine.py process per run against jobs on a warm daemon.py"""
+    with tempfile.TemporaryDirectory(dir=os.getcwd()) as tmp:
+        vault = os.path.join(tmp, "vault")
+        site = os.path.join(tmp, "site")
+        note_paths = synthetic_vault(vault, notes, 0)
+        os.makedirs(os.path.join(site, "content", "posts"))
+        shutil.copy(os.path.join(os.path.dirname(os.path.abspath(__file__)), "hugo.toml"), site)
+        here = os.path.dirname(os.path.abspath(__file__))
+        # Separate caches in the temporary home, so the real ones are neither used nor touched
+        env = {**os.environ, "HOME": tmp}
+        edited = note_paths[0]
+
+        def edit(i):
+            with open(edited, "a", encoding="utf-8") as file:
+                file.write(f"\nEdit {i}\n")
+
+        def cli():
+            subprocess.run([sys.executable, "engine.py", "--vault", vault, "--site", site], cwd=here, env=env,
+                           check=True, stdout=subprocess.DEVNULL)
+
+        socket_path = os.path.join(tmp, "daemon.sock")
+        server = subprocess.Popen([sys.executable, "daemon.py", "--socket", socket_path, "serve", "--workers", "1"],
+                                  cwd=here, env=env, stdout=subprocess.DEVNULL)
+        client = argparse.Namespace(socket=socket_path, port=None)
+
+        def job():
+            code, reply = daemon.call(client, "POST", "/jobs", {"kind": "import", "site": site, "vault": vault})
+            while reply["state"] not in daemon.FINISHED:
+                code, reply = daemon.call(client, "GET", f"/jobs/{reply['id']}?wait=30")
+            if reply["state"] != "done":
+                raise Exception(f"daemon job failed: {reply['error']}")
+
+        try:
+            while not os.path.exists(socket_path):
+                time.sleep(0.05)
+            print(f"{notes} notes, best of {runs}")
+            for label, run in (("engine.py per import", cli), ("daemon.py job", job)):
+                run()
+                unchanged = timeit(run, repeat=runs)
+                edit_times = []
+                for i in range(runs):
+                    edit(i)
+                    edit_times.append(timeit(run, repeat=1))
+                print(f"  {label:<24}{unchanged * 1000:9.1f} ms unchanged, {min(edit_times) * 1000:.1f} ms one note edited")
+        finally:
+            server.terminate()
+            server.wait()
+
+
+# Timer jitter swamps anything faster than this
+NOISE_FLOOR = 0.01
+
+
+def synthetic_vault(root: str, notes: int, images: int, seed: int = 0) -> list[str]:
+    """
+    An Obsidian vault of `notes` notes of 2-40 paragraphs sharing `images`
+    attachments of 200-2400 px. Returns the note paths.
+    """
+    from PIL import Image
+    rng = random.Random(seed)
+    attachments = os.path.join(root, "attachments")
+    os.makedirs(attachments)
+    names = []
+    for i in range(images):
+        width = rng.randrange(200, 2400)
+        height = width * rng.choice((9, 12, 16)) // 16
+        # A gradient compresses like a screenshot, noise like a photo
+        img = Image.linear_gradient("L").resize((width, height)).convert("RGB")
+        if i % 2:
+            img = Image.blend(img, Image.effect_noise((width, height), 64).convert("RGB"), 0.5)
+        name = f"Pasted image {i}.{'png' if i % 3 else 'jpg'}"
+        img.save(os.path.join(attachments, name))
+        names.append(name)
+
+    paths = []
+    for i in range(notes):
+        folder = os.path.join(root, f"folder {i % 10}")
+        os.makedirs(folder, exist_ok=True)
+        body = synthetic_note(rng.randrange(2, 40), 0, seed=seed + i)
+        embeds = rng.sample(names, min(len(names), rng.randrange(0, 4))) if names else []
+        body += "".join(f"\n\n![[{name}]]" for name in embeds) + f"\n\nSee [[Note {(i + 1) % notes}]].\n"
+        path = os.path.join(folder, f"Note {i}.md")
+        with open(path, "w", encoding="utf-8") as file:
+            file.write(f"---\ntitle: Note {i}\ndate: 2024-{i % 12 + 1:02d}-{i % 28 + 1:02d}\n---\n{body}")
+        paths.append(path)
+    return paths
+
+
+def bench_media(notes: int, images: int):
+    """Attachments copied into every bundle against the shared content-addressed store"""
+    with tempfile.TemporaryDirectory(dir=os.getcwd()) as tmp:
+        vault = os.path.join(tmp, "vault")
+        note_paths = synthetic_vault(vault, notes, images)
+        attachments = AttachmentIndex.load(vault, os.path.join(tmp, "attachments.json"))
+        print(f"{notes} notes sharing {images} images")
+        for label, shared in (("per-bundle copies", False), ("shared media", True)):
+            site = os.path.join(tmp, "shared" if shared else "bundled")
+            posts_dir = os.path.join(site, "content", "posts")
+            media = MediaStore(site) if shared else None
+            start = time.perf_counter()
+            for path in note_paths:
+                write_bundle(os.path.join(posts_dir, note_slug(path)), [path], attachments=attachments, media=media)
+            elapsed = time.perf_counter() - start
+            files = [os.path.join(dirpath, name) for folder in (posts_dir, os.path.join(site, MEDIA_DIR))
+                     for dirpath, _, names in os.walk(folder) for name in names if not name.endswith(".md")]
+            size = sum(os.path.getsize(path) for path in files)
+            print(f"  {label:<20}{elapsed * 1000:9.2f} ms  {len(files):6} files  {size / 1024 / 1024:8.2f} MiB")
+
+
+def bench_pipeline(notes: int, images: int, history: int, seed: int) -> dict:
+    """
+    Time each stage from vault to gh-pages. Returns {"stages": {name: seconds},
+    "sizes": {name: bytes}, "setup": {name: seconds}}; setup is not compared.
+    """
+    stages = {}
+    sizes = {}
+    setup = {}
+
+    def stage(name, func, *args, group=stages):
+        start = time.perf_counter()
+        result = func(*args)
+        group[name] = time.perf_counter() - start
+        print(f"  {name:<28}{group[name] * 1000:10.2f} ms")
+        return result
+
+    with tempfile.TemporaryDirectory(dir=os.getcwd()) as tmp:
+        vault = os.path.join(tmp, "vault")
+        note_paths = stage("generate vault", synthetic_vault, vault, notes, images, seed, group=setup)
+        sizes["vault"] = sum(os.path.getsize(os.path.join(dirpath, name))
+                             for dirpath, _, names in os.walk(vault) for name in names)
+        contents = []
+        for path in note_paths:
+            with open(path, "r", encoding="utf-8") as file:
+                contents.append(file.read())
+
+        rewritten = stage("rewrite links", lambda: [rewrite_links(content) for content in contents])
+        attachments = stage("attachment index", AttachmentIndex.load, vault, os.path.join(tmp, "attachments.json"))
+        resolved = stage("resolve attachments", lambda: {
+            source for path, (_, links) in zip(note_paths, rewritten)
+            for source in (resolve_attachment(link, os.path.dirname(path), attachments) for link in links) if source})
+
+        converted = os.path.join(tmp, "converted")
+        options = ImageOptions()
+
+        def convert():
+            for source in sorted(resolved):
+                for variant in plan_variants(source, os.path.basename(source), options):
+                    encode_variant({"source": source, "target": os.path.join(converted, variant["name"]),
+                                    "width": variant["width"], "format": variant["format"],
+                                    "quality": options.quality})
+        stage("image conversion", convert)
+        copied = os.path.join(tmp, "copied")
+        os.makedirs(copied)
+        stage("file copy", lambda: [copy_file(source, os.path.join(copied, os.path.basename(source)))
+                                    for source in resolved])
+
+        remote = os.path.join(tmp, "remote.git")
+        site = os.path.join(tmp, "site")
+        git("init", "-q", "--bare", "-b", "master", remote)
+        git("clone", "-q", remote, site)
+        git("config", "user.name", "bench", cwd=site)
+        git("config", "user.email", "bench@example.com", cwd=site)
+        posts_dir = os.path.join(site, "content", "posts")
+        stage("write bundles", lambda: [write_bundle(os.path.join(posts_dir, note_slug(path)), [path],
+                                                     attachments=attachments) for path in note_paths])
+
+        # A public/ with one page per post plus its images, as Hugo would publish it
+        public = os.path.join(site, "public")
+        shutil.copytree(posts_dir, os.path.join(public, "posts"),
+                        ignore=lambda _, names: [name for name in names if name.endswith(".md")])
+        for i, content in enumerate(contents):
+            folder = os.path.join(public, "posts", f"note-{i}")
+            os.makedirs(folder, exist_ok=True)
+            with open(os.path.join(folder, "index.html"), "w", encoding="utf-8") as file:
+                file.write(f"<html><body><article>{content}</article></body></html>")
+        sizes["public"] = sum(os.path.getsize(os.path.join(dirpath, name))
+                              for dirpath, _, names in os.walk(public) for name in names)
+
+        def commit():
+            git("add", "-A", cwd=site)
+            git("commit", "-q", "-m", "import", cwd=site)
+        stage("git commit", commit)
+        for round_ in range(history):
+            # Earlier publishes, so the subtree split has history to walk
+            with open(os.path.join(public, "posts", f"note-{round_ % notes}", "index.html"), "a") as file:
+                file.write(f"<!-- edit {round_} -->")
+            commit()
+        git("push", "-q", "origin", "master", cwd=site)
+
+        deployer = GitDeployer(site, "public", on_output=None)
+        stage("deploy (subtree split)", lambda: asyncio.run(deployer.deploy_subtree()))
+        git("fetch", "-q", "origin", cwd=site)
+        with open(os.path.join(public, "posts", "note-0", "index.html"), "a") as file:
+            file.write("<!-- final edit -->")
+        commit()
+        stage("deploy (tree)", lambda: asyncio.run(deployer.deploy_tree()))
+        for line in git("count-objects", "-v", cwd=remote).splitlines():
+            key, value = line.split(": ")
+            if key == "size-pack":
+                sizes["remote pack"] = int(value) * 1024
+        for name, size in sizes.items():
+            print(f"  {name + ' bytes':<28}{size:>13,}")
+    return {"stages": stages, "sizes": sizes, "setup": setup}
+
+
+def compare_runs(baseline: dict, current: dict, tolerance: float) -> list[str]:
+    """
+    Stages and sizes that grew by more than `tolerance` (0.25 = 25%) since
+    the baseline. Stages under NOISE_FLOOR seconds in both runs never count.
+    """
+    regressions = []
+    print(f"  {'':<28}{'baseline':>12}{'current':>12}{'change':>9}")
+    for group, unit in (("stages", "ms"), ("sizes", "KiB")):
+        scale = 1000 if unit == "ms" else 1 / 1024
+        for name, value in current[group].items():
+            before = baseline.get(group, {}).get(name)
+            if not before:
+                continue
+            change = value / before - 1
+            noise = group == "stages" and max(value, before) < NOISE_FLOOR
+            flag = "  REGRESSION" if change > tolerance and not noise else ""
+            print(f"  {name:<28}{before * scale:>9.1f} {unit:<2}{value * scale:>9.1f} {unit:<2}{change:>+8.0%}{flag}")
+            if flag:
+                regressions.append(name)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark importer hot paths")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    rewrite = commands.add_parser("rewrite", help="wikilink rewriting on a large synthetic note")
+    rewrite.add_argument("--paragraphs", type=int, default=2000)
+    rewrite.add_argument("--links", type=int, default=2000)
+
+    copy = commands.add_parser("copy", help="attachment copy layer against shutil.copy")
+    copy.add_argument("--files", type=int, default=500)
+    copy.add_argument("--size", type=int, default=256, help="file size in KiB")
+
+    posts = commands.add_parser("posts", help="post index load and type-ahead search")
+    posts.add_argument("--posts", type=int, default=10000)
+
+    publish_ = commands.add_parser("publish", help="commit and push to a local bare remote")
+    publish_.add_argument("--posts", type=int, default=2000)
+    publish_.add_argument("--changed", type=int, default=3)
+
+    render = commands.add_parser("render", help="patching public/ against a full render")
+    render.add_argument("--posts", type=int, default=5000)
+
+    search = commands.add_parser("search", help="sharded search index build and query payload")
+    search.add_argument("--posts", type=int, default=5000)
+
+    related = commands.add_parser("related", help="related posts precompute against all-pairs scoring")
+    related.add_argument("--posts", type=int, default=5000)
+
+    minify = commands.add_parser("minify", help="public/ minification and precompression")
+    minify.add_argument("--pages", type=int, default=1000)
+    minify.add_argument("--workers", type=int, default=None)
+
+    pipeline = commands.add_parser("pipeline", help="every stage from vault to gh-pages, with JSON results")
+    pipeline.add_argument("--notes", type=int, default=200)
+    pipeline.add_argument("--images", type=int, default=20)
+    pipeline.add_argument("--history", type=int, default=50, help="earlier publishes for the subtree split to walk")
+    pipeline.add_argument("--seed", type=int, default=0)
+    pipeline.add_argument("--json", help="write the results to this file")
+    pipeline.add_argument("--compare", help="results of an earlier run to check against")
+    pipeline.add_argument("--tolerance", type=float, default=0.25,
+                          help="allowed slowdown before a stage counts as a regression")
+
+    startup = commands.add_parser("startup", help="import time of each entry point")
+    startup.add_argument("--runs", type=int, default=10)
+
+    daemon_ = commands.add_parser("daemon", help="re-import per process against a warm job daemon")
+    daemon_.add_argument("--notes", type=int, default=200)
+    daemon_.add_argument("--runs", type=int, default=5)
+
+    links = commands.add_parser("links", help="note link graph refresh against a full re-parse")
+    links.add_argument("--notes", type=int, default=5000)
+
+    catalog = commands.add_parser("catalog", help="SQLite vault catalog refresh and queries")
+    catalog.add_argument("--notes", type=int, default=10000)
+
+    media = commands.add_parser("media", help="attachment bytes with and without the shared media store")
+    media.add_argument("--notes", type=int, default=500)
+    media.add_argument("--images", type=int, default=40)
+
+    args = parser.parse_args(argv)
+    if args.command == "rewrite":
+        bench_rewrite(args.paragraphs, args.links)
+    elif args.command == "copy":
+        bench_copy(args.files, args.size)
+    elif args.command == "posts":
+        bench_posts(args.posts)
+    elif args.command == "publish":
+        bench_publish(args.posts, args.changed)
+    elif args.command == "render":
+        bench_render(args.posts)
+    elif args.command == "search":
+        bench_search(args.posts)
+    elif args.command == "related":
+        bench_related(args.posts)
+    elif args.command == "minify":
+        bench_minify(args.pages, args.workers)
+    elif args.command == "daemon":
+        bench_daemon(args.notes, args.runs)
+    elif args.command == "catalog":
+        bench_catalog(args.notes)
+    elif args.command == "links":
+        bench_links(args.notes)
+    elif args.command == "media":
+        bench_media(args.notes, args.images)
+    elif args.command == "startup":
+        bench_startup(args.runs)
+    elif args.command == "pipeline":
+        print(f"{args.notes} notes, {args.images} images, {args.history} earlier publishes")
+        results = bench_pipeline(args.notes, args.images, args.history, args.seed)
+        results["params"] = {"notes": args.notes, "images": args.images, "history": args.history, "seed": args.seed}
+        try:
+            results["commit"] = git("rev-parse", "HEAD", cwd=os.path.dirname(os.path.abspath(__file__))).strip()
+        except subprocess.CalledProcessError:
+            results["commit"] = None
+        if args.json:
+            with open(args.json, "w") as file:
+                json.dump(results, file, indent=2)
+        if args.compare:
+            with open(args.compare, "r") as file:
+                baseline = json.load(file)
+            if baseline.get("params") != results["params"]:
+                print("Warning: the baseline ran with different parameters")
+            if compare_runs(baseline, results, args.tolerance):
+                return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
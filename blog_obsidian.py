@@ -1,17 +1,14 @@
 import os
-import re
-import shutil
 import json
-from tkinter import Tk, Label, Entry, Button, filedialog, messagebox, Listbox, Scrollbar
-from tkinterdnd2 import TkinterDnD, DND_FILES
-import subprocess
-from PIL import Image
+from tkinter import Label, Entry, Button, filedialog, messagebox
 
 # Global variables
 featured_image_path = None
 dropped_files = []
 config_path = "config.json"
 config = {}
+# Widgets, created by main()
+root = dropped_files_label = target_folder_entry = featured_image_label = None
 
 def load_config():
     global config
@@ -51,6 +48,10 @@ def ensure_configured():
 
 def process_files():
     global featured_image_path, dropped_files
+    # The pipeline is only needed once files are processed, so it stays out of startup
+    from attachments import AttachmentIndex
+    from engine import IMAGE_EXTENSIONS, sync_bundle
+    from manifest import Manifest
     ensure_configured()
     
     target_folder_name = target_folder_entry.get()
@@ -60,49 +61,12 @@ def process_files():
 
     target_folder = os.path.join(config["site_repository_path"], "content", "posts", target_folder_name)
 
-    if os.path.exists(target_folder):
-        shutil.rmtree(target_folder)  # Remove the existing folder
-    os.makedirs(target_folder, exist_ok=True)
-
-    first_image_handled = False  # Flag to handle the first image duplication
-
-    for filepath in dropped_files:
-        filename = os.path.basename(filepath)
-
-        if filename.endswith(".md"):
-            # Process Markdown files
-            with open(filepath, "r", encoding="utf-8") as file:
-                content = file.read()
-
-            # Find and replace image links
-            images = re.findall(r'\[\[([^]]*\.png)\]\]', content)
-            for image in images:
-                encoded_image = image.replace(' ', '%20')
-                markdown_image = f"![Image Description]({encoded_image})"
-                content = content.replace(f"[[{image}]]", markdown_image)
-
-                if not first_image_handled:
-                    source_image_path = os.path.join(os.path.dirname(filepath), image)
-                    if os.path.exists(source_image_path):
-                        target_image_path = os.path.join(target_folder, image)
-                        shutil.copy(source_image_path, target_image_path)
-                        first_image_handled = True
-
-            target_md_path = os.path.join(target_folder, "index.md")
-            with open(target_md_path, "w", encoding="utf-8") as file:
-                file.write(content)
-
-        elif filename.endswith((".png", ".jpg", ".jpeg")):
-            shutil.copy(filepath, target_folder)
-
-    # Handle featured image
-    if featured_image_path and os.path.exists(featured_image_path):
-        featured_target_path = os.path.join(target_folder, "featured.png")
-        if not featured_image_path.lower().endswith('.png'):
-            img = Image.open(featured_image_path)
-            img.save(featured_target_path, 'PNG')
-        else:
-            shutil.copy(featured_image_path, featured_target_path)
+    markdown_files = [f for f in dropped_files if f.endswith(".md")]
+    image_files = [f for f in dropped_files if f.endswith(IMAGE_EXTENSIONS)]
+    manifest = Manifest.load()
+    attachments = AttachmentIndex.load(config["obsidian_vault_path"])
+    sync_bundle(manifest, target_folder, markdown_files, image_files, featured_image_path, attachments)
+    manifest.save()
 
     messagebox.showinfo("Success", f"Files processed and saved to:\n{target_folder}")
     dropped_files = []
@@ -146,6 +110,7 @@ def browse_files():
     dropped_files_label.config(text="\n".join(dropped_files))
 
 def push_to_github():
+    import subprocess
     ensure_configured()
     try:
         site_path = config["site_repository_path"]
@@ -165,39 +130,48 @@ def push_to_github():
     except Exception as e:
         messagebox.showerror("Error", str(e))
 
-# GUI Setup
-load_config()
-root = TkinterDnD.Tk()
-root.title("Markdown and Image Processor with Post Manager")
-root.geometry("800x800")
+def main():
+    global root, dropped_files_label, target_folder_entry, featured_image_label
+    # Loads the tkdnd Tcl extension, so it waits until a window is actually opened
+    from tkinterdnd2 import TkinterDnD, DND_FILES
 
-setup_button = Button(root, text="Setup Paths", command=setup_configuration)
-setup_button.pack(pady=10)
+    # GUI Setup
+    load_config()
+    root = TkinterDnD.Tk()
+    root.title("Markdown and Image Processor with Post Manager")
+    root.geometry("800x800")
 
-Label(root, text="Drag and drop Markdown and image files below:").pack(pady=10)
+    setup_button = Button(root, text="Setup Paths", command=setup_configuration)
+    setup_button.pack(pady=10)
 
-dropped_files_label = Label(root, text="Drop files here", bg="lightgray", relief="sunken", width=50, height=10)
-dropped_files_label.pack(pady=10)
-dropped_files_label.drop_target_register(DND_FILES)
-dropped_files_label.dnd_bind("<<Drop>>", on_drop)
+    Label(root, text="Drag and drop Markdown and image files below:").pack(pady=10)
 
-browse_button = Button(root, text="Browse Files", command=browse_files)
-browse_button.pack(pady=5)
+    dropped_files_label = Label(root, text="Drop files here", bg="lightgray", relief="sunken", width=50, height=10)
+    dropped_files_label.pack(pady=10)
+    dropped_files_label.drop_target_register(DND_FILES)
+    dropped_files_label.dnd_bind("<<Drop>>", on_drop)
 
-Label(root, text="Enter new post folder:").pack(pady=10)
-target_folder_entry = Entry(root, width=40)
-target_folder_entry.pack(pady=5)
+    browse_button = Button(root, text="Browse Files", command=browse_files)
+    browse_button.pack(pady=5)
 
-process_button = Button(root, text="Process Files", command=process_files)
-process_button.pack(pady=20)
+    Label(root, text="Enter new post folder:").pack(pady=10)
+    target_folder_entry = Entry(root, width=40)
+    target_folder_entry.pack(pady=5)
 
-Label(root, text="Featured Image:").pack(pady=5)
-featured_image_button = Button(root, text="Select Featured Image", command=select_featured_image)
-featured_image_button.pack(pady=5)
-featured_image_label = Label(root, text="No image selected")
-featured_image_label.pack(pady=5)
+    process_button = Button(root, text="Process Files", command=process_files)
+    process_button.pack(pady=20)
 
-github_push_button = Button(root, text="Push to GitHub", command=push_to_github)
-github_push_button.pack(pady=5)
+    Label(root, text="Featured Image:").pack(pady=5)
+    featured_image_button = Button(root, text="Select Featured Image", command=select_featured_image)
+    featured_image_button.pack(pady=5)
+    featured_image_label = Label(root, text="No image selected")
+    featured_image_label.pack(pady=5)
 
-root.mainloop()
+    github_push_button = Button(root, text="Push to GitHub", command=push_to_github)
+    github_push_button.pack(pady=5)
+
+    root.mainloop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+"""
+SQLite catalog of the vault's notes with full-text search.
+
+~/.markdown_processor_catalog.db holds one row per note (vault-relative
+path, title, tags, mtime, publish flag and slug from the front matter)
+and an FTS5 index over titles, tags and bodies, so finding a note or
+listing what changed since the last deploy is one indexed query instead
+of a walk through a file dialog. refresh() stats the vault and re-reads
+only notes whose (mtime, size) changed, in a single transaction.
+
+    python catalog.py obsidian hugo            # full-text search, best matches first
+    python catalog.py --tag travel --publishable
+    python catalog.py --since-deploy           # publishable notes changed since the last deploy
+"""
+import argparse
+import json
+import os
+import re
+import sqlite3
+import subprocess
+import sys
+import time
+
+from engine import SKIPPED_DIRS, is_publishable, load_paths, meta_slug, parse_front_matter
+
+catalog_file = os.path.join(os.path.expanduser('~'), '.markdown_processor_catalog.db')
+
+CATALOG_VERSION = 1
+DEFAULT_LIMIT = 100
+# bm25 weights of the title, tags and body columns
+RANK_WEIGHTS = (10.0, 5.0, 1.0)
+WORD_RE = re.compile(r"\w+")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS notes (
+    id INTEGER PRIMARY KEY,
+    vault TEXT NOT NULL,
+    path TEXT NOT NULL,
+    title TEXT NOT NULL,
+    tags TEXT NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    publishable INTEGER NOT NULL,
+    slug TEXT,
+    UNIQUE (vault, path)
+);
+CREATE INDEX IF NOT EXISTS notes_by_mtime ON notes (vault, mtime_ns);
+CREATE VIRTUAL TABLE IF NOT EXISTS notes_fts USING fts5(title, tags, body, tokenize='unicode61 remove_diacritics 2');
+"""
+
+
+def read_note(note_path: str) -> dict:
+    """Catalog fields and plain body of one note"""
+    title = os.path.splitext(os.path.basename(note_path))[0]
+    try:
+        with open(note_path, "r", encoding="utf-8") as file:
+            meta, body = parse_front_matter(file.read())
+    except UnicodeDecodeError:
+        meta, body = {}, ""
+    tags = meta.get("tags") or []
+    if not isinstance(tags, list):
+        tags = str(tags).replace(",", " ").split()
+    publishable = is_publishable(meta)
+    return {
+        "title": str(meta.get("title") or title),
+        "tags": [str(tag).lstrip("#") for tag in tags],
+        "publishable": publishable,
+        "slug": meta_slug(meta, note_path) if publishable else None,
+        "body": body,
+    }
+
+
+def match_query(text: str) -> str | None:
+    """FTS5 query for free text: every word must match, the last one as a prefix (type-ahead)"""
+    words = WORD_RE.findall(text)
+    if not words:
+        return None
+    return " ".join(f'"{word}"' for word in words) + "*"
+
+
+def last_deploy(site_repo: str, remote: str = "origin", branch: str = "gh-pages") -> float | None:
+    """Commit time of the deployed gh-pages branch, or None if it was never deployed"""
+    for ref in (f"refs/remotes/{remote}/{branch}", f"refs/heads/{branch}"):
+        result = subprocess.run(["git", "log", "-1", "--format=%ct", ref], cwd=site_repo,
+                                capture_output=True, text=True)
+        if result.returncode == 0 and result.stdout.strip():
+            return float(result.stdout.strip())
+    return None
+
+
+class Catalog:
+    def __init__(self, path: str = catalog_file):
+        self.path = path
+        # One connection per thread; WAL lets the GUI query while a refresh writes
+        self.db = sqlite3.connect(path)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute("PRAGMA journal_mode=WAL")
+        if self.db.execute("PRAGMA user_version").fetchone()[0] != CATALOG_VERSION:
+            self.db.executescript("DROP TABLE IF EXISTS notes; DROP TABLE IF EXISTS notes_fts;")
+            self.db.executescript(SCHEMA)
+            self.db.execute(f"PRAGMA user_version = {CATALOG_VERSION}")
+
+    def close(self):
+        self.db.close()
+
+    def refresh(self, vault: str) -> tuple[int, int]:
+        """Re-read the notes whose (mtime, size) changed. Returns (notes added or changed, notes removed)."""
+        vault = os.path.abspath(vault)
+        stored = {row["path"]: row for row in
+                  self.db.execute("SELECT id, path, mtime_ns, size FROM notes WHERE vault = ?", (vault,))}
+        seen = set()
+        updated = 0
+        with self.db:
+            for dirpath, dirnames, filenames in os.walk(vault):
+                dirnames[:] = [d for d in dirnames if d not in SKIPPED_DIRS and not d.startswith(".")]
+                for filename in filenames:
+                    if not filename.endswith(".md"):
+                        continue
+                    note_path = os.path.join(dirpath, filename)
+                    rel_path = os.path.relpath(note_path, vault)
+                    try:
+                        stat = os.stat(note_path)
+                    except FileNotFoundError:
+                        continue
+                    seen.add(rel_path)
+                    row = stored.get(rel_path)
+                    if row is not None and (row["mtime_ns"], row["size"]) == (stat.st_mtime_ns, stat.st_size):
+                        continue
+                    self._store(vault, rel_path, note_path, stat, row["id"] if row is not None else None)
+                    updated += 1
+            gone = [stored[rel_path]["id"] for rel_path in stored.keys() - seen]
+            for note_id in gone:
+                self.db.execute("DELETE FROM notes WHERE id = ?", (note_id,))
+                self.db.execute("DELETE FROM notes_fts WHERE rowid = ?", (note_id,))
+        return updated, len(gone)
+
+    def _store(self, vault: str, rel_path: str, note_path: str, stat, note_id: int | None):
+        note = read_note(note_path)
+        fields = (note["title"], json.dumps(note["tags"]), stat.st_mtime_ns, stat.st_size,
+                  int(note["publishable"]), note["slug"])
+        if note_id is None:
+            note_id = self.db.execute(
+                "INSERT INTO notes (vault, path, title, tags, mtime_ns, size, publishable, slug)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)", (vault, rel_path, *fields)).lastrowid
+        else:
+            self.db.execute("UPDATE notes SET title = ?, tags = ?, mtime_ns = ?, size = ?, publishable = ?, slug = ?"
+                            " WHERE id = ?", (*fields, note_id))
+            self.db.execute("DELETE FROM notes_fts WHERE rowid = ?", (note_id,))
+        self.db.execute("INSERT INTO notes_fts (rowid, title, tags, body) VALUES (?, ?, ?, ?)",
+                        (note_id, note["title"], " ".join(note["tags"]), note["body"]))
+
+    def query(self, vault: str, text: str | None = None, tag: str | None = None, publishable: bool | None = None,
+              changed_since: float | None = None, limit: int = DEFAULT_LIMIT) -> list[dict]:
+        """
+        Notes of a vault matching all given filters: full-text search (best
+        matches first, otherwise newest first), a tag, the publish flag and
+        a modification time in seconds since the epoch.
+        """
+        vault = os.path.abspath(vault)
+        clauses = ["notes.vault = ?"]
+        params = [vault]
+        if tag:
+            clauses.append("EXISTS (SELECT 1 FROM json_each(notes.tags) WHERE json_each.value = ?)")
+            params.append(tag.lstrip("#"))
+        if publishable is not None:
+            clauses.append("notes.publishable = ?")
+            params.append(int(publishable))
+        if changed_since is not None:
+            clauses.append("notes.mtime_ns > ?")
+            params.append(int(changed_since * 1e9))
+
+        match = match_query(text) if text else None
+        columns = "notes.path, notes.title, notes.tags, notes.mtime_ns, notes.publishable, notes.slug"
+        if match is not None:
+            sql = (f"SELECT {columns}, snippet(notes_fts, 2, '[', ']', '...', 8) AS snippet"
+                   f" FROM notes_fts JOIN notes ON notes.id = notes_fts.rowid"
+                   f" WHERE notes_fts MATCH ? AND {' AND '.join(clauses)}"
+                   f" ORDER BY bm25(notes_fts, {', '.join(map(str, RANK_WEIGHTS))}) LIMIT ?")
+            params = [match, *params, limit]
+        else:
+            sql = (f"SELECT {columns}, '' AS snippet FROM notes WHERE {' AND '.join(clauses)}"
+                   f" ORDER BY notes.mtime_ns DESC LIMIT ?")
+            params.append(limit)
+        return [{
+            "path": os.path.join(vault, row["path"]),
+            "title": row["title"],
+            "tags": json.loads(row["tags"]),
+            "mtime": row["mtime_ns"] / 1e9,
+            "publishable": bool(row["publishable"]),
+            "slug": row["slug"],
+            "snippet": row["snippet"],
+        } for row in self.db.execute(sql, params)]
+
+
+def format_note(note: dict) -> str:
+    changed = time.strftime("%Y-%m-%d %H:%M", time.localtime(note["mtime"]))
+    return f"{changed}  {note['title']}{'' if note['publishable'] else '  [not published]'}"
+
+
+def main(argv=None):
+    paths = load_paths()
+    parser = argparse.ArgumentParser(description="Search and filter the notes of an Obsidian vault")
+    parser.add_argument("text", nargs="*", help="Words to search the titles, tags and bodies for")
+    parser.add_argument("--vault", default=paths.get("obsidian_vault"),
+                        help="Obsidian vault (default: configured vault)")
+    parser.add_argument("--site", default=paths.get("site_repo"),
+                        help="Hugo site repository, for --since-deploy (default: configured site repo)")
+    parser.add_argument("--tag", help="Only notes with this front matter tag")
+    parser.add_argument("--publishable", action="store_true", help="Only notes the importer publishes")
+    parser.add_argument("--since-deploy", action="store_true",
+                        help="Only publishable notes changed since gh-pages was last deployed")
+    parser.add_argument("--limit", type=int, default=DEFAULT_LIMIT)
+    args = parser.parse_args(argv)
+    if not args.vault or not os.path.isdir(args.vault):
+        parser.error("vault path does not exist, pass --vault")
+
+    changed_since = None
+    if args.since_deploy:
+        if not args.site or not os.path.isdir(args.site):
+            parser.error("site repository does not exist, pass --site")
+        changed_since = last_deploy(args.site) or 0.0
+
+    catalog = Catalog()
+    start = time.perf_counter()
+    updated, removed = catalog.refresh(args.vault)
+    refreshed = time.perf_counter()
+    notes = catalog.query(args.vault, " ".join(args.text), args.tag,
+                          True if args.publishable or args.since_deploy else None, changed_since, args.limit)
+    done = time.perf_counter()
+    for note in notes:
+        print(format_note(note))
+        print(f"    {note['path']}")
+        if note["snippet"]:
+            print(f"    {' '.join(note['snippet'].split())}")
+    print(f"{len(notes)} notes; refresh {(refreshed - start) * 1000:.0f} ms ({updated} re-read, {removed} removed),"
+          f" query {(done - refreshed) * 1000:.1f} ms")
+    catalog.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,500 @@
+"""
+Local publishing service: one long-running process that takes import,
+render, deploy and publish jobs over HTTP on localhost or a Unix socket.
+
+    python daemon.py serve [--port 8765 | --socket ~/.markdown_processor.sock] [--workers 2]
+    python daemon.py submit import --site ~/Projects/site --vault ~/Obsidian --wait
+    python daemon.py status [JOB]
+
+The manifest, image cache, search index, related posts and the render
+index of every site are loaded once and kept warm between jobs, so a job
+pays neither interpreter startup nor a rescan of the caches. Jobs run on
+a bounded pool of worker threads; jobs for the same site run one after
+another in submission order, jobs for different sites run side by side.
+Steps that write the shared caches in the home directory (import, index,
+render, minify) take turns; git commits, pushes and deploys do not.
+
+While the service runs it owns those caches: restart it after editing
+hugo.toml, and send the GUI's work to it rather than running both.
+
+Every request must carry "Authorization: Bearer <token>", the token the
+service keeps in ~/.markdown_processor_daemon.token (mode 0600), and
+POSTs must be application/json. Requests with an Origin header or a Host
+other than the service's own are refused, so a web page cannot start a
+publish through the browser.
+
+API (JSON in and out):
+
+    POST /jobs           {"kind": "import", "site": "...", ...}   -> 202 and the job
+    GET  /jobs           every job still remembered, oldest first
+    GET  /jobs/<id>      one job; ?wait=SECONDS blocks until it has finished
+    GET  /status         worker count and the queued jobs per site
+"""
+import argparse
+import asyncio
+import hmac
+import http.client
+import itertools
+import json
+import os
+import secrets
+import socket
+import socketserver
+import sys
+import threading
+import time
+import urllib.parse
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from engine import import_changes, import_vault, load_paths
+from image_cache import ImageCache
+from images import ImageOptions
+from mala import GitDeployer
+from manifest import Manifest
+
+token_file = os.path.join(os.path.expanduser('~'), '.markdown_processor_daemon.token')
+
+DEFAULT_PORT = 8765
+DEFAULT_WORKERS = 2
+DEFAULT_PUBLIC = "public"
+# Finished jobs beyond this many are forgotten, oldest first
+KEPT_JOBS = 200
+FINISHED = ("done", "failed")
+
+
+class Job:
+    def __init__(self, job_id: int, kind: str, site: str, params: dict):
+        self.id = job_id
+        self.kind = kind
+        self.site = site
+        self.params = params
+        self.state = "queued"
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.changed = []
+        self.log = []
+        self.error = None
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id, "kind": self.kind, "site": self.site, "params": self.params, "state": self.state,
+            "created": self.created, "started": self.started, "finished": self.finished,
+            "changed": self.changed, "log": self.log, "error": self.error,
+        }
+
+
+class SiteState:
+    """Everything kept warm for one site, created on its first job"""
+
+    def __init__(self, site_repo: str):
+        self.site_repo = site_repo
+        self.search = None
+        self.related = None
+        self.renderer = None
+        # Paths written by import and render jobs since the last publish job
+        self.unpublished = set()
+
+    def update_indexes(self) -> list[str]:
+        # Imported late: both build on engine and load the site's config
+        from related import RelatedPosts
+        from search_index import SearchIndex
+        if self.search is None:
+            self.search = SearchIndex.load(self.site_repo)
+            self.related = RelatedPosts(self.site_repo)
+        return self.search.update() + self.related.update()
+
+    def render(self, everything: bool = False) -> list[str]:
+        from render import Renderer
+        if self.renderer is None:
+            self.renderer = Renderer(self.site_repo)
+        return self.renderer.render(everything)
+
+
+class JobDeployer(GitDeployer):
+    """GitDeployer whose minify step waits for the shared caches"""
+
+    def __init__(self, *args, cache_lock: threading.Lock, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.cache_lock = cache_lock
+
+    async def minify(self):
+        with self.cache_lock:
+            await super().minify()
+
+
+class JobQueue:
+    def __init__(self, workers: int = DEFAULT_WORKERS):
+        self.workers = workers
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="job")
+        self.condition = threading.Condition()
+        self.ids = itertools.count(1)
+        self.jobs = {}
+        self.pending = {}
+        self.sites = {}
+        # The manifest and the caches under ~ hold every site, so their writers take turns
+        self.cache_lock = threading.Lock()
+        self.manifest = Manifest.load()
+        self.image_cache = ImageCache()
+        self.runners = {"import": self.run_import, "render": self.run_render,
+                        "deploy": self.run_deploy, "publish": self.run_publish}
+
+    def submit(self, kind: str, site: str | None, params: dict) -> Job:
+        """Queue a job behind the site's earlier ones. Raises ValueError for a bad request."""
+        if kind not in self.runners:
+            raise ValueError(f"unknown job kind {kind!r}, expected one of {', '.join(self.runners)}")
+        site = site or load_paths().get("site_repo")
+        if not site or not os.path.isdir(site):
+            raise ValueError(f"site repository {site!r} does not exist")
+        site = os.path.abspath(site)
+        with self.condition:
+            job = Job(next(self.ids), kind, site, params)
+            self.jobs[job.id] = job
+            self.pending.setdefault(site, deque()).append(job)
+            if len(self.pending[site]) == 1:
+                self.executor.submit(self._drain, site)
+            self._forget_old()
+        print(f"Job {job.id}: {kind} {site} queued")
+        return job
+
+    def _drain(self, site: str):
+        # One drain per site at a time keeps the site's jobs in order without parking a worker on a lock
+        while True:
+            with self.condition:
+                job = self.pending[site][0]
+                job.state = "running"
+                job.started = time.time()
+            self._run(job)
+            with self.condition:
+                self.pending[site].popleft()
+                if not self.pending[site]:
+                    del self.pending[site]
+                    return
+
+    def _run(self, job: Job):
+        state = self.sites.setdefault(job.site, SiteState(job.site))
+        try:
+            job.changed = self.runners[job.kind](job, state)
+            outcome = "done"
+        except Exception as e:
+            job.error = str(e)
+            outcome = "failed"
+        with self.condition:
+            job.state = outcome
+            job.finished = time.time()
+            self.condition.notify_all()
+        detail = job.error or f"{len(job.changed)} files changed"
+        print(f"Job {job.id}: {job.kind} {job.site} {job.state} in {job.finished - job.started:.1f} s, {detail}")
+
+    def _forget_old(self):
+        finished = [job_id for job_id, job in self.jobs.items() if job.state in FINISHED]
+        for job_id in finished[:max(0, len(self.jobs) - KEPT_JOBS)]:
+            del self.jobs[job_id]
+
+    def get(self, job_id: int, wait: float = 0) -> Job | None:
+        """The job, after waiting up to wait seconds for it to finish"""
+        with self.condition:
+            self.condition.wait_for(lambda: job_id not in self.jobs or self.jobs[job_id].state in FINISHED,
+                                    timeout=wait)
+            return self.jobs.get(job_id)
+
+    def status(self) -> dict:
+        with self.condition:
+            return {"workers": self.workers,
+                    "sites": {site: [job.id for job in jobs] for site, jobs in self.pending.items()}}
+
+    def run_import(self, job: Job, state: SiteState) -> list[str]:
+        params = job.params
+        vault = params.get("vault") or load_paths().get("obsidian_vault")
+        if not vault or not os.path.isdir(vault):
+            raise ValueError(f"vault {vault!r} does not exist")
+        image_options = ImageOptions() if params.get("optimize_images") else None
+        # The import fans out over its own process pool, so running two at once would gain little
+        with self.cache_lock:
+            if params.get("paths"):
+                changed = import_changes(vault, job.site, params["paths"], manifest=self.manifest,
+                                         image_options=image_options, image_cache=self.image_cache,
+                                         hardlink=params.get("hardlink", False),
+                                         shared_media=params.get("shared_media", False))
+            else:
+                changed = import_vault(vault, job.site, manifest=self.manifest, image_options=image_options,
+                                       image_cache=self.image_cache, hardlink=params.get("hardlink", False),
+                                       shared_media=params.get("shared_media", False))
+            changed.extend(state.update_indexes())
+        state.unpublished.update(changed)
+        return changed
+
+    def run_render(self, job: Job, state: SiteState) -> list[str]:
+        with self.cache_lock:
+            changed = state.render(everything=job.params.get("all", False))
+        state.unpublished.update(changed)
+        return changed
+
+    def run_deploy(self, job: Job, state: SiteState) -> list[str]:
+        deployer = JobDeployer(job.site, job.params.get("public", DEFAULT_PUBLIC), job.params.get("remote", "origin"),
+                               on_output=lambda stream, line: job.log.append(f"[{stream}] {line}"),
+                               cache_lock=self.cache_lock)
+        # Every job thread gets its own event loop
+        if not asyncio.run(deployer.deploy_async(minify=job.params.get("minify", False))):
+            raise Exception("deploy failed, see the log")
+        return []
+
+    def run_publish(self, job: Job, state: SiteState) -> list[str]:
+        from publish import NothingToPublish, publish
+        paths = job.params.get("paths") or sorted(state.unpublished)
+        message = job.params.get("message") or f"Publish {len(paths)} changed files"
+        try:
+            commit = publish(job.site, paths, message,
+                             progress=lambda step, total, text: job.log.append(text))
+        except NothingToPublish as e:
+            job.log.append(str(e))
+            return []
+        state.unpublished.difference_update(paths)
+        job.log.append(f"Published {commit}")
+        return paths
+
+
+class Handler(BaseHTTPRequestHandler):
+    server_version = "markdown-processor"
+
+    def reply(self, status: int, body):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def refuse(self) -> bool:
+        """Turn away requests a web page could have sent. True when a refusal was sent."""
+        if self.headers.get("Host") not in self.server.hosts:
+            self.reply(403, {"error": "unexpected Host header"})
+        elif self.headers.get("Origin") is not None:
+            # The service serves no pages, so any Origin is some web page's
+            self.reply(403, {"error": "cross-origin requests are not accepted"})
+        elif not hmac.compare_digest(self.headers.get("Authorization", ""), f"Bearer {self.server.token}"):
+            self.reply(401, {"error": f"missing or wrong token, see {token_file}"})
+        else:
+            return False
+        return True
+
+    def do_GET(self):
+        if self.refuse():
+            return
+        url = urllib.parse.urlsplit(self.path)
+        parts = url.path.strip("/").split("/")
+        queue = self.server.queue
+        if parts == ["status"]:
+            self.reply(200, queue.status())
+        elif parts == ["jobs"]:
+            self.reply(200, [job.to_dict() for job in list(queue.jobs.values())])
+        elif len(parts) == 2 and parts[0] == "jobs" and parts[1].isdigit():
+            try:
+                wait = float(urllib.parse.parse_qs(url.query).get("wait", ["0"])[0])
+            except ValueError:
+                return self.reply(400, {"error": "wait must be a number of seconds"})
+            job = queue.get(int(parts[1]), wait)
+            if job is None:
+                return self.reply(404, {"error": f"no job {parts[1]}"})
+            self.reply(200, job.to_dict())
+        else:
+            self.reply(404, {"error": f"no such endpoint {url.path}"})
+
+    def do_POST(self):
+        if self.refuse():
+            return
+        if self.headers.get_content_type() != "application/json":
+            return self.reply(415, {"error": "expected an application/json body"})
+        if self.path.rstrip("/") != "/jobs":
+            return self.reply(404, {"error": f"no such endpoint {self.path}"})
+        try:
+            request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            if not isinstance(request, dict):
+                raise ValueError("expected a JSON object")
+            params = {key: value for key, value in request.items() if key not in ("kind", "site")}
+            job = self.server.queue.submit(request.get("kind"), request.get("site"), params)
+        except ValueError as e:
+            return self.reply(400, {"error": str(e)})
+        self.reply(202, job.to_dict())
+
+    def log_message(self, format, *args):
+        # Jobs are reported by the queue; Unix socket peers have no address to log anyway
+        pass
+
+
+class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path: str, timeout: float | None = None):
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+
+def load_token(path: str = token_file, create: bool = False) -> str | None:
+    """The service's API token; with create, one is generated when there is none yet"""
+    try:
+        with open(path, "r") as file:
+            token = file.read().strip()
+        if token:
+            if create:
+                os.chmod(path, 0o600)
+            return token
+    except FileNotFoundError:
+        pass
+    if not create:
+        return None
+    token = secrets.token_urlsafe(32)
+    tmp_path = path + ".tmp"
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w") as file:
+        file.write(token)
+    os.replace(tmp_path, path)
+    return token
+
+
+def make_server(port: int = DEFAULT_PORT, socket_path: str | None = None, workers: int = DEFAULT_WORKERS,
+                token_path: str = token_file):
+    """The service's HTTP server with its job queue, bound but not yet serving"""
+    if socket_path:
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        server = UnixHTTPServer(socket_path, Handler)
+        os.chmod(socket_path, 0o600)
+        server.hosts = {"localhost"}
+    else:
+        # Never listen beyond this machine: the API runs git pushes
+        server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        port = server.server_address[1]
+        # A DNS-rebound page reaches 127.0.0.1 under its own host name
+        server.hosts = {f"127.0.0.1:{port}", f"localhost:{port}"}
+    server.token = load_token(token_path, create=True)
+    server.queue = JobQueue(workers)
+    return server
+
+
+def serve(port: int = DEFAULT_PORT, socket_path: str | None = None, workers: int = DEFAULT_WORKERS):
+    server = make_server(port, socket_path, workers)
+    where = socket_path or f"http://127.0.0.1:{server.server_address[1]}"
+    print(f"Serving jobs on {where} with {workers} workers (Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        server.queue.executor.shutdown(wait=False, cancel_futures=True)
+        if socket_path and os.path.exists(socket_path):
+            os.remove(socket_path)
+
+
+def call(args, method: str, path: str, body: dict | None = None):
+    """Send one request to the service and return (status, decoded JSON reply)"""
+    if args.socket:
+        connection = UnixHTTPConnection(args.socket)
+    else:
+        connection = http.client.HTTPConnection("127.0.0.1", args.port)
+    try:
+        connection.request(method, path, body=json.dumps(body) if body is not None else None,
+                           headers={"Content-Type": "application/json",
+                                    "Authorization": f"Bearer {load_token() or ''}"})
+        response = connection.getresponse()
+        return response.status, json.loads(response.read() or b"null")
+    finally:
+        connection.close()
+
+
+def format_job(job: dict) -> str:
+    line = f"#{job['id']:<4} {job['kind']:<8} {job['state']:<8} {job['site']}"
+    if job["finished"]:
+        line += f"  {job['finished'] - job['started']:.1f} s, {len(job['changed'])} files"
+    if job["error"]:
+        line += f"\n      {job['error']}"
+    return line
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Queue import, render, deploy and publish jobs on a local service")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="Localhost port of the service")
+    parser.add_argument("--socket", help="Use this Unix socket instead of a localhost port")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    server = commands.add_parser("serve", help="run the service")
+    server.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Jobs that may run at once")
+
+    submit = commands.add_parser("submit", help="queue a job")
+    submit.add_argument("kind", choices=["import", "render", "deploy", "publish"])
+    submit.add_argument("--site", help="Hugo site repository (default: the service's configured site repo)")
+    submit.add_argument("--vault", help="import: Obsidian vault (default: configured vault)")
+    submit.add_argument("--paths", nargs="+",
+                        help="import: only these changed vault files; publish: only these site files")
+    submit.add_argument("--optimize-images", action="store_true", help="import: ship resized WebP/AVIF variants")
+    submit.add_argument("--hardlink", action="store_true", help="import: hardlink attachments into the site")
+    submit.add_argument("--shared-media", action="store_true",
+                        help="import: store each attachment once under static/media")
+    submit.add_argument("--all", action="store_true", help="render: re-render every post and listing")
+    submit.add_argument("--minify", action="store_true", help="deploy: minify and precompress public/ first")
+    submit.add_argument("--public", default=DEFAULT_PUBLIC, help="deploy: built site folder in the repository")
+    submit.add_argument("--message", help="publish: commit message")
+    submit.add_argument("--wait", action="store_true", help="Wait for the job to finish and print its log")
+
+    status = commands.add_parser("status", help="show queued and recent jobs")
+    status.add_argument("job", type=int, nargs="?", help="Show one job with its log")
+    status.add_argument("--wait", type=float, default=0, help="Seconds to wait for the job to finish")
+    args = parser.parse_args(argv)
+
+    if args.command == "serve":
+        try:
+            serve(args.port, args.socket, args.workers)
+        except KeyboardInterrupt:
+            print("Stopped serving")
+        return 0
+
+    try:
+        if args.command == "submit":
+            body = {"kind": args.kind, "site": args.site and os.path.abspath(args.site)}
+            for key in ("vault", "paths", "message"):
+                if getattr(args, key):
+                    body[key] = getattr(args, key)
+            if body.get("vault"):
+                body["vault"] = os.path.abspath(body["vault"])
+            if body.get("paths") and args.kind == "import":
+                body["paths"] = [os.path.abspath(path) for path in body["paths"]]
+            body.update(optimize_images=args.optimize_images, hardlink=args.hardlink,
+                        shared_media=args.shared_media, all=args.all,
+                        minify=args.minify, public=args.public)
+            code, reply = call(args, "POST", "/jobs", body)
+            if code == 202 and args.wait:
+                # Poll in slices so a long job does not run into socket timeouts
+                while reply["state"] not in FINISHED:
+                    code, reply = call(args, "GET", f"/jobs/{reply['id']}?wait=30")
+        elif args.job is not None:
+            code, reply = call(args, "GET", f"/jobs/{args.job}?wait={args.wait}")
+        else:
+            code, reply = call(args, "GET", "/jobs")
+    except OSError as e:
+        print(f"Cannot reach the service: {e}")
+        return 1
+
+    if code >= 400:
+        print(f"Error: {reply['error']}")
+        return 1
+    if isinstance(reply, list):
+        for job in reply:
+            print(format_job(job))
+        return 0
+    print(format_job(reply))
+    if args.command == "status" or args.wait:
+        for line in reply["log"]:
+            print(f"  {line}")
+    return 1 if reply["state"] == "failed" else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
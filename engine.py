@@ -0,0 +1,639 @@
+"""
+Headless Obsidian -> Hugo importer shared by obby.py and blog_obsidian.py.
+
+The GUI front-ends build one page bundle from the files dropped on them;
+the CLI converts every eligible note of a vault into
+content/posts/<slug>/index.md bundles, spread over a process pool:
+
+    python engine.py --vault ~/Obsidian --site ~/Projects/site
+"""
+import io
+import json
+import os
+import shutil
+import sys
+from functools import partial
+
+from attachments import AttachmentIndex
+from fastcopy import copy_file
+from manifest import Manifest, file_digest
+from tracing import merge_traced, span, traced_call, tracer
+from wikilinks import IMAGE_EXTENSIONS, LinkRewriter, slugify
+
+config_file = os.path.join(os.path.expanduser('~'), '.markdown_processor_config.json')
+
+PATH_KEYS = ("documents", "obsidian_vault", "site_repo")
+CONTENT_CANDIDATES = (("content", "posts"), ("site", "content", "posts"), ("hugo", "content", "posts"))
+# site repo -> content/posts folder, so repeated lookups cost one isdir
+_content_paths = {}
+
+SKIPPED_DIRS = {".obsidian", ".trash", ".git"}
+
+
+class Cancelled(Exception):
+    """Raised from a progress callback to abort a running import"""
+
+
+def resolve_site_structure(base_path):
+    """
+    Dynamically find or create the Hugo site content structure.
+
+    The answer is remembered for the process and, for the configured site
+    repository, saved in the config file as "content_path"; a remembered
+    folder is trusted as long as it still exists.
+    """
+    cached = _content_paths.get(base_path)
+    if cached is not None and os.path.isdir(cached):
+        return cached
+
+    paths = load_paths()
+    configured = paths.get("site_repo") == base_path
+    saved = paths.get("content_path") if configured else None
+    if saved and saved.startswith(base_path) and os.path.isdir(saved):
+        _content_paths[base_path] = saved
+        return saved
+
+    for parts in CONTENT_CANDIDATES:
+        content_path = os.path.join(base_path, *parts)
+        if os.path.exists(content_path):
+            break
+    else:
+        # If no existing structure, create a default one
+        content_path = os.path.join(base_path, *CONTENT_CANDIDATES[0])
+        os.makedirs(content_path, exist_ok=True)
+
+    _content_paths[base_path] = content_path
+    if configured:
+        save_paths({**paths, "content_path": content_path})
+    return content_path
+
+
+def parse_front_matter(content: str) -> tuple[dict, str]:
+    """
+    Split a note into its front matter and body.
+
+    TOML (+++) front matter, as written by Hugo archetypes, is fully
+    parsed. For YAML (---) only the subset Obsidian writes is understood:
+    scalar ``key: value`` pairs, ``[a, b]`` inline lists and ``- item``
+    block lists.
+    """
+    if content.startswith("+++"):
+        import tomllib
+        end = content.find("\n+++", 3)
+        if end == -1:
+            return {}, content
+        try:
+            meta = tomllib.loads(content[3:end])
+        except tomllib.TOMLDecodeError:
+            return {}, content
+        body = content[end + 4:]
+        return meta, body[1:] if body.startswith("\n") else body
+
+    if not content.startswith("---"):
+        return {}, content
+    end = content.find("\n---", 3)
+    if end == -1:
+        return {}, content
+
+    meta = {}
+    key = None
+    for line in content[3:end].splitlines():
+        if not line.strip() or line.lstrip().startswith("#"):
+            continue
+        stripped = line.strip()
+        if stripped.startswith("- ") and key is not None:
+            if not isinstance(meta.get(key), list):
+                meta[key] = []
+            meta[key].append(_scalar(stripped[2:]))
+            continue
+        if ":" not in line:
+            continue
+        key, value = line.split(":", 1)
+        key = key.strip()
+        value = value.strip()
+        if value.startswith("[") and value.endswith("]"):
+            meta[key] = [_scalar(v) for v in value[1:-1].split(",") if v.strip()]
+        else:
+            meta[key] = _scalar(value) if value else None
+
+    body = content[end + 4:]
+    return meta, body[1:] if body.startswith("\n") else body
+
+
+def _scalar(value: str):
+    value = value.strip().strip('"').strip("'")
+    lowered = value.lower()
+    if lowered in ("true", "yes"):
+        return True
+    if lowered in ("false", "no"):
+        return False
+    return value
+
+
+def is_publishable(meta: dict) -> bool:
+    """A note is imported when it has front matter and is not opted out"""
+    return bool(meta) and meta.get("publish", True) is not False
+
+
+def _write_if_changed(path: str, data: bytes) -> bool:
+    """Write data unless the file already holds exactly these bytes"""
+    try:
+        if os.path.getsize(path) == len(data):
+            with open(path, "rb") as file:
+                if file.read() == data:
+                    return False
+    except FileNotFoundError:
+        pass
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as file:
+        file.write(data)
+    return True
+
+
+def _copy_if_changed(source: str, target: str, hardlink: bool = False) -> bool:
+    """Copy source over target unless both already have the same content"""
+    return copy_file(source, target, hardlink=hardlink) is not None
+
+
+def _remove_stale(target_folder: str, outputs: set[str]) -> list[str]:
+    """Delete files in the bundle that this build did not produce"""
+    removed = []
+    for dirpath, dirnames, filenames in os.walk(target_folder, topdown=False):
+        for filename in filenames:
+            path = os.path.join(dirpath, filename)
+            if os.path.relpath(path, target_folder) not in outputs:
+                os.remove(path)
+                removed.append(path)
+        if dirpath != target_folder and not os.listdir(dirpath):
+            os.rmdir(dirpath)
+    return removed
+
+
+def resolve_attachment(link, note_dir, attachments=None):
+    """Find the file an embed points at through the vault index, else next to the note"""
+    if attachments is not None:
+        source_path = attachments.resolve(link, note_dir)
+        if source_path:
+            return source_path
+    source_path = os.path.join(note_dir, link)
+    return source_path if os.path.exists(source_path) else None
+
+
+def write_bundle(target_folder, markdown_files, image_files=(), featured_image=None, attachments=None,
+                 image_options=None, image_jobs=None, image_cache=None, hardlink=False, progress=None,
+                 links=None, media=None, missing=None):
+    """
+    Build a Hugo page bundle from markdown notes and images.
+
+    Every attachment the notes embed is copied into the bundle, resolved
+    through the vault-wide ``attachments`` index when one is given. Embeds
+    that resolve to no file are left as they are and their links appended
+    to ``missing``, so the bundle can be rebuilt once the file appears. With
+    ``image_options`` raster images are replaced by optimized responsive
+    variants instead; their encode jobs are appended to ``image_jobs`` when
+    the caller batches them, otherwise they run before returning. Encoded
+    images go through ``image_cache`` when one is given. Attachments are
+    hardlinked instead of copied when ``hardlink`` is set and the vault
+    shares a filesystem with the site. With the vault's ``links`` graph,
+    note links point at the post the linked note really publishes to (plain
+    text if it does not) and a Backlinks section lists the posts linking here.
+    With a ``media`` store, embedded attachments and their variants are
+    written once to the site's shared media folder and linked from there.
+
+    ``progress(done, total, message)`` is called as each dropped file is
+    handled; it may raise Cancelled to stop the build part-way.
+
+    The bundle is synced in place: unchanged files are left untouched and
+    files from a previous build that are no longer produced are removed.
+    Returns (inputs, outputs, changed): the source files read, the bundle
+    files produced (relative to the bundle) and the paths written or deleted.
+    """
+    # Only building bundles needs the image stage, so the GUIs start without it
+    from images import encode_image, plan_variants, render_picture, run_jobs
+    os.makedirs(target_folder, exist_ok=True)
+
+    inputs = []
+    outputs = set()
+    changed = []
+    jobs = []
+    handled = set()
+    total = len(markdown_files) + len(image_files) + (1 if featured_image else 0)
+    done = 0
+
+    def report(message, step=0):
+        nonlocal done
+        done += step
+        if progress is not None:
+            progress(done, total, message)
+
+    def copy_into_bundle(source, name, shared=False):
+        target = os.path.normpath(os.path.join(target_folder, name))
+        inputs.append(source)
+        outputs.add(os.path.normpath(name))
+        with span("copy attachment", file=name):
+            if shared:
+                # Store files are named after their content, so one that exists is already right;
+                # a hardlink would let a later edit in the vault change it under its old name
+                copied = not os.path.exists(target) and _copy_if_changed(source, target)
+            else:
+                copied = _copy_if_changed(source, target, hardlink)
+        if copied:
+            changed.append(target)
+        report(f"Copied {name}")
+
+    def add_variants(source, variants):
+        inputs.append(source)
+        # Also keys the variant stamps, so a quality or width change re-encodes
+        digest = file_digest(source)
+        for variant in variants:
+            outputs.add(os.path.normpath(variant["name"]))
+            jobs.append({"source": source, "target": os.path.normpath(os.path.join(target_folder, variant["name"])),
+                         "width": variant["width"], "format": variant["format"],
+                         "quality": image_options.quality, "digest": digest,
+                         "cache_dir": image_cache.root if image_cache else None})
+
+    for filepath in markdown_files:
+        with span("read markdown", note=filepath), open(filepath, "r", encoding="utf-8") as file:
+            content = file.read()
+        inputs.append(filepath)
+        note_dir = os.path.dirname(filepath)
+        sources = {}
+        optimized = {}
+
+        def published_name(link):
+            # Where an embed is written, relative to the bundle: next to index.md or in the media store
+            return media.relative_path(sources[link], target_folder) if media is not None else link
+
+        def resolve(link):
+            sources[link] = resolve_attachment(link, note_dir, attachments)
+            if not sources[link]:
+                if missing is not None and link not in missing:
+                    missing.append(link)
+                return None
+            if media is not None:
+                return media.url(media.name(sources[link]))
+            return link
+
+        def render_image(link, alt, width, height):
+            if image_options is None or not sources.get(link):
+                return None
+            if link not in optimized:
+                with span("plan image variants", file=link):
+                    optimized[link] = plan_variants(sources[link], published_name(link), image_options)
+            if not optimized[link]:
+                return None
+            variants = optimized[link]
+            if media is not None:
+                variants = [{**variant, "name": media.url(variant["name"])} for variant in variants]
+            return render_picture(variants, alt, width, height)
+
+        resolve_note = partial(links.note_url, filepath) if links is not None else None
+        rewriter = LinkRewriter(resolve_attachment=resolve, resolve_note=resolve_note, render_image=render_image)
+        with span("rewrite links", note=filepath):
+            content, embeds = rewriter.rewrite(content)
+            backlinks = links.backlinks_section(filepath) if links is not None else ""
+            if backlinks:
+                content = f"{content.rstrip()}\n\n{backlinks}"
+        for link in embeds:
+            if os.path.normpath(published_name(link)) in handled:
+                continue
+            handled.add(os.path.normpath(published_name(link)))
+            if optimized.get(link):
+                add_variants(sources[link], optimized[link])
+            else:
+                copy_into_bundle(sources[link], published_name(link), shared=media is not None)
+
+        target_md_path = os.path.join(target_folder, "index.md")
+        outputs.add("index.md")
+        with span("write index.md", note=filepath):
+            written = _write_if_changed(target_md_path, content.encode("utf-8"))
+        if written:
+            changed.append(target_md_path)
+        report(f"Converted {os.path.basename(filepath)}", 1)
+
+    for filepath in image_files:
+        if os.path.basename(filepath) not in handled:
+            copy_into_bundle(filepath, os.path.basename(filepath))
+        report(f"Added {os.path.basename(filepath)}", 1)
+
+    if featured_image and os.path.exists(featured_image):
+        if image_options is not None:
+            add_variants(featured_image, [{"name": "featured.webp", "format": "webp",
+                                           "width": image_options.widths[-1]}])
+        elif not featured_image.lower().endswith('.png'):
+            # Convert to PNG if not already
+            params = {"format": "png"}
+            inputs.append(featured_image)
+            outputs.add("featured.png")
+            featured_target_path = os.path.join(target_folder, "featured.png")
+            with span("convert featured image"):
+                if image_cache is not None:
+                    converted = image_cache.get_or_create(file_digest(featured_image), params,
+                                                          lambda path: encode_image(featured_image, path, params))
+                    updated = _copy_if_changed(converted, featured_target_path)
+                else:
+                    buffer = io.BytesIO()
+                    encode_image(featured_image, buffer, params)
+                    updated = _write_if_changed(featured_target_path, buffer.getvalue())
+            if updated:
+                changed.append(featured_target_path)
+        else:
+            copy_into_bundle(featured_image, "featured.png")
+        report("Added featured image", 1)
+
+    changed.extend(_remove_stale(target_folder, outputs))
+    if image_jobs is not None:
+        image_jobs.extend(jobs)
+    else:
+        changed.extend(run_jobs(jobs, cache=image_cache, progress=progress))
+    return inputs, sorted(outputs), changed
+
+
+def sync_bundle(manifest, target_folder, markdown_files, image_files=(), featured_image=None,
+                attachments=None, image_options=None, image_cache=None, hardlink=False, progress=None,
+                links=None, media=None, **extra):
+    """
+    Rebuild a page bundle only if its sources changed since the manifest
+    last saw it. Returns the paths written or deleted.
+    """
+    roots = [*markdown_files, *image_files, *([featured_image] if featured_image else [])]
+    settings = bundle_settings(image_options, media)
+
+    def resolve(link):
+        return any(resolve_attachment(link, os.path.dirname(path), attachments) for path in markdown_files)
+
+    if manifest.is_fresh(target_folder, roots, settings, resolve):
+        return []
+    missing = []
+    inputs, outputs, changed = write_bundle(target_folder, markdown_files, image_files, featured_image,
+                                            attachments, image_options, image_cache=image_cache,
+                                            hardlink=hardlink, progress=progress, links=links, media=media,
+                                            missing=missing)
+    manifest.record(target_folder, roots, inputs, outputs, settings, missing=missing, **extra)
+    return changed
+
+
+def bundle_settings(image_options=None, media=None) -> dict | None:
+    """What a bundle's manifest entry records about how it was built, so changing it rebuilds the bundle"""
+    settings = image_options.settings() if image_options else {}
+    if media is not None:
+        settings["shared_media"] = True
+    return settings or None
+
+
+def note_slug(note_path: str) -> str | None:
+    """The post folder a note publishes to, or None if it is not publishable"""
+    try:
+        with open(note_path, "r", encoding="utf-8") as file:
+            meta, _ = parse_front_matter(file.read())
+    except (FileNotFoundError, UnicodeDecodeError):
+        return None
+    if not is_publishable(meta):
+        return None
+    return meta_slug(meta, note_path)
+
+
+def meta_slug(meta: dict, note_path: str) -> str:
+    return slugify(str(meta.get("slug") or os.path.splitext(os.path.basename(note_path))[0]))
+
+
+def convert_note(note, posts_base_path, attachments=None, image_options=None, image_cache=None,
+                 hardlink=False, links=None, media=None):
+    """
+    Worker: convert one (note path, slug) pair into its page bundle.
+
+    Image encodes are returned rather than run so the parent can batch
+    them on its own pool.
+    """
+    note_path, slug = note
+    target_folder = os.path.join(posts_base_path, slug)
+    image_jobs = []
+    missing = []
+    inputs, outputs, changed = write_bundle(target_folder, [note_path], attachments=attachments,
+                                            image_options=image_options, image_jobs=image_jobs,
+                                            image_cache=image_cache, hardlink=hardlink, links=links, media=media,
+                                            missing=missing)
+    return note_path, target_folder, inputs, outputs, changed, image_jobs, missing
+
+
+def import_vault(vault, site_repo, workers=None, manifest=None, image_options=None, image_cache=None,
+                 hardlink=False, shared_media=False):
+    """
+    Convert every publishable note in the vault, in parallel.
+
+    With ``image_options`` the image encodes of all bundles run as one
+    batch on the pool once the notes are converted. With ``shared_media``
+    embedded attachments are stored once in the site's media folder, and
+    media files no post links to any more are deleted.
+
+    Notes whose sources are unchanged since the last import are skipped,
+    unless a note they link to or that links to them changed, and bundles
+    of notes that left the vault are deleted. Only notes changed since the
+    last import are re-read. Returns the paths written or deleted.
+    """
+    # link_graph builds on this module, so it is imported late
+    from link_graph import LinkGraph
+    from images import run_jobs
+    from media import MediaStore
+    manifest = manifest or Manifest.load()
+    vault = os.path.abspath(vault)
+    posts_base_path = resolve_site_structure(site_repo)
+    with span("find notes"):
+        links = LinkGraph.load(vault, refresh=False)
+        link_changes = links.refresh()
+        notes = links.published()
+
+    media = MediaStore(site_repo) if shared_media else None
+    settings = bundle_settings(image_options, media)
+    targets = {os.path.abspath(os.path.join(posts_base_path, slug)) for _, slug in notes}
+    relinked = links.affected(link_changes)
+    with span("attachment index"):
+        attachments = AttachmentIndex.load(vault)
+    pending = [(note_path, slug) for note_path, slug in notes
+               if note_path in relinked
+               or not manifest.is_fresh(os.path.join(posts_base_path, slug), [note_path], settings,
+                                        partial(resolve_attachment, note_dir=os.path.dirname(note_path),
+                                                attachments=attachments))]
+
+    worker = partial(convert_note, posts_base_path=posts_base_path, attachments=attachments,
+                     image_options=image_options, image_cache=image_cache, hardlink=hardlink, links=links,
+                     media=media)
+    if workers == 1 or len(pending) <= 1:
+        results = [worker(note) for note in pending]
+    else:
+        chunksize = max(1, len(pending) // ((workers or os.cpu_count() or 1) * 4))
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(merge_traced(executor.map(partial(traced_call, worker, tracer.enabled), pending,
+                                                     chunksize=chunksize)))
+
+    changed = []
+    image_jobs = []
+    for note_path, target_folder, inputs, outputs, written, jobs, missing in results:
+        manifest.record(target_folder, [note_path], inputs, outputs, settings, missing=missing, vault=vault)
+        changed.extend(written)
+        image_jobs.extend(jobs)
+    changed.extend(run_jobs(image_jobs, workers, image_cache))
+
+    # Drop bundles whose note was deleted, unpublished or renamed
+    posts_dir = os.path.abspath(posts_base_path)
+    for target_folder, bundle in list(manifest.bundles.items()):
+        if bundle.get("vault") != vault or os.path.dirname(target_folder) != posts_dir:
+            continue
+        if target_folder not in targets:
+            if os.path.isdir(target_folder):
+                shutil.rmtree(target_folder)
+                changed.append(target_folder)
+            manifest.forget(target_folder)
+    # Also run with shared media off, so switching it off leaves no orphans behind
+    with span("collect media"):
+        changed.extend(MediaStore(site_repo).collect_garbage(posts_dir))
+
+    # Saved last, so an interrupted import still rebuilds the relinked notes next time
+    if link_changes:
+        links.save()
+    manifest.save()
+    return changed
+
+
+def import_changes(vault, site_repo, paths, manifest=None, image_options=None, image_cache=None,
+                   hardlink=False, shared_media=False):
+    """
+    Re-render only the bundles affected by a set of changed vault paths.
+
+    Changed notes are reconverted (or their bundle removed if they were
+    deleted or unpublished); changed attachments rebuild every bundle that
+    embeds them, and notes linking to or linked from a changed note get
+    their links and backlinks redone. Returns the paths written or deleted.
+    """
+    from images import run_jobs
+    from link_graph import LinkGraph
+    from media import MediaStore
+    manifest = manifest or Manifest.load()
+    vault = os.path.abspath(vault)
+    posts_dir = os.path.abspath(resolve_site_structure(site_repo))
+    media = MediaStore(site_repo) if shared_media else None
+    settings = bundle_settings(image_options, media)
+    paths = {os.path.abspath(path) for path in paths}
+
+    vault_bundles = {target_folder: bundle for target_folder, bundle in manifest.bundles.items()
+                     if bundle.get("vault") == vault and os.path.dirname(target_folder) == posts_dir}
+    links = LinkGraph.load(vault, refresh=False)
+    link_changes = links.refresh(paths)
+    notes = {path for path in paths if path.endswith(".md")} | links.affected(link_changes)
+    added = {os.path.basename(path).lower() for path in paths}
+    for target_folder, bundle in vault_bundles.items():
+        # Also rebuild bundles waiting for an embed by the name of a file that just appeared
+        if paths.intersection(bundle["inputs"]) or any(os.path.basename(link.replace("/", os.sep)).lower() in added
+                                                       for link in bundle.get("missing", ())):
+            notes.update(bundle["roots"])
+
+    changed = []
+    image_jobs = []
+    attachments = AttachmentIndex.load(vault)
+    for note_path in sorted(notes):
+        slug = note_slug(note_path)
+        # A renamed slug, a deleted or an unpublished note leaves an old bundle behind
+        for target_folder, bundle in vault_bundles.items():
+            if bundle["roots"] == [note_path] and os.path.basename(target_folder) != slug:
+                if os.path.isdir(target_folder):
+                    shutil.rmtree(target_folder)
+                    changed.append(target_folder)
+                manifest.forget(target_folder)
+        if slug is None:
+            continue
+        owner = vault_bundles.get(os.path.join(posts_dir, slug))
+        if owner is not None and owner["roots"] != [note_path] and os.path.exists(owner["roots"][0]):
+            print(f"Skipping {note_path}: slug '{slug}' already used by {owner['roots'][0]}")
+            continue
+        _, target_folder, inputs, outputs, written, jobs, missing = convert_note(
+            (note_path, slug), posts_dir, attachments, image_options, image_cache, hardlink, links, media)
+        manifest.record(target_folder, [note_path], inputs, outputs, settings, missing=missing, vault=vault)
+        changed.extend(written)
+        image_jobs.extend(jobs)
+
+    changed.extend(run_jobs(image_jobs, cache=image_cache))
+    if link_changes:
+        links.save()
+    manifest.save()
+    return changed
+
+
+def load_paths():
+    """Read the paths saved by obby.py, if any"""
+    if os.path.exists(config_file):
+        try:
+            with open(config_file, "r") as file:
+                return json.load(file)
+        except json.JSONDecodeError:
+            pass
+    return {}
+
+
+def save_paths(paths: dict):
+    tmp_path = config_file + ".tmp"
+    with open(tmp_path, "w") as file:
+        json.dump(paths, file, indent=4)
+    os.replace(tmp_path, config_file)
+
+
+def missing_paths(paths: dict) -> list[str]:
+    """The configured folders (documents, vault, site) that are unset or gone"""
+    return [key for key in PATH_KEYS if not paths.get(key) or not os.path.isdir(paths[key])]
+
+
+def main(argv=None):
+    import argparse
+    from image_cache import DEFAULT_MAX_BYTES, ImageCache
+    from images import DEFAULT_QUALITY, ImageOptions
+    paths = load_paths()
+    parser = argparse.ArgumentParser(description="Import an Obsidian vault into a Hugo site")
+    parser.add_argument("--vault", default=paths.get("obsidian_vault"),
+                        help="Obsidian vault to import (default: configured vault)")
+    parser.add_argument("--site", default=paths.get("site_repo"),
+                        help="Hugo site repository (default: configured site repo)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Number of worker processes (default: one per CPU)")
+    parser.add_argument("--optimize-images", action="store_true",
+                        help="Ship resized WebP/AVIF variants instead of the original images")
+    parser.add_argument("--quality", type=int, default=DEFAULT_QUALITY,
+                        help="Encoder quality for optimized images")
+    parser.add_argument("--cache-size", type=int, default=DEFAULT_MAX_BYTES // (1024 * 1024),
+                        help="Encoded image cache cap in MiB (0 disables the cache)")
+    parser.add_argument("--hardlink", action="store_true",
+                        help="Hardlink attachments into the site instead of copying them")
+    parser.add_argument("--shared-media", action="store_true",
+                        help="Store each embedded attachment once under static/media, named by its hash")
+    parser.add_argument("--trace", metavar="FILE",
+                        help="Write a Chrome trace of every stage to FILE and print a timing summary")
+    args = parser.parse_args(argv)
+
+    if not args.vault or not os.path.isdir(args.vault):
+        parser.error("vault path does not exist, pass --vault")
+    if not args.site or not os.path.isdir(args.site):
+        parser.error("site repository does not exist, pass --site")
+    if args.trace:
+        tracer.enable(args.trace)
+
+    image_options = ImageOptions(quality=args.quality) if args.optimize_images else None
+    image_cache = ImageCache(max_bytes=args.cache_size * 1024 * 1024) if args.cache_size else None
+    with span("import vault"):
+        changed = import_vault(args.vault, args.site, workers=args.workers, image_options=image_options,
+                               image_cache=image_cache, hardlink=args.hardlink, shared_media=args.shared_media)
+    # search_index and related build on this module, so they are imported late
+    from related import RelatedPosts
+    from search_index import SearchIndex
+    with span("search index"):
+        changed.extend(SearchIndex.load(args.site).update())
+    with span("related posts"):
+        changed.extend(RelatedPosts(args.site).update())
+    for path in changed:
+        print(f"Updated {path}")
+    print(f"{len(changed)} files changed")
+    if image_cache is not None and image_options is not None:
+        print(image_cache.summary())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,119 @@
+"""
+Copy layer for attachments.
+
+Tries the cheapest way to get identical bytes at the target, in order:
+skip (target already identical), reflink (FICLONE, copy-on-write on
+btrfs/XFS), hardlink (only when asked for, since both names then share
+one inode), copy_file_range / sendfile in-kernel copies, and finally a
+plain chunked read/write loop. Targets are written to a temp name and
+renamed into place, so a bundle never holds a half-copied file.
+"""
+import os
+import shutil
+import sys
+
+from manifest import file_digest
+
+FICLONE = 0x40049409  # _IOW(0x94, 9, int) from linux/fs.h
+CHUNK_SIZE = 1024 * 1024
+
+
+def is_identical(source: str, target: str) -> bool:
+    """
+    Same file, or same size and either the same mtime (copies carry the
+    source mtime over) or the same sha256.
+    """
+    try:
+        source_stat = os.stat(source)
+        target_stat = os.stat(target)
+    except FileNotFoundError:
+        return False
+    if os.path.samestat(source_stat, target_stat):
+        return True
+    if source_stat.st_size != target_stat.st_size:
+        return False
+    if source_stat.st_mtime_ns == target_stat.st_mtime_ns:
+        return True
+    return file_digest(source) == file_digest(target)
+
+
+def copy_file(source: str, target: str, hardlink: bool = False) -> str | None:
+    """
+    Make target hold the content of source.
+
+    Returns the method used ("reflink", "hardlink", "copy_file_range",
+    "sendfile" or "copy"), or None when the target was already identical.
+    """
+    if is_identical(source, target):
+        return None
+    os.makedirs(os.path.dirname(target) or ".", exist_ok=True)
+    tmp_target = f"{target}.{os.getpid()}.tmp"
+    try:
+        method = _link(source, tmp_target) if hardlink else None
+        if method is None:
+            method = _copy_data(source, tmp_target)
+            shutil.copystat(source, tmp_target)
+        os.replace(tmp_target, target)
+    finally:
+        if os.path.lexists(tmp_target):
+            os.remove(tmp_target)
+    return method
+
+
+def _link(source: str, target: str) -> str | None:
+    try:
+        os.link(source, target)
+        return "hardlink"
+    except OSError:
+        # Different filesystem, or links unsupported
+        return None
+
+
+def _copy_data(source: str, target: str) -> str:
+    with open(source, "rb") as src, open(target, "wb") as dst:
+        if _reflink(src, dst):
+            return "reflink"
+        size = os.fstat(src.fileno()).st_size
+        if hasattr(os, "copy_file_range") and _kernel_copy(os.copy_file_range, src, dst, size):
+            return "copy_file_range"
+        if sys.platform.startswith("linux") and _kernel_copy(_sendfile, src, dst, size):
+            return "sendfile"
+        shutil.copyfileobj(src, dst, CHUNK_SIZE)
+        return "copy"
+
+
+def _reflink(src, dst) -> bool:
+    if not sys.platform.startswith("linux"):
+        return False
+    import fcntl
+    try:
+        fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+        return True
+    except OSError:
+        return False
+
+
+def _sendfile(in_fd, out_fd, count):
+    return os.sendfile(out_fd, in_fd, None, count)
+
+
+def _kernel_copy(copy, src, dst, size: int) -> bool:
+    """
+    Drive copy_file_range/sendfile to completion. On failure both files are
+    rewound so the next method starts clean.
+    """
+    offset = 0
+    try:
+        while offset < size:
+            sent = copy(src.fileno(), dst.fileno(), min(size - offset, 1 << 30))
+            if sent == 0:
+                break
+            offset += sent
+    except OSError:
+        pass
+    if offset == size:
+        return True
+    src.seek(0)
+    dst.seek(0)
+    dst.truncate()
+    return False
@@ -0,0 +1,92 @@
+"""
+Content-addressed on-disk cache of encoded images.
+
+Entries are keyed by the sha256 of the source file plus the transform
+parameters (format, width, quality), so the same picture imported twice,
+renamed, or rebuilt into another bundle is only decoded and encoded once.
+The cache is capped in size; the least recently used entries are evicted
+first (entry mtimes are bumped on every hit).
+"""
+import hashlib
+import json
+import os
+
+cache_dir = os.path.join(os.path.expanduser('~'), '.markdown_processor_cache', 'images')
+
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+
+class ImageCache:
+    def __init__(self, root: str = cache_dir, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(source_digest: str, params: dict) -> str:
+        blob = json.dumps(params, sort_keys=True).encode("utf-8")
+        return hashlib.sha256(source_digest.encode("ascii") + b"\0" + blob).hexdigest()
+
+    def path_for(self, key: str, extension: str) -> str:
+        return os.path.join(self.root, key[:2], f"{key}.{extension}")
+
+    def get_or_create(self, source_digest: str, params: dict, produce) -> str:
+        """
+        Return the cached file for this source and transform, calling
+        produce(path) to encode it on a miss.
+        """
+        path = self.path_for(self.key(source_digest, params), params["format"])
+        try:
+            os.utime(path)
+            self.hits += 1
+            return path
+        except FileNotFoundError:
+            pass
+
+        self.misses += 1
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Unique temp name: several workers may race on the same entry
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        produce(tmp_path)
+        os.replace(tmp_path, path)
+        return path
+
+    def size(self) -> int:
+        return sum(size for _, size, _ in self._entries())
+
+    def evict(self) -> int:
+        """Delete least recently used entries until under max_bytes. Returns bytes freed."""
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        freed = 0
+        for path, size, _ in sorted(entries, key=lambda entry: entry[2]):
+            if total - freed <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                freed += size
+            except FileNotFoundError:
+                pass
+        return freed
+
+    def _entries(self) -> list[tuple[str, int, int]]:
+        entries = []
+        if not os.path.isdir(self.root):
+            return entries
+        with os.scandir(self.root) as shards:
+            for shard in shards:
+                if not shard.is_dir():
+                    continue
+                with os.scandir(shard.path) as files:
+                    for entry in files:
+                        if entry.name.endswith(".tmp"):
+                            continue
+                        stat = entry.stat()
+                        entries.append((entry.path, stat.st_size, stat.st_mtime_ns))
+        return entries
+
+    def summary(self) -> str:
+        total = self.hits + self.misses
+        rate = f" ({self.hits / total:.0%} hit rate)" if total else ""
+        return f"Image cache: {self.hits} hits, {self.misses} misses{rate}"
@@ -0,0 +1,250 @@
+"""
+Image optimization stage for page bundles.
+
+Raster attachments are decoded once, stripped of metadata, downsized to a
+few responsive widths and re-encoded as WebP (plus AVIF when Pillow was
+built with it). Planning the variants only reads the image header, so the
+markdown can be rewritten immediately; the actual encodes are collected as
+jobs and run together on a process pool, backed by the content-addressed
+ImageCache so unchanged pictures are never re-encoded.
+
+Every variant written is stamped in ~/.markdown_processor_variants.json
+with its encode key (source digest plus format, width and quality), so a
+variant is only reused while it was made from the same source with the
+same settings.
+"""
+import json
+import os
+import threading
+from functools import partial
+from html import escape
+
+from fastcopy import copy_file
+from image_cache import ImageCache
+from tracing import merge_traced, span, traced_call, tracer
+from wikilinks import encode_url
+
+OPTIMIZABLE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".webp")
+DEFAULT_WIDTHS = (330, 660, 1024, 1320)
+DEFAULT_QUALITY = 80
+MIME_TYPES = {"avif": "image/avif", "webp": "image/webp"}
+
+variant_stamps_file = os.path.join(os.path.expanduser('~'), '.markdown_processor_variants.json')
+# Daemon jobs save stamps from several threads; each save re-reads the file under this lock
+_stamps_lock = threading.Lock()
+
+
+def avif_supported() -> bool:
+    """Pillow >= 11.3 encodes AVIF natively, older versions need pillow-avif-plugin"""
+    try:
+        from PIL import features
+        if "avif" in features.modules and features.check("avif"):
+            return True
+    except ImportError:
+        return False
+    try:
+        import pillow_avif  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+class ImageOptions:
+    def __init__(self, widths=DEFAULT_WIDTHS, formats=None, quality=DEFAULT_QUALITY):
+        self.widths = tuple(sorted(widths))
+        self.formats = tuple(formats) if formats else (("avif", "webp") if avif_supported() else ("webp",))
+        self.quality = quality
+
+    def settings(self) -> dict:
+        """What a bundle's manifest entry records, so changing options rebuilds it"""
+        return {"widths": list(self.widths), "formats": list(self.formats), "quality": self.quality}
+
+
+def plan_variants(source: str, name: str, options: ImageOptions) -> list[dict]:
+    """
+    Decide which resized copies to emit for an attachment without decoding it.
+
+    `name` is the bundle-relative path of the original; each variant is
+    {"name", "width", "format"}. Returns [] for images Pillow cannot read.
+    """
+    if not name.lower().endswith(OPTIMIZABLE_EXTENSIONS):
+        return []
+    from PIL import Image, UnidentifiedImageError
+    try:
+        with Image.open(source) as img:
+            original_width = img.width
+            if getattr(img, "is_animated", False):
+                return []
+    except (OSError, UnidentifiedImageError):
+        return []
+
+    widths = [w for w in options.widths if w < original_width]
+    if original_width <= options.widths[-1]:
+        widths.append(original_width)
+    stem = os.path.splitext(name)[0]
+    return [
+        {"name": f"{stem}-{width}.{fmt}", "width": width, "format": fmt}
+        for fmt in options.formats
+        for width in widths
+    ]
+
+
+def render_picture(variants: list[dict], alt: str, width=None, height=None) -> str:
+    """A <picture> with one srcset per format, falling back to a mid-size WebP/AVIF"""
+    by_format = {}
+    for variant in variants:
+        by_format.setdefault(variant["format"], []).append(variant)
+
+    sources = []
+    for fmt, items in by_format.items():
+        srcset = ", ".join(f"{encode_url(v['name'])} {v['width']}w" for v in items)
+        sources.append(f'<source type="{MIME_TYPES[fmt]}" srcset="{srcset}">')
+
+    fallback_items = by_format.get("webp") or next(iter(by_format.values()))
+    fallback = fallback_items[min(1, len(fallback_items) - 1)]
+    size_attrs = f' width="{width}"' if width else ""
+    size_attrs += f' height="{height}"' if height else ""
+    img = f'<img src="{encode_url(fallback["name"])}" alt="{escape(alt)}" loading="lazy"{size_attrs}>'
+    return f"<picture>{''.join(sources)}{img}</picture>"
+
+
+def encode_image(source: str, target: str, params: dict):
+    """Decode source and write it to target with params {format, width, quality}"""
+    from PIL import Image, ImageOps
+    with Image.open(source) as img:
+        img = ImageOps.exif_transpose(img)
+        if img.mode not in ("RGB", "RGBA"):
+            img = img.convert("RGBA" if "transparency" in img.info or img.mode in ("LA", "P") else "RGB")
+        img.info.clear()
+        width = params.get("width")
+        if width and img.width > width:
+            height = round(img.height * width / img.width)
+            img = img.resize((width, height), Image.LANCZOS)
+        # With info cleared and no exif/icc arguments, no metadata is written
+        options = {"quality": params["quality"], "method": 4} if params.get("quality") else {}
+        img.save(target, params["format"].upper(), **options)
+
+
+def encode_params(job: dict) -> dict:
+    return {"format": job["format"], "width": job["width"], "quality": job["quality"]}
+
+
+def variant_key(job: dict) -> str | None:
+    """What a variant is made from: the source digest and the encode parameters"""
+    return ImageCache.key(job["digest"], encode_params(job)) if job.get("digest") else None
+
+
+class VariantStamps:
+    """The encode key of every variant written, by absolute target path"""
+
+    def __init__(self, path: str = variant_stamps_file):
+        self.path = path
+        self.keys = {}
+        # Stamped since loading: what save merges into the file as it is then
+        self.recorded = {}
+
+    @classmethod
+    def load(cls, path: str = variant_stamps_file) -> "VariantStamps":
+        stamps = cls(path)
+        if os.path.exists(path):
+            try:
+                with open(path, "r") as file:
+                    stamps.keys = json.load(file)
+            except (json.JSONDecodeError, OSError):
+                stamps.keys = {}
+        return stamps
+
+    def save(self):
+        """Merge the stamps recorded since loading into the file, keeping those other runs saved meanwhile"""
+        with _stamps_lock:
+            keys = {**VariantStamps.load(self.path).keys, **self.recorded}
+            # Variants deleted since (stale bundle files, dropped posts) are forgotten
+            self.keys = {target: key for target, key in keys.items() if os.path.exists(target)}
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w") as file:
+                file.write(json.dumps(self.keys))
+            os.replace(tmp_path, self.path)
+            self.recorded = {}
+
+    def is_current(self, job: dict) -> bool:
+        target = os.path.abspath(job["target"])
+        key = variant_key(job)
+        return key is not None and self.keys.get(target) == key and os.path.exists(target)
+
+    def record(self, job: dict):
+        key = variant_key(job)
+        if key is not None:
+            self.keys[os.path.abspath(job["target"])] = key
+            self.recorded[os.path.abspath(job["target"])] = key
+
+
+def encode_variant(job: dict) -> tuple[str | None, str]:
+    """
+    Worker: write one resized, metadata-free variant, through the cache.
+
+    Returns (path written or None, "hit" | "miss").
+    """
+    source, target = job["source"], job["target"]
+    params = encode_params(job)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    with span("encode image", target=os.path.basename(target)):
+        if job.get("cache_dir") is None:
+            # Unique temp name, like the cache's: a stale worker of a cancelled run may still be writing
+            tmp_target = f"{target}.{os.getpid()}.tmp"
+            encode_image(source, tmp_target, params)
+            os.replace(tmp_target, target)
+            return target, "miss"
+
+        cache = ImageCache(job["cache_dir"])
+        cached = cache.get_or_create(job["digest"], params, lambda path: encode_image(source, path, params))
+        copy_file(cached, target)
+        return target, "hit" if cache.hits else "miss"
+
+
+def run_jobs(jobs: list[dict], workers=None, cache: ImageCache | None = None, progress=None,
+             stamps_path: str = variant_stamps_file) -> list[str]:
+    """
+    Encode all variants on a process pool, returning the files written.
+
+    Variants already encoded from the same source digest with the same
+    parameters are skipped. Hits and misses are added to `cache`'s
+    counters, which is then trimmed back under its size cap.
+    ``progress(done, total, message)`` is called per finished encode; if it
+    raises, queued encodes are cancelled.
+    """
+    if not jobs:
+        return []
+    stamps = VariantStamps.load(stamps_path)
+    # A picture embedded twice or shared through the media store yields several jobs for one target
+    jobs = list({os.path.abspath(job["target"]): job for job in jobs if not stamps.is_current(job)}.values())
+    if not jobs:
+        return []
+    results = []
+
+    def collect(outcomes):
+        for job, outcome in zip(jobs, outcomes):
+            results.append(outcome)
+            if progress is not None:
+                progress(len(results), len(jobs), f"Encoded {os.path.basename(job['target'])}")
+
+    try:
+        if workers == 1 or len(jobs) == 1:
+            collect(encode_variant(job) for job in jobs)
+        else:
+            from concurrent.futures import ProcessPoolExecutor
+            executor = ProcessPoolExecutor(max_workers=workers)
+            try:
+                collect(merge_traced(executor.map(partial(traced_call, encode_variant, tracer.enabled), jobs)))
+            finally:
+                executor.shutdown(cancel_futures=True)
+    finally:
+        # Stamp what finished, even when the rest was cancelled
+        for job in jobs[:len(results)]:
+            stamps.record(job)
+        stamps.save()
+
+    if cache is not None:
+        cache.hits += sum(1 for _, status in results if status == "hit")
+        cache.misses += sum(1 for _, status in results if status == "miss")
+        cache.evict()
+    return [path for path, _ in results if path]
@@ -0,0 +1,253 @@
+"""
+Persistent link graph of an Obsidian vault's notes.
+
+Every note is mapped to the post it publishes to (None while it is not
+publishable), its title and the notes it links to; the reverse edges give
+each note its backlinks. [[Other Note]] then resolves to the post Other
+Note really publishes under, links to unpublished or missing notes render
+as plain text, and every post can list the posts linking to it.
+
+The graph is cached next to ~/.markdown_processor_config.json. A refresh
+stats the notes and re-reads only those whose (mtime, size) changed, and
+affected() turns those changes into the notes whose page now reads
+differently: the changed ones, the ones linking to a note that appeared,
+vanished or moved, and the ones a changed note started or stopped
+linking to.
+"""
+import json
+import os
+
+from engine import SKIPPED_DIRS, is_publishable, meta_slug, parse_front_matter
+from wikilinks import ATTACHMENT_EXTENSIONS, TOKEN_RE, default_note_url, split_link
+
+link_graph_file = os.path.join(os.path.expanduser('~'), '.markdown_processor_links.json')
+
+LINK_GRAPH_VERSION = 1
+BACKLINKS_HEADING = "## Backlinks"
+
+
+def link_key(target: str) -> str:
+    """What a link matches notes by: the file name without .md, case-insensitively"""
+    name = os.path.basename(target.replace("/", os.sep)).lower()
+    return name[:-3] if name.endswith(".md") else name
+
+
+def read_note(note_path: str) -> dict:
+    """Title, slug (None if not publishable) and the distinct note links of one note"""
+    title = os.path.splitext(os.path.basename(note_path))[0]
+    try:
+        with open(note_path, "r", encoding="utf-8") as file:
+            content = file.read()
+    except UnicodeDecodeError:
+        return {"title": title, "slug": None, "links": []}
+    meta, _ = parse_front_matter(content)
+    links = set()
+    for match in TOKEN_RE.finditer(content):
+        if match.group("code"):
+            continue
+        target, _, _ = split_link(match.group("inner"))
+        if target and not target.lower().endswith(ATTACHMENT_EXTENSIONS):
+            links.add(target)
+    return {
+        "title": str(meta.get("title") or title),
+        "slug": meta_slug(meta, note_path) if is_publishable(meta) else None,
+        "links": sorted(links),
+    }
+
+
+def _walk_order(rel_path: str) -> tuple:
+    # os.walk with sorted folders: a folder's notes, then its subfolders
+    directory, name = os.path.split(rel_path)
+    return tuple(directory.split(os.sep)) if directory else (), name
+
+
+class LinkGraph:
+    def __init__(self, vault: str, cache_path: str = link_graph_file):
+        self.vault = os.path.abspath(vault)
+        self.cache_path = cache_path
+        # vault-relative note path -> {"stamp", "title", "slug", "links"}
+        self.notes = {}
+        self.by_name = {}
+        self.by_key = {}
+
+    @classmethod
+    def load(cls, vault: str, cache_path: str = link_graph_file, refresh: bool = True) -> "LinkGraph":
+        """Load the cached graph and, unless refresh is False, bring it up to date"""
+        graph = cls(vault, cache_path)
+        if os.path.exists(cache_path):
+            try:
+                with open(cache_path, "r") as file:
+                    data = json.load(file).get(graph.vault, {})
+                if data.get("version") == LINK_GRAPH_VERSION:
+                    graph.notes = data["notes"]
+            except (json.JSONDecodeError, OSError, KeyError):
+                graph.notes = {}
+        if refresh and graph.refresh():
+            graph.save()
+        else:
+            graph._build_lookup()
+        return graph
+
+    def save(self):
+        data = {}
+        if os.path.exists(self.cache_path):
+            try:
+                with open(self.cache_path, "r") as file:
+                    data = json.load(file)
+            except (json.JSONDecodeError, OSError):
+                data = {}
+        data[self.vault] = {"version": LINK_GRAPH_VERSION, "notes": self.notes}
+        tmp_path = self.cache_path + ".tmp"
+        with open(tmp_path, "w") as file:
+            file.write(json.dumps(data))
+        os.replace(tmp_path, self.cache_path)
+
+    def refresh(self, paths=None) -> dict[str, tuple[dict | None, dict | None]]:
+        """
+        Re-read notes whose (mtime, size) changed, out of the whole vault or
+        only the given paths. Returns {vault-relative path: (old entry, new entry)}.
+        """
+        if paths is None:
+            candidates = self._scan()
+            gone = set(self.notes) - set(candidates)
+        else:
+            candidates = {}
+            gone = set()
+            for path in paths:
+                rel_path = os.path.relpath(os.path.abspath(path), self.vault)
+                if not rel_path.endswith(".md") or rel_path.startswith(os.pardir):
+                    continue
+                if os.path.exists(path):
+                    candidates[rel_path] = os.path.join(self.vault, rel_path)
+                else:
+                    gone.add(rel_path)
+
+        changes = {}
+        for rel_path, note_path in candidates.items():
+            try:
+                stat = os.stat(note_path)
+            except FileNotFoundError:
+                gone.add(rel_path)
+                continue
+            stamp = [stat.st_mtime_ns, stat.st_size]
+            cached = self.notes.get(rel_path)
+            if cached is not None and cached["stamp"] == stamp:
+                continue
+            self.notes[rel_path] = {**read_note(note_path), "stamp": stamp}
+            changes[rel_path] = (cached, self.notes[rel_path])
+        for rel_path in gone:
+            if rel_path in self.notes:
+                changes[rel_path] = (self.notes.pop(rel_path), None)
+
+        self._build_lookup()
+        return changes
+
+    def _scan(self) -> dict[str, str]:
+        notes = {}
+        for dirpath, dirnames, filenames in os.walk(self.vault):
+            dirnames[:] = [d for d in dirnames if d not in SKIPPED_DIRS and not d.startswith(".")]
+            for filename in filenames:
+                if filename.endswith(".md"):
+                    note_path = os.path.join(dirpath, filename)
+                    notes[os.path.relpath(note_path, self.vault)] = note_path
+        return notes
+
+    def _build_lookup(self):
+        self.by_name = {}
+        self.by_key = {}
+        for rel_path in sorted(self.notes, key=lambda path: (path.count(os.sep), path)):
+            # Shallowest match wins, like Obsidian's shortest-path links
+            self.by_name.setdefault(link_key(rel_path), []).append(rel_path)
+            for target in self.notes[rel_path]["links"]:
+                self.by_key.setdefault(link_key(target), set()).add(rel_path)
+
+    def resolve(self, target: str, source: str | None = None) -> str | None:
+        """
+        The vault-relative note a link points at, or None. Path links
+        ("folder/Note") match exactly; bare names prefer a note in the
+        linking note's folder, then the shallowest one in the vault.
+        """
+        rel_path = os.path.normpath(target.replace("/", os.sep))
+        if not rel_path.endswith(".md"):
+            rel_path += ".md"
+        if rel_path in self.notes:
+            return rel_path
+        candidates = self.by_name.get(link_key(target))
+        if not candidates:
+            return None
+        if source is not None:
+            for candidate in candidates:
+                if os.path.dirname(candidate) == os.path.dirname(source):
+                    return candidate
+        return candidates[0]
+
+    def _relative(self, note_path: str) -> str:
+        return os.path.relpath(os.path.abspath(note_path), self.vault)
+
+    def note_url(self, note_path: str, target: str, heading: str) -> str | None:
+        """LinkRewriter resolve_note for a note: the linked post's URL, None if it is not published"""
+        if not target:
+            return default_note_url(target, heading)
+        resolved = self.resolve(target, self._relative(note_path))
+        if resolved is None or self.notes[resolved]["slug"] is None:
+            return None
+        return default_note_url(self.notes[resolved]["slug"], heading)
+
+    def backlinks(self, note_path: str) -> list[tuple[str, str]]:
+        """(title, slug) of the published notes linking to a note, by title"""
+        rel_path = self._relative(note_path)
+        key = link_key(rel_path)
+        backlinks = set()
+        # Only notes with a link by this name can point here; resolving those links settles it
+        for source in self.by_key.get(key, ()):
+            note = self.notes[source]
+            if source == rel_path or note["slug"] is None:
+                continue
+            if any(link_key(target) == key and self.resolve(target, source) == rel_path for target in note["links"]):
+                backlinks.add((note["title"], note["slug"]))
+        return sorted(backlinks)
+
+    def backlinks_section(self, note_path: str) -> str:
+        """Markdown listing a note's backlinks, or an empty string when nothing links to it"""
+        backlinks = self.backlinks(note_path)
+        if not backlinks:
+            return ""
+        items = "\n".join(f"- [{title}]({default_note_url(slug, '')})" for title, slug in backlinks)
+        return f"{BACKLINKS_HEADING}\n\n{items}\n"
+
+    def published(self) -> list[tuple[str, str]]:
+        """(note path, slug) of every publishable note; of two with one slug the first in walk order wins"""
+        notes = []
+        seen = {}
+        for rel_path in sorted(self.notes, key=_walk_order):
+            slug = self.notes[rel_path]["slug"]
+            if slug is None:
+                continue
+            note_path = os.path.join(self.vault, rel_path)
+            if slug in seen:
+                print(f"Skipping {note_path}: slug '{slug}' already used by {seen[slug]}")
+                continue
+            seen[slug] = note_path
+            notes.append((note_path, slug))
+        return notes
+
+    def affected(self, changes: dict[str, tuple[dict | None, dict | None]]) -> set[str]:
+        """
+        Absolute paths of the notes whose page a set of refresh() changes
+        alters: the changed notes and the ones linked with them. A graph
+        built from scratch reports every note, which rebuilds them all once.
+        """
+        rel_paths = set()
+        for rel_path, (old, new) in changes.items():
+            moved = (old is None or new is None or old["slug"] != new["slug"]
+                     or old["title"] != new["title"])
+            if moved:
+                # Links by name to this note may now resolve elsewhere, or their backlink entry changed
+                rel_paths.update(self.by_key.get(link_key(rel_path), ()))
+            if moved or old["links"] != new["links"]:
+                for entry in (old, new):
+                    for target in (entry or {}).get("links", ()):
+                        resolved = self.resolve(target, rel_path)
+                        if resolved is not None:
+                            rel_paths.add(resolved)
+        return {os.path.join(self.vault, rel_path) for rel_path in rel_paths}
@@ -1,62 +1,120 @@
+import argparse
+import asyncio
 import os
-import subprocess
-from typing import Optional
+import tempfile
+import time
+from typing import Callable, Optional
+
+from tracing import tracer
+
+DEFAULT_TIMEOUT = 300.0  # seconds, per command
+
+
+class CommandTimeout(Exception):
+    pass
+
+
+def print_output(stream: str, line: str):
+    print(f"  [{stream}] {line}")
 
 
 class GitDeployer:
-    def __init__(self, repo_path: str, public_folder: str):
+    def __init__(self, repo_path: str, public_folder: str, remote: str = "origin",
+                 timeout: Optional[float] = DEFAULT_TIMEOUT,
+                 on_output: Optional[Callable[[str, str], None]] = print_output):
         self.repo_path = repo_path
         self.public_folder = public_folder
         self.target_branch = "gh-pages"
+        self.remote = remote
+        self.timeout = timeout
+        self.on_output = on_output
+        self.timings: list[tuple[str, float]] = []
+
+    async def run_command_async(self, command: list[str], timeout: Optional[float] = None,
+                                step: Optional[str] = None, env: Optional[dict] = None) -> tuple[int, str, str]:
+        """
+        Run a command and return its exit code, stdout, and stderr.
+
+        Output is streamed line by line to on_output(stream, line) as it
+        arrives. The command is killed when it runs past the timeout (raising
+        CommandTimeout) or when the awaiting task is cancelled.
+        """
+        start = time.perf_counter()
+        process = await asyncio.create_subprocess_exec(
+            *command,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            cwd=self.repo_path,
+            env={**os.environ, **env} if env else None
+        )
+
+        async def communicate():
+            return await asyncio.gather(
+                self._read_lines(process.stdout, "stdout"),
+                self._read_lines(process.stderr, "stderr"),
+                process.wait()
+            )
+
+        try:
+            stdout, stderr, _ = await asyncio.wait_for(communicate(),
+                                                       timeout if timeout is not None else self.timeout)
+        except asyncio.TimeoutError:
+            raise CommandTimeout(f"{' '.join(command)} timed out")
+        finally:
+            if process.returncode is None:
+                process.kill()
+                await process.wait()
+            self.timings.append((step or ' '.join(command[:2]), time.perf_counter() - start))
+            # Commands run concurrently, so each task gets its own row in the trace
+            tracer.add(self.timings[-1][0], start, self.timings[-1][1], tid=id(asyncio.current_task()),
+                       command=' '.join(command))
+        return process.returncode, stdout, stderr
+
+    async def _read_lines(self, reader: asyncio.StreamReader, stream: str) -> str:
+        lines = []
+        async for raw in reader:
+            line = raw.decode('utf-8', 'replace').rstrip()
+            lines.append(line)
+            if self.on_output and line:
+                self.on_output(stream, line)
+        return "\n".join(lines).strip()
 
     def run_command(self, command: list[str]) -> tuple[int, str, str]:
         """
         Run a shell command and return its exit code, stdout, and stderr
         """
-        process = subprocess.Popen(
-            command,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            cwd=self.repo_path
-        )
-        stdout, stderr = process.communicate()
-        return (
-            process.returncode,
-            stdout.decode('utf-8').strip(),
-            stderr.decode('utf-8').strip()
-        )
+        return asyncio.run(self.run_command_async(command))
+
+    async def git(self, *args: str, step: Optional[str] = None, env: Optional[dict] = None) -> str:
+        """Run a git command, raising with its stderr if it fails"""
+        code, out, err = await self.run_command_async(['git', *args], step=step, env=env)
+        if code != 0:
+            raise Exception(f"git {args[0]} failed: {err}")
+        return out
+
+    async def rev_parse(self, ref: str) -> Optional[str]:
+        code, out, _ = await self.run_command_async(['git', 'rev-parse', '--verify', '--quiet', ref],
+                                                    step=f"rev-parse {ref}")
+        return out if code == 0 else None
 
-    def deploy(self) -> bool:
+    def deploy(self, full_split: bool = False, minify: bool = False) -> bool:
         """
         Deploy the public folder to GitHub Pages
         """
-        print(f"Deploying {self.public_folder} to GitHub Pages...")
-
-        # Create temporary branch for deployment
-        temp_branch = "gh-pages-deploy"
+        return asyncio.run(self.deploy_async(full_split, minify))
 
+    async def deploy_async(self, full_split: bool = False, minify: bool = False) -> bool:
+        print(f"Deploying {self.public_folder} to GitHub Pages...")
+        self.timings = []
+        start = time.perf_counter()
         try:
-            # Split the subtree
-            code, out, err = self.run_command([
-                'git', 'subtree', 'split', '--prefix', self.public_folder,
-                '-b', temp_branch
-            ])
-            if code != 0:
-                raise Exception(f"Failed to create subtree: {err}")
-
-            # Force push to gh-pages branch
-            code, out, err = self.run_command([
-                'git', 'push', 'origin', f'{temp_branch}:gh-pages',
-                '--force'
-            ])
-            if code != 0:
-                raise Exception(f"Failed to push to gh-pages: {err}")
-
-            # Clean up - delete temporary branch
-            code, out, err = self.run_command(['git', 'branch', '-D', temp_branch])
-            if code != 0:
-                print(f"Warning: Failed to delete temporary branch: {err}")
-
+            if full_split:
+                await self.deploy_subtree()
+            elif minify:
+                await self.minify()
+                await self.deploy_tree(from_worktree=True, overlay=await self.staging_dir())
+            else:
+                await self.deploy_tree()
             print("Deployment successful!")
             return True
 
@@ -64,15 +122,166 @@ class GitDeployer:
             print(f"Error during deployment: {str(e)}")
             return False
 
+        finally:
+            tracer.add("deploy", start, time.perf_counter() - start, tid=id(asyncio.current_task()))
+            self.print_timings(time.perf_counter() - start)
+
+    def print_timings(self, total: float):
+        for step, seconds in self.timings:
+            print(f"  {step:<50}{seconds * 1000:9.1f} ms")
+        print(f"  {'total (steps overlap)':<50}{total * 1000:9.1f} ms")
+
+    async def fetch_target(self, remote_ref: str) -> Optional[str]:
+        """Fetch the remote's gh-pages into remote_ref and return it, or None if the remote has none yet"""
+        code, _, err = await self.run_command_async(
+            ['git', 'fetch', '--no-tags', self.remote, f"+refs/heads/{self.target_branch}:{remote_ref}"],
+            step="fetch gh-pages", env={"LC_ALL": "C"})
+        if code != 0:
+            if "couldn't find remote ref" in err:
+                return None
+            raise Exception(f"git fetch failed: {err}")
+        return await self.rev_parse(remote_ref)
+
+    async def verify_remote(self, commit: str):
+        """Check that the remote's gh-pages now points at the deployed commit"""
+        out = await self.git('ls-remote', self.remote, f"refs/heads/{self.target_branch}",
+                             step="verify remote gh-pages")
+        remote_commit = out.split()[0] if out else None
+        if remote_commit != commit:
+            raise Exception(f"{self.remote} gh-pages is at {remote_commit}, expected {commit}")
+
+    async def minify(self):
+        """
+        Minify and precompress the public folder on disk (see minify.py)
+        into a staging folder inside .git, leaving public/ itself untouched.
+        """
+        from minify import Minifier, format_report
+        start = time.perf_counter()
+        minifier = Minifier.load(os.path.join(self.repo_path, self.public_folder), out_dir=await self.staging_dir())
+        changed, report = await asyncio.to_thread(minifier.run)
+        self.timings.append(("minify", time.perf_counter() - start))
+        tracer.add("minify", start, self.timings[-1][1])
+        print(format_report(report))
+        print(f"{len(changed)} files minified or compressed")
+
+    async def staging_dir(self) -> str:
+        """Where the minify step writes its output, kept between deploys so it stays incremental"""
+        path = await self.git('rev-parse', '--git-path', f"minified/{self.public_folder}",
+                              step="rev-parse --git-path")
+        return os.path.join(self.repo_path, path)
+
+    async def worktree_tree(self, overlay: Optional[str] = None) -> str:
+        """
+        Tree object of the public folder as it is on disk, with the files
+        under overlay replacing or adding to it, built in a throwaway index
+        so neither the real index nor HEAD changes.
+        """
+        with tempfile.TemporaryDirectory() as tmp:
+            env = {"GIT_INDEX_FILE": os.path.join(tmp, "index")}
+            work_tree = os.path.abspath(os.path.join(self.repo_path, self.public_folder))
+            await self.git('--work-tree', work_tree, 'add', '-A', ':/', step="stage public", env=env)
+            if overlay and os.path.isdir(overlay):
+                await self.git('--work-tree', overlay, 'add', '--ignore-removal', ':/', step="stage minified",
+                               env=env)
+            return await self.git('write-tree', step="write-tree", env=env)
+
+    async def deploy_tree(self, from_worktree: bool = False, overlay: Optional[str] = None) -> Optional[str]:
+        """
+        Commit the public folder's tree object from HEAD (or, with
+        from_worktree, from disk, overlaid with the minify step's output)
+        straight onto gh-pages. Unlike a subtree
+        split this never walks history, so the cost stays the same however
+        many commits the repo has; the new commit's parent is the last
+        deployed one, so the push only sends the objects that changed.
+        Returns the deployed commit, or None if gh-pages already matches.
+        """
+        remote_ref = f"refs/remotes/{self.remote}/{self.target_branch}"
+        tree, parent, source = await asyncio.gather(
+            self.worktree_tree(overlay) if from_worktree else self.rev_parse(f"HEAD:{self.public_folder}"),
+            self.fetch_target(remote_ref),
+            self.git('rev-parse', '--short', 'HEAD', step="rev-parse HEAD")
+        )
+        if tree is None:
+            raise Exception(f"{self.public_folder} is not committed in HEAD")
+        parent_tree = await self.rev_parse(f"{parent}^{{tree}}") if parent else None
+        if parent_tree == tree:
+            print("gh-pages is already up to date")
+            return None
+
+        parents = ['-p', parent] if parent else []
+        commit = await self.git('commit-tree', tree, *parents, '-m', f"Deploy {source}", step="commit-tree")
+
+        # The new commit builds on the fetched gh-pages, so the push is a fast-forward; the lease
+        # still refuses it if someone else deployed in between (an empty lease: gh-pages must not exist)
+        target = f"refs/heads/{self.target_branch}"
+        await self.git('push', f"--force-with-lease={target}:{parent or ''}", self.remote, f"{commit}:{target}",
+                       step="push gh-pages")
+        await self.verify_remote(commit)
+        return commit
+
+    async def deploy_subtree(self):
+        """The original deploy: split the whole history of the public folder and force push it"""
+        # Create temporary branch for deployment
+        temp_branch = "gh-pages-deploy"
+
+        # Split the subtree
+        code, out, err = await self.run_command_async([
+            'git', 'subtree', 'split', '--prefix', self.public_folder,
+            '-b', temp_branch
+        ], step="subtree split")
+        if code != 0:
+            raise Exception(f"Failed to create subtree: {err}")
+
+        # Force push to gh-pages branch
+        code, out, err = await self.run_command_async([
+            'git', 'push', self.remote, f'{temp_branch}:{self.target_branch}',
+            '--force'
+        ], step="push gh-pages")
+        if code != 0:
+            raise Exception(f"Failed to push to gh-pages: {err}")
+        commit = await self.git('rev-parse', temp_branch, step=f"rev-parse {temp_branch}")
+
+        # Verify the remote and clean up the temporary branch at the same time
+        verified, cleanup = await asyncio.gather(
+            self.verify_remote(commit),
+            self.run_command_async(['git', 'branch', '-D', temp_branch], step="delete temp branch"),
+            return_exceptions=True
+        )
+        if isinstance(verified, Exception):
+            raise verified
+        if isinstance(cleanup, Exception) or cleanup[0] != 0:
+            print(f"Warning: Failed to delete temporary branch: {cleanup if isinstance(cleanup, Exception) else cleanup[2]}")
+
 
 def main():
     # Using raw string (r"") to handle Windows paths correctly
     REPO_PATH = r"C:\Users\isaac\isaacblogs"  # Windows path with raw string
     PUBLIC_FOLDER = "public"  # Your public folder name
 
-    deployer = GitDeployer(REPO_PATH, PUBLIC_FOLDER)
-    deployer.deploy()
+    parser = argparse.ArgumentParser(description="Deploy the Hugo public folder to GitHub Pages")
+    parser.add_argument("--repo", default=REPO_PATH, help="Site repository")
+    parser.add_argument("--public", default=PUBLIC_FOLDER, help="Built site folder inside the repository")
+    parser.add_argument("--remote", default="origin", help="Remote to push gh-pages to")
+    parser.add_argument("--full-split", action="store_true",
+                        help="Use the old git subtree split over the whole history")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT,
+                        help="Seconds before a single git command is killed")
+    parser.add_argument("--minify", action="store_true",
+                        help="Deploy the public folder as it is on disk, minified and precompressed "
+                             "in a staging copy so public/ stays as committed")
+    parser.add_argument("--quiet", action="store_true", help="Do not stream git output")
+    parser.add_argument("--trace", metavar="FILE",
+                        help="Write a Chrome trace of the deploy to FILE and print a timing summary")
+    args = parser.parse_args()
+    if args.trace:
+        tracer.enable(args.trace)
+    if args.minify and args.full_split:
+        parser.error("--minify deploys the folder on disk, which a subtree split cannot do")
+
+    deployer = GitDeployer(args.repo, args.public, args.remote, args.timeout,
+                           None if args.quiet else print_output)
+    deployer.deploy(full_split=args.full_split, minify=args.minify)
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,135 @@
+"""
+Persistent record of what the importer last wrote, so re-runs only touch
+what changed.
+
+The manifest lives next to ~/.markdown_processor_config.json and maps every
+page bundle to the source files it was built from (with their size, mtime
+and sha256), the files it produced and the embeds it could not resolve.
+"""
+import hashlib
+import json
+import os
+
+manifest_file = os.path.join(os.path.expanduser('~'), '.markdown_processor_manifest.json')
+
+# 2: bundles record their missing embeds, so older entries are rebuilt once to learn theirs
+MANIFEST_VERSION = 2
+CHUNK_SIZE = 1024 * 1024
+
+
+def file_digest(path: str) -> str:
+    """Return the sha256 of a file, read in chunks"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class Manifest:
+    def __init__(self, path: str = manifest_file):
+        self.path = path
+        self.files = {}
+        self.bundles = {}
+
+    @classmethod
+    def load(cls, path: str = manifest_file) -> "Manifest":
+        manifest = cls(path)
+        if os.path.exists(path):
+            try:
+                with open(path, "r") as file:
+                    data = json.load(file)
+                if data.get("version") == MANIFEST_VERSION:
+                    manifest.files = data.get("files", {})
+                    manifest.bundles = data.get("bundles", {})
+            except (json.JSONDecodeError, OSError):
+                # A corrupt manifest only costs one full rebuild
+                pass
+        return manifest
+
+    def save(self):
+        data = {"version": MANIFEST_VERSION, "files": self.files, "bundles": self.bundles}
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as file:
+            json.dump(data, file, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+    def fingerprint(self, path: str) -> dict | None:
+        """
+        Return {size, mtime_ns, sha256} for a file, reusing the recorded hash
+        when size and mtime are unchanged. None if the file is gone.
+        """
+        path = os.path.abspath(path)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        entry = self.files.get(path)
+        if entry and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+            return entry
+        entry = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": file_digest(path)}
+        self.files[path] = entry
+        return entry
+
+    def is_unchanged(self, path: str) -> bool:
+        """
+        Check a file against its recorded fingerprint. A stat settles it
+        unless only the mtime moved (a touch, a checkout, a sync client);
+        then the recorded hash decides, and a match adopts the new mtime.
+        """
+        entry = self.files.get(os.path.abspath(path))
+        if entry is None:
+            return False
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return False
+        if entry["size"] != stat.st_size:
+            return False
+        if entry["mtime_ns"] == stat.st_mtime_ns:
+            return True
+        if file_digest(path) != entry["sha256"]:
+            return False
+        entry["mtime_ns"] = stat.st_mtime_ns
+        return True
+
+    def is_fresh(self, target_folder: str, roots: list[str], settings: dict | None = None, resolve=None) -> bool:
+        """
+        True when the bundle was built from the same root files with the same
+        settings, none of its inputs changed since, and all of its outputs are
+        still on disk. With ``resolve(link)``, a bundle whose embeds were
+        missing is stale as soon as one of them resolves to a file.
+        """
+        bundle = self.bundles.get(os.path.abspath(target_folder))
+        if bundle is None or bundle["roots"] != [os.path.abspath(p) for p in roots]:
+            return False
+        if bundle.get("settings") != settings:
+            return False
+        if resolve is not None and any(resolve(link) for link in bundle.get("missing", ())):
+            return False
+        if not all(self.is_unchanged(path) for path in bundle["inputs"]):
+            return False
+        return all(os.path.exists(os.path.join(target_folder, name)) for name in bundle["outputs"])
+
+    def record(self, target_folder: str, roots: list[str], inputs: list[str], outputs: list[str],
+               settings: dict | None = None, missing: list[str] = (), **extra):
+        """Remember how a bundle was built, and the embeds it could not find"""
+        for path in inputs:
+            self.fingerprint(path)
+        self.bundles[os.path.abspath(target_folder)] = {
+            "roots": [os.path.abspath(p) for p in roots],
+            "inputs": sorted({os.path.abspath(p) for p in inputs}),
+            "outputs": sorted(outputs),
+            "settings": settings,
+            "missing": sorted(missing),
+            **extra,
+        }
+
+    def forget(self, target_folder: str):
+        bundle = self.bundles.pop(os.path.abspath(target_folder), None)
+        if bundle is None:
+            return
+        still_used = {p for b in self.bundles.values() for p in b["inputs"]}
+        for path in bundle["inputs"]:
+            if path not in still_used:
+                self.files.pop(path, None)
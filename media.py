@@ -0,0 +1,73 @@
+"""
+Content-addressed store for attachments shared between posts.
+
+With shared media on, an embedded attachment is written once to
+static/media/<first 16 hex digits of its sha256><ext> and every post
+embedding it links to /media/<name>, so a screenshot reused by ten posts
+is stored, built into public/, committed and pushed once. Optimized
+variants go to the same folder as <hash>-<width>.<format>. Featured
+images and dropped images stay in their bundle, where the theme looks
+for page resources.
+
+Bundles list their media files among their outputs (as paths relative
+to the bundle), so the manifest notices when one goes missing.
+collect_garbage() removes the media files no post links to any more;
+full imports run it, watched batches leave it to the next one.
+"""
+import os
+import re
+
+from manifest import file_digest
+
+MEDIA_DIR = os.path.join("static", "media")
+MEDIA_URL = "/media/"
+HASH_LENGTH = 16
+# Only names the store itself produces are ever cleaned up
+MEDIA_NAME = r"[0-9a-f]{16}(?:-\d+)?\.\w+"
+MEDIA_NAME_RE = re.compile(rf"^{MEDIA_NAME}$")
+MEDIA_URL_RE = re.compile(rf"{re.escape(MEDIA_URL)}({MEDIA_NAME})")
+
+
+class MediaStore:
+    def __init__(self, site_repo: str):
+        self.root = os.path.join(os.path.abspath(site_repo), MEDIA_DIR)
+        # (path, mtime_ns, size) -> hash prefix, so a picture embedded by many notes is hashed once
+        self.digests = {}
+
+    def name(self, source: str) -> str:
+        stat = os.stat(source)
+        key = (source, stat.st_mtime_ns, stat.st_size)
+        if key not in self.digests:
+            self.digests[key] = file_digest(source)[:HASH_LENGTH]
+        return self.digests[key] + os.path.splitext(source)[1].lower()
+
+    def relative_path(self, source: str, target_folder: str) -> str:
+        """Where a bundle writes an attachment in the store, relative to the bundle"""
+        return os.path.relpath(os.path.join(self.root, self.name(source)), target_folder)
+
+    def contains(self, path: str) -> bool:
+        return os.path.dirname(os.path.abspath(path)) == self.root
+
+    @staticmethod
+    def url(name: str) -> str:
+        return MEDIA_URL + os.path.basename(name)
+
+    def collect_garbage(self, posts_dir: str) -> list[str]:
+        """Delete store files no post's index.md links to. Returns the paths removed."""
+        if not os.path.isdir(self.root):
+            return []
+        used = set()
+        with os.scandir(posts_dir) as entries:
+            for entry in entries:
+                try:
+                    with open(os.path.join(entry.path, "index.md"), "r", encoding="utf-8") as file:
+                        used.update(MEDIA_URL_RE.findall(file.read()))
+                except (FileNotFoundError, NotADirectoryError):
+                    continue
+        removed = []
+        with os.scandir(self.root) as entries:
+            for entry in entries:
+                if entry.is_file() and MEDIA_NAME_RE.match(entry.name) and entry.name not in used:
+                    os.remove(entry.path)
+                    removed.append(entry.path)
+        return removed
@@ -0,0 +1,324 @@
+"""
+Minify and precompress the built site before it is published.
+
+Every HTML, CSS, XML and JSON file under public/ is minified, and every
+text file, JavaScript included, gets .gz and .br siblings (.br only when
+the brotli package is installed, and only when they come out smaller) for
+servers that hand out precompressed files. The output goes into public/
+itself or, with --out, into a staging folder that mirrors it, so a
+committed public/ stays clean (mala.py --minify deploys public/ overlaid
+with such a folder). Files are handled in
+parallel on a process pool. Each file's (mtime, size), its hash and the
+outputs this stage wrote for it are cached in
+~/.markdown_processor_minify.json, so files Hugo or render.py did not
+touch since the last run are skipped without being read:
+
+    python minify.py --site ~/Projects/site [--out ~/Projects/site-minified]
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import re
+import shutil
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from engine import load_paths
+
+minify_cache_file = os.path.join(os.path.expanduser('~'), '.markdown_processor_minify.json')
+
+# 3: JavaScript is no longer minified, so earlier .js outputs are redone
+MINIFY_VERSION = 3
+COMPRESSED_SUFFIXES = (".gz", ".br")
+# Other text files are only precompressed
+TEXT_EXTENSIONS = {".html", ".css", ".js", ".xml", ".json", ".svg", ".txt", ".webmanifest", ".map"}
+PRESERVED_RE = re.compile(r"(<(pre|textarea|script|style)\b[^>]*>)(.*?)(</\2\s*>)", re.S | re.I)
+HTML_COMMENT_RE = re.compile(r"<!--(?!\[if|\s*more\s*-->).*?-->", re.S)
+SPACE_RE = re.compile(r"\s+")
+# Whitespace next to these tags never renders (li and table cells can be inline-block, so they keep theirs)
+BLOCK_GAP_RE = re.compile(r"\s*(<!DOCTYPE[^>]*>|</?(?:html|head|body|meta|link|title|base|script|style|noscript|"
+                          r"section|article|header|footer|nav|main|aside|p|h[1-6]|ul|ol|table|thead|tbody|tr)"
+                          r"\b[^>]*>)\s*", re.I)
+XML_GAP_RE = re.compile(r">\s+<")
+CSS_TOKEN_RE = re.compile(r"""("(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*')|/\*.*?\*/|\s+""", re.S)
+CSS_TIGHT_AFTER = "{};,>(:"
+CSS_TIGHT_BEFORE = "{};,>)!"
+
+
+def minify_css(text: str) -> str:
+    out = []
+    pos = 0
+    for match in CSS_TOKEN_RE.finditer(text):
+        out.append(text[pos:match.start()])
+        pos = match.end()
+        if match.group(1):
+            out.append(match.group(1))
+            continue
+        if match.group().startswith("/*"):
+            # /*! comments carry licences
+            if match.group().startswith("/*!"):
+                out.append(match.group())
+            continue
+        previous = out[-1][-1:] if out and out[-1] else ""
+        following = text[pos:pos + 1]
+        if previous and following and previous not in CSS_TIGHT_AFTER and following not in CSS_TIGHT_BEFORE:
+            out.append(" ")
+    out.append(text[pos:])
+    return "".join(out).replace(";}", "}").strip()
+
+
+def minify_html(text: str) -> str:
+    """
+    Collapse whitespace between tags and minify inline styles and JSON.
+    Scripts are kept as they are, like pre/textarea: telling a regex literal
+    from a division needs a real JavaScript parser.
+    """
+    out = []
+    pos = 0
+    for match in PRESERVED_RE.finditer(text):
+        out.append(_collapse_html(text[pos:match.start()]))
+        open_tag, tag, content, close_tag = match.group(1), match.group(2).lower(), match.group(3), match.group(4)
+        if tag == "style":
+            content = minify_css(content)
+        elif tag == "script":
+            script_type = re.search(r"""type\s*=\s*["']?([^"'\s>]+)""", open_tag)
+            script_type = script_type.group(1).lower() if script_type else "text/javascript"
+            if script_type.endswith("json"):
+                content = minify_json(content)
+        out.append(_collapse_html(open_tag) + content + close_tag)
+        pos = match.end()
+    out.append(_collapse_html(text[pos:]))
+    return "".join(out).strip()
+
+
+def _collapse_html(text: str) -> str:
+    return BLOCK_GAP_RE.sub(r"\1", SPACE_RE.sub(" ", HTML_COMMENT_RE.sub("", text)))
+
+
+def minify_xml(text: str) -> str:
+    return XML_GAP_RE.sub("><", text).strip()
+
+
+def minify_json(text: str) -> str:
+    try:
+        return json.dumps(json.loads(text), ensure_ascii=False, separators=(",", ":"))
+    except ValueError:
+        return text
+
+
+MINIFIERS = {
+    ".html": minify_html,
+    ".css": minify_css,
+    ".xml": minify_xml,
+    ".svg": minify_xml,
+    ".json": minify_json,
+    ".webmanifest": minify_json,
+}
+
+
+def compressors() -> dict:
+    """Sibling suffix -> compress function, brotli only when it is installed"""
+    found = {".gz": lambda data: gzip.compress(data, 9, mtime=0)}
+    try:
+        import brotli
+        found[".br"] = lambda data: brotli.compress(data, quality=11)
+    except ImportError:
+        pass
+    return found
+
+
+def process_file(path: str, out_path: str, cached: dict) -> dict:
+    """
+    Minify one file into out_path (path itself when minifying in place) and
+    write its compressed siblings next to it. Skips the work when the file
+    still hashes to what it was after the last run and every output that
+    run recorded is still there.
+    """
+    with open(path, "rb") as file:
+        data = file.read()
+    digest = hashlib.sha256(data).hexdigest()
+    sidecars = compressors()
+    if (digest == cached.get("hash") and cached.get("compressors") == list(sidecars)
+            and all(os.path.exists(out_path + suffix) for suffix in cached["outputs"])):
+        return {**cached, "path": path, "written": []}
+
+    # outputs lists the suffixes written next to out_path, "" being a minified copy made out of place
+    result = {"path": path, "hash": digest, "original": len(data), "minified": len(data),
+              "compressors": list(sidecars), "outputs": [], "written": []}
+    if out_path != path:
+        os.makedirs(os.path.dirname(out_path), exist_ok=True)
+    minify = MINIFIERS.get(os.path.splitext(path)[1].lower())
+    minified = data
+    # Hugo's own *.min.* bundles are as small as they get
+    if minify and ".min." not in os.path.basename(path):
+        try:
+            minified = minify(data.decode("utf-8")).encode("utf-8")
+        except UnicodeDecodeError:
+            pass
+    if len(minified) < len(data):
+        _replace(out_path, minified)
+        result["written"].append(out_path)
+        if out_path == path:
+            result["hash"] = hashlib.sha256(minified).hexdigest()
+        else:
+            result["outputs"].append("")
+        data = minified
+    elif out_path != path and os.path.exists(out_path):
+        # A copy minified from an earlier version would shadow the new one
+        os.remove(out_path)
+        result["written"].append(out_path)
+    result["minified"] = len(data)
+
+    for suffix, compress in sidecars.items():
+        compressed = compress(data)
+        if len(compressed) < len(data):
+            _replace(out_path + suffix, compressed)
+            result["written"].append(out_path + suffix)
+            result["outputs"].append(suffix)
+            result[suffix] = len(compressed)
+        elif os.path.exists(out_path + suffix):
+            os.remove(out_path + suffix)
+            result["written"].append(out_path + suffix)
+    return result
+
+
+def _replace(path: str, data: bytes):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as file:
+        file.write(data)
+    os.replace(tmp_path, path)
+
+
+class Minifier:
+    def __init__(self, public_dir: str, cache_path: str = minify_cache_file, out_dir: str | None = None):
+        self.public_dir = os.path.abspath(public_dir)
+        self.out_dir = os.path.abspath(out_dir) if out_dir else self.public_dir
+        self.cache_path = cache_path
+        self.files = {}
+
+    @classmethod
+    def load(cls, public_dir: str, cache_path: str = minify_cache_file, out_dir: str | None = None) -> "Minifier":
+        minifier = cls(public_dir, cache_path, out_dir)
+        if os.path.exists(cache_path):
+            try:
+                with open(cache_path, "r") as file:
+                    data = json.load(file).get(minifier.out_dir, {})
+                if data.get("version") == MINIFY_VERSION:
+                    minifier.files = data["files"]
+            except (json.JSONDecodeError, OSError, KeyError):
+                pass
+        return minifier
+
+    def save(self):
+        data = {}
+        if os.path.exists(self.cache_path):
+            try:
+                with open(self.cache_path, "r") as file:
+                    data = json.load(file)
+            except (json.JSONDecodeError, OSError):
+                data = {}
+        data[self.out_dir] = {"version": MINIFY_VERSION, "files": self.files}
+        tmp_path = self.cache_path + ".tmp"
+        with open(tmp_path, "w") as file:
+            file.write(json.dumps(data))
+        os.replace(tmp_path, self.cache_path)
+
+    def scan(self) -> dict[str, list[int]]:
+        """{relative path: [mtime_ns, size]} of every text file under public/"""
+        found = {}
+        pending = [self.public_dir]
+        while pending:
+            directory = pending.pop()
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        pending.append(entry.path)
+                    elif os.path.splitext(entry.name)[1].lower() in TEXT_EXTENSIONS:
+                        stat = entry.stat()
+                        found[os.path.relpath(entry.path, self.public_dir)] = [stat.st_mtime_ns, stat.st_size]
+        return found
+
+    def run(self, workers: int | None = None, everything: bool = False) -> tuple[list[str], dict]:
+        """
+        Minify and compress the files changed since the last run. Returns
+        the paths written or removed and a per-extension report of
+        {"files", "original", "minified", ".gz", ".br"} byte totals.
+        """
+        if not self.files and self.out_dir != self.public_dir:
+            # Without a cache nothing says which staged files are still current
+            shutil.rmtree(self.out_dir, ignore_errors=True)
+        found = self.scan()
+        changed = []
+        for rel in set(self.files) - set(found):
+            # The page is gone, so are its minified copy and compressed siblings
+            for suffix in self.files.pop(rel)["outputs"]:
+                output = os.path.join(self.out_dir, rel + suffix)
+                if os.path.exists(output):
+                    os.remove(output)
+                    changed.append(output)
+
+        pending = [rel for rel, stamp in found.items()
+                   if everything or self.files.get(rel, {}).get("stamp") != stamp]
+        jobs = [(os.path.join(self.public_dir, rel), os.path.join(self.out_dir, rel), self.files.get(rel, {}))
+                for rel in pending]
+        if workers == 1 or len(jobs) <= 1:
+            results = [process_file(*job) for job in jobs]
+        else:
+            chunksize = max(1, len(jobs) // ((workers or os.cpu_count() or 1) * 4))
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                results = list(executor.map(process_file, *zip(*jobs), chunksize=chunksize))
+
+        for rel, result in zip(pending, results):
+            changed.extend(result.pop("written"))
+            stat = os.stat(result.pop("path"))
+            self.files[rel] = {**result, "stamp": [stat.st_mtime_ns, stat.st_size]}
+        if pending or changed:
+            self.save()
+        return changed, self.report()
+
+    def report(self) -> dict:
+        """Byte totals per extension; the .gz and .br columns only count the siblings actually written"""
+        totals = {}
+        for rel, entry in self.files.items():
+            row = totals.setdefault(os.path.splitext(rel)[1].lower(), {"files": 0, "original": 0, "minified": 0})
+            row["files"] += 1
+            for key in ("original", "minified", *COMPRESSED_SUFFIXES):
+                if key in entry:
+                    row[key] = row.get(key, 0) + entry[key]
+        return dict(sorted(totals.items()))
+
+
+def format_report(report: dict) -> str:
+    lines = [f"{'type':<14}{'files':>6}{'original':>12}{'minified':>12}{'saved':>8}{'.gz':>12}{'.br':>12}"]
+    for extension, row in report.items():
+        saved = 1 - row["minified"] / row["original"] if row["original"] else 0
+        compressed = [f"{row[suffix]:>12,}" if suffix in row else f"{'-':>12}" for suffix in COMPRESSED_SUFFIXES]
+        lines.append(f"{extension:<14}{row['files']:>6}{row['original']:>12,}{row['minified']:>12,}"
+                     f"{saved:>8.1%}{''.join(compressed)}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Minify public/ and write .gz/.br siblings")
+    parser.add_argument("--site", default=load_paths().get("site_repo"),
+                        help="Hugo site repository (default: configured site repo)")
+    parser.add_argument("--public", default="public", help="Built site folder inside the repository")
+    parser.add_argument("--out", default=None,
+                        help="Write the minified files to this folder instead of over public/")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: one per CPU)")
+    parser.add_argument("--all", action="store_true", help="Process every file, not just the changed ones")
+    args = parser.parse_args(argv)
+    public_dir = os.path.join(args.site or "", args.public)
+    if not os.path.isdir(public_dir):
+        parser.error(f"{public_dir} does not exist, pass --site")
+
+    changed, report = Minifier.load(public_dir, out_dir=args.out).run(args.workers, args.all)
+    print(format_report(report))
+    print(f"{len(changed)} files written")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
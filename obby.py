@@ -1,19 +1,37 @@
 import os
-import re
 import shutil
-import sys
-from tkinter import Tk, Label, Entry, Button, filedialog, messagebox, Listbox, Scrollbar, Frame
-from tkinterdnd2 import TkinterDnD, DND_FILES
-import subprocess
-from PIL import Image
-import json
+import queue
+import threading
+from tkinter import Tk, Label, Entry, Button, Checkbutton, BooleanVar, StringVar, OptionMenu, filedialog, messagebox, Frame
+from tkinter import ttk
+from engine import Cancelled, load_paths, missing_paths, resolve_site_structure, save_paths
+from post_index import SORT_KEYS
+from tracing import span
+from virtual_list import PrefixIndex, VirtualList
 
 # Global variables
 featured_image_path = None
 dropped_files = []
-config_file = os.path.join(os.path.expanduser('~'), '.markdown_processor_config.json')
+image_cache = None
+task_queue = queue.Queue()
+cancel_event = threading.Event()
+current_task = None
+listed_posts = []
+search_index = None
+note_catalog = None
+catalog_thread = None
+last_deploy_time = None
+unpublished_paths = set()
 paths = {}
 
+def get_image_cache():
+    """The encoded image cache, opened on first use"""
+    global image_cache
+    if image_cache is None:
+        from image_cache import ImageCache
+        image_cache = ImageCache()
+    return image_cache
+
 def get_default_directories():
     """Attempt to find sensible default directories based on the system."""
     home_dir = os.path.expanduser('~')
@@ -25,19 +43,10 @@ def get_default_directories():
 
 def load_or_set_paths():
     global paths
-    # First, try to load existing configuration
-    if os.path.exists(config_file):
-        try:
-            with open(config_file, "r") as file:
-                paths = json.load(file)
-                # Validate paths exist
-                for key, path in paths.items():
-                    if not os.path.exists(path):
-                        raise FileNotFoundError(f"{key} path does not exist")
-                return
-        except (json.JSONDecodeError, FileNotFoundError):
-            # If config is invalid or paths don't exist, proceed to manual selection
-            pass
+    # First, try to load existing configuration; it is used as long as its folders still exist
+    paths = load_paths()
+    if not missing_paths(paths):
+        return
 
     # If no valid config exists, get default directories
     default_dirs = get_default_directories()
@@ -63,33 +72,112 @@ def load_or_set_paths():
 
     # Save the configuration
     try:
-        with open(config_file, "w") as file:
-            json.dump(paths, file, indent=4)
+        save_paths(paths)
     except Exception as e:
         messagebox.showwarning("Configuration Save Error", 
                                 f"Could not save configuration: {str(e)}")
 
     root.destroy()
 
-def resolve_site_structure(base_path):
-    """Dynamically find or create the Hugo site content structure"""
-    possible_content_paths = [
-        os.path.join(base_path, "content", "posts"),
-        os.path.join(base_path, "site", "content", "posts"),
-        os.path.join(base_path, "hugo", "content", "posts"),
-    ]
+def start_task(description, work, on_success, on_error=None):
+    """
+    Run work(report) on a background thread so the Tk main loop stays
+    responsive. report(done, total, message) posts progress to the GUI and
+    raises Cancelled once the Cancel button was pressed. on_success(result)
+    and on_error(exception) run back on the main thread.
+    """
+    global current_task
+    if current_task is not None and current_task.is_alive():
+        messagebox.showerror("Busy", "Please wait for the current task to finish.")
+        return
+
+    cancel_event.clear()
+    set_busy(True, description)
+
+    def report(done, total, message):
+        if cancel_event.is_set():
+            raise Cancelled()
+        task_queue.put(("progress", done, total, message))
+
+    def run():
+        try:
+            result = work(report)
+        except Cancelled:
+            task_queue.put(("cancelled",))
+        except Exception as e:
+            task_queue.put(("error", on_error, e))
+        else:
+            task_queue.put(("done", on_success, result))
 
-    for content_path in possible_content_paths:
-        if os.path.exists(content_path):
-            return content_path
+    current_task = threading.Thread(target=run, daemon=True)
+    current_task.start()
 
-    # If no existing structure, create a default one
-    default_content_path = os.path.join(base_path, "content", "posts")
-    os.makedirs(default_content_path, exist_ok=True)
-    return default_content_path
+def poll_tasks():
+    """Apply messages from the background task, then check again shortly"""
+    try:
+        while True:
+            message = task_queue.get_nowait()
+            kind = message[0]
+            if kind == "progress":
+                _, done, total, text = message
+                progress_bar.config(maximum=max(total, 1), value=done)
+                status_label.config(text=text)
+            elif kind == "done":
+                set_busy(False, "Done")
+                message[1](message[2])
+            elif kind == "catalog":
+                search_notes()
+            elif kind == "cancelled":
+                set_busy(False, "Cancelled")
+            elif kind == "error":
+                set_busy(False, "Failed")
+                _, on_error, error = message
+                if on_error is not None:
+                    on_error(error)
+                else:
+                    messagebox.showerror("Error", str(error))
+    except queue.Empty:
+        pass
+    root.after(100, poll_tasks)
+
+def set_busy(busy, text):
+    state = "disabled" if busy else "normal"
+    for button in (process_button, github_push_button, delete_button):
+        button.config(state=state)
+    cancel_button.config(state="normal" if busy else "disabled")
+    if busy:
+        progress_bar.config(value=0)
+    status_label.config(text=text)
+
+def cancel_task():
+    cancel_event.set()
+    status_label.config(text="Cancelling...")
+
+def run_cancellable(cmd, cwd):
+    """subprocess.run(check=True) that kills the command when the task is cancelled"""
+    import subprocess
+    with span(" ".join(cmd[:2])):
+        process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, cwd=cwd)
+        while True:
+            try:
+                stdout, stderr = process.communicate(timeout=0.2)
+                break
+            except subprocess.TimeoutExpired:
+                if cancel_event.is_set():
+                    process.kill()
+                    process.communicate()
+                    raise Cancelled()
+    if process.returncode != 0:
+        raise subprocess.CalledProcessError(process.returncode, cmd, stdout, stderr)
+    return stdout
 
 def process_files():
-    global featured_image_path, dropped_files
+    # The pipeline is only needed once files are processed, so it stays out of startup
+    from attachments import AttachmentIndex
+    from engine import IMAGE_EXTENSIONS, sync_bundle
+    from images import ImageOptions
+    from manifest import Manifest
+    from media import MediaStore
     target_folder_name = target_folder_entry.get()
     if not target_folder_name.strip():
         messagebox.showerror("Error", "Please enter a folder name.")
@@ -101,65 +189,50 @@ def process_files():
     # Define target folder path
     target_folder = os.path.join(posts_base_path, target_folder_name)
 
-    # Check if the target folder exists and replace it
-    if os.path.exists(target_folder):
-        shutil.rmtree(target_folder)  # Remove the existing folder
-
-    # Create a new folder
-    os.makedirs(target_folder, exist_ok=True)
-
-    first_image_handled = False  # Flag to handle the first image duplication
-
-    for filepath in dropped_files:
-        filename = os.path.basename(filepath)
-
-        if filename.endswith(".md"):
-            # Process Markdown files
-            with open(filepath, "r", encoding="utf-8") as file:
-                content = file.read()
-
-            # Find and replace image links
-            images = re.findall(r'\[\[([^]]*\.png)\]\]', content)
-            for image in images:
-                # Preserve the original filename, ensuring spaces are URL encoded as %20
-                encoded_image = image.replace(' ', '%20')
-                markdown_image = f"!![Image Description]({encoded_image})"
-                content = content.replace(f"[[{image}]]", markdown_image)
-
-                # Handle the first image duplication
-                if not first_image_handled:
-                    source_image_path = os.path.join(os.path.dirname(filepath), image)
-                    if os.path.exists(source_image_path):
-                        target_image_path = os.path.join(target_folder, image)
-                        shutil.copy(source_image_path, target_image_path)  # Copy the original image
-                        first_image_handled = True
-
-            # Write updated content to new Markdown file in target folder
-            target_md_path = os.path.join(target_folder, "index.md")
-            with open(target_md_path, "w", encoding="utf-8") as file:
-                file.write(content)
-
-        elif filename.endswith((".png", ".jpg", ".jpeg")):
-            # Copy image files to target folder
-            shutil.copy(filepath, target_folder)
-
-    # Handle featured image
-    if featured_image_path and os.path.exists(featured_image_path):
-        featured_target_path = os.path.join(target_folder, "featured.png")
-        # Convert to PNG if not already
-        if not featured_image_path.lower().endswith('.png'):
-            img = Image.open(featured_image_path)
-            img.save(featured_target_path, 'PNG')
-        else:
-            shutil.copy(featured_image_path, featured_target_path)
-
-    messagebox.showinfo("Success", f"Files processed and saved to:\n{target_folder}")
+    # Read everything the worker needs from Tk now, widgets are main-thread only
+    markdown_files = [f for f in dropped_files if f.endswith(".md")]
+    image_files = [f for f in dropped_files if f.endswith(IMAGE_EXTENSIONS)]
+    featured_image = featured_image_path
+    image_options = ImageOptions() if optimize_images_var.get() else None
+    media = MediaStore(paths["site_repo"]) if shared_media_var.get() else None
+    cache = get_image_cache()
+    lookups = cache.hits + cache.misses
+
+    def work(report):
+        from link_graph import LinkGraph
+        from related import RelatedPosts
+        from search_index import SearchIndex
+        with span("process files", folder=target_folder_name):
+            manifest = Manifest.load()
+            with span("attachment index"):
+                attachments = AttachmentIndex.load(paths["obsidian_vault"])
+            with span("link graph"):
+                links = LinkGraph.load(paths["obsidian_vault"])
+            changed = sync_bundle(manifest, target_folder, markdown_files, image_files, featured_image,
+                                  attachments, image_options, cache, progress=report, links=links,
+                                  media=media)
+            manifest.save()
+            with span("search index"):
+                changed.extend(SearchIndex.load(paths["site_repo"]).update())
+            with span("related posts"):
+                changed.extend(RelatedPosts(paths["site_repo"]).update())
+        return changed
+
+    def on_success(changed):
+        global featured_image_path, dropped_files
+        unpublished_paths.update(changed)
+        # Variants and converted featured images both go through the cache
+        if cache.hits + cache.misses != lookups:
+            status_label.config(text=f"Done. {cache.summary()}")
+        messagebox.showinfo("Success", f"Files processed and saved to:\n{target_folder}")
+
+        # Reset featured image and list of dropped files after processing
+        dropped_files = []
+        featured_image_path = None
+        dropped_files_label.config(text="Drop files here")
+        featured_image_label.config(text="No image selected")
 
-    # Reset featured image and list of dropped files after processing
-    dropped_files = []
-    featured_image_path = None
-    dropped_files_label.config(text="Drop files here")
-    featured_image_label.config(text="No image selected")
+    start_task(f"Processing {target_folder_name}...", work, on_success)
 
 def select_featured_image():
     global featured_image_path
@@ -197,88 +270,171 @@ def browse_files():
     dropped_files.extend(selected_files)
     dropped_files_label.config(text="\n".join(dropped_files))
 
+def refresh_catalog(_=None):
+    """Bring the note catalog up to date on a background thread, then rerun the note search"""
+    global catalog_thread
+    if catalog_thread is not None and catalog_thread.is_alive():
+        return
+    vault = paths["obsidian_vault"]
+
+    def run():
+        from catalog import Catalog
+        catalog = Catalog()
+        try:
+            with span("refresh catalog"):
+                catalog.refresh(vault)
+        except Exception as e:
+            print(f"Could not refresh the note catalog: {e}")
+        finally:
+            catalog.close()
+        task_queue.put(("catalog",))
+
+    catalog_thread = threading.Thread(target=run, daemon=True)
+    catalog_thread.start()
+
+def toggle_changed_notes():
+    global last_deploy_time
+    if changed_notes_var.get():
+        from catalog import last_deploy
+        last_deploy_time = last_deploy(paths["site_repo"]) or 0.0
+    search_notes()
+
+def search_notes(_=None):
+    """Full-text search of the vault's notes through the catalog instead of the file dialog"""
+    global note_catalog
+    from catalog import Catalog, format_note
+    if note_catalog is None:
+        note_catalog = Catalog()
+    changed_only = changed_notes_var.get()
+    notes = note_catalog.query(paths["obsidian_vault"], note_search_entry.get(),
+                               publishable=True if changed_only else None,
+                               changed_since=last_deploy_time if changed_only else None)
+    note_list.set_items(notes, render=format_note)
+
+def add_found_note(_=None):
+    note = note_list.selected_item()
+    if note is None:
+        return
+    if note["path"] not in dropped_files:
+        dropped_files.append(note["path"])
+    dropped_files_label.config(text="\n".join(dropped_files))
+
 def push_to_github():
-    try:
-        # Dynamically find the git repository
-        site_path = paths["site_repo"]
-        
-        # Verify it's a git repository
-        if not os.path.exists(os.path.join(site_path, ".git")):
-            messagebox.showerror("Error", "Not a git repository. Please select a valid repository.")
-            return
+    # Dynamically find the git repository
+    site_path = paths["site_repo"]
 
-        # Change to the repository directory
-        os.chdir(site_path)
-        
-        # Run Git commands
-        commands = [
-            ["git", "add", "."],
-            ["git", "commit", "-m", f"Site update: {os.path.basename(target_folder_entry.get())}"],
-            ["git", "pull"],
-            ["git", "push", "-u", "origin", "master"]
-        ]
-        
-        # Execute each command and capture output
-        for cmd in commands:
-            result = subprocess.run(cmd, capture_output=True, text=True, check=True)
-            print(f"Command {' '.join(cmd)} output: {result.stdout}")
-        
-        # Show success message
-        messagebox.showinfo("GitHub Push", "Successfully pushed to GitHub!")
-    
-    except subprocess.CalledProcessError as e:
-        # Handle Git command errors
-        error_message = f"Git error: {e.stderr}"
-        messagebox.showerror("GitHub Push Error", error_message)
-    except Exception as e:
-        # Handle other potential errors
-        messagebox.showerror("Error", str(e))
+    # Verify it's a git repository
+    if not os.path.exists(os.path.join(site_path, ".git")):
+        messagebox.showerror("Error", "Not a git repository. Please select a valid repository.")
+        return
+
+    import subprocess
+    from publish import NothingToPublish, publish
+
+    # Only the paths written since the last push get staged
+    paths_to_publish = set(unpublished_paths)
+    message = f"Site update: {os.path.basename(target_folder_entry.get())}"
+
+    def work(report):
+        with span("publish", paths=len(paths_to_publish)):
+            return publish(site_path, paths_to_publish, message, run=run_cancellable, progress=report)
+
+    def on_success(commit):
+        unpublished_paths.difference_update(paths_to_publish)
+        messagebox.showinfo("GitHub Push", f"Successfully pushed {commit[:7]} to GitHub!")
+
+    def on_error(e):
+        if isinstance(e, NothingToPublish):
+            messagebox.showinfo("GitHub Push", str(e))
+        elif isinstance(e, subprocess.CalledProcessError):
+            # Handle Git command errors
+            messagebox.showerror("GitHub Push Error", f"Git error: {e.stderr}")
+        else:
+            # Handle other potential errors
+            messagebox.showerror("Error", str(e))
+
+    start_task("Pushing to GitHub...", work, on_success, on_error)
+
+def format_post(post):
+    return f"{post['date'][:10]:<10}  {post['title']}{'  [draft]' if post['draft'] else ''}"
 
 def load_posts():
+    global listed_posts, search_index
+    from post_index import PostIndex
     # Dynamically resolve the content posts directory
     posts_base_path = resolve_site_structure(paths["site_repo"])
     
-    print(f"Looking for posts in: {posts_base_path}")
-    
     # Check if the posts folder exists
     if os.path.exists(posts_base_path):
-        # Try to list directories inside the posts folder
-        posts = [f for f in os.listdir(posts_base_path) if os.path.isdir(os.path.join(posts_base_path, f))]
-        
-        # Debugging: Print the list of posts found
-        if posts:
-            print(f"Found the following posts: {posts}")
-        else:
-            print("No post folders found.")
-        
-        # Clear previous list and load new posts
-        post_listbox.delete(0, 'end')  # Clear previous list
-        for post in posts:
-            post_listbox.insert('end', post)  # Add each post folder to the listbox
+        # The cached index only re-reads posts that changed since last time
+        with span("load posts"):
+            post_index = PostIndex.load(posts_base_path)
+        draft = {"All": None, "Published": False, "Drafts": True}[draft_filter_var.get()]
+        listed_posts = post_index.query(sort=sort_var.get(), tag=tag_filter_entry.get().strip() or None,
+                                        draft=draft)
+        search_index = PrefixIndex(listed_posts, lambda post: (post["title"], post["name"].replace("-", " ")))
+        search_posts()
 
     else:
         print(f"Post folder does not exist at the path: {posts_base_path}")
         messagebox.showerror("Error", "Posts folder not found.")
 
+def search_posts(_=None):
+    """Type-ahead filter of the loaded posts; only the visible rows are rendered"""
+    query = search_entry.get()
+    # Nothing is indexed until the posts are first loaded
+    if query.strip() and search_index is not None:
+        posts = [listed_posts[i] for i in search_index.find(query)]
+    else:
+        posts = listed_posts
+    post_list.set_items(posts, render=format_post)
+
 def delete_post():
-    selected_post = post_listbox.curselection()
-    if not selected_post:
+    selected_post = post_list.selected_item()
+    if selected_post is None:
         messagebox.showerror("Error", "Please select a post to delete.")
         return
-    post_name = post_listbox.get(selected_post)
+    post_name = selected_post["name"]
     
     # Dynamically resolve the content posts directory
     posts_base_path = resolve_site_structure(paths["site_repo"])
     posts_folder = os.path.join(posts_base_path, post_name)
 
     # Confirm deletion
-    if messagebox.askyesno("Confirm Deletion", f"Are you sure you want to delete the post: {post_name}?"):
-        shutil.rmtree(posts_folder)  # Delete the post folder
+    if not messagebox.askyesno("Confirm Deletion", f"Are you sure you want to delete the post: {post_name}?"):
+        return
+
+    def work(report):
+        from manifest import Manifest
+        from related import RelatedPosts
+        from search_index import SearchIndex
+        with span("delete post", post=post_name):
+            shutil.rmtree(posts_folder)  # Delete the post folder
+            changed = []
+            manifest = Manifest.load()
+            manifest.forget(posts_folder)
+            manifest.save()
+            report(1, 3, "Updating the search index...")
+            with span("search index"):
+                changed.extend(SearchIndex.load(paths["site_repo"]).update())
+            report(2, 3, "Updating related posts...")
+            with span("related posts"):
+                changed.extend(RelatedPosts(paths["site_repo"]).update())
+        return changed
+
+    def on_success(changed):
+        unpublished_paths.update(changed)
         load_posts()  # Reload the post list
 
+    # Recorded up front so a cancelled task still publishes the deletion; the indexes catch up next update
+    unpublished_paths.add(posts_folder)
+    start_task(f"Deleting {post_name}...", work, on_success)
+
 # Initialize the GUI
 load_or_set_paths()
 
+# Loads the tkdnd Tcl extension, which only the main window needs
+from tkinterdnd2 import TkinterDnD, DND_FILES
 root = TkinterDnD.Tk()
 root.title("Markdown and Image Processor with Post Manager")
 root.geometry("800x800")
@@ -304,6 +460,20 @@ dropped_files_label.dnd_bind("<<Drop>>", on_drop)
 browse_button = Button(left_frame, text="Browse Files", command=browse_files)
 browse_button.pack(pady=5)
 
+# Note search over the vault catalog, refreshed in the background whenever the search box is entered
+Label(left_frame, text="Find notes in the vault:").pack(pady=5)
+note_search_entry = Entry(left_frame, width=40)
+note_search_entry.pack(pady=5)
+note_search_entry.bind("<KeyRelease>", search_notes)
+note_search_entry.bind("<FocusIn>", refresh_catalog)
+changed_notes_var = BooleanVar(value=False)
+Checkbutton(left_frame, text="Only publishable notes changed since the last deploy", variable=changed_notes_var,
+            command=toggle_changed_notes).pack(pady=5)
+note_list = VirtualList(left_frame, width=50, height=6)
+note_list.pack(pady=5)
+note_list.listbox.bind("<Double-Button-1>", add_found_note)
+Button(left_frame, text="Add Selected Note", command=add_found_note).pack(pady=5)
+
 # Target folder name input
 Label(left_frame, text="Enter new post folder:").pack(pady=10)
 target_folder_entry = Entry(left_frame, width=40)
@@ -320,6 +490,14 @@ featured_image_button.pack(pady=5)
 featured_image_label = Label(left_frame, text="No image selected")
 featured_image_label.pack(pady=5)
 
+# Optimized images toggle
+optimize_images_var = BooleanVar(value=False)
+Checkbutton(left_frame, text="Optimize images (WebP/AVIF, responsive sizes)", variable=optimize_images_var).pack(pady=5)
+
+# Shared attachment store toggle
+shared_media_var = BooleanVar(value=False)
+Checkbutton(left_frame, text="Store attachments once under static/media", variable=shared_media_var).pack(pady=5)
+
 # Right column for actions and post management
 right_frame = Frame(main_frame)
 right_frame.grid(row=0, column=1, sticky="n")
@@ -332,17 +510,40 @@ process_button.pack(pady=20)
 github_push_button = Button(right_frame, text="Push to GitHub", command=push_to_github)
 github_push_button.pack(pady=20)
 
+# Progress of the running task
+progress_bar = ttk.Progressbar(right_frame, length=300, mode="determinate")
+progress_bar.pack(pady=5)
+status_label = Label(right_frame, text="Idle", width=50, anchor="w")
+status_label.pack(pady=5)
+cancel_button = Button(right_frame, text="Cancel", command=cancel_task, state="disabled")
+cancel_button.pack(pady=5)
+
 # Post management section
 Label(right_frame, text="Manage Posts:").pack(pady=10)
 
-# Listbox to display posts
-post_listbox = Listbox(right_frame, width=50, height=10)
-post_listbox.pack(pady=10)
-
-# Scrollbar for the listbox
-scrollbar = Scrollbar(right_frame, orient="vertical", command=post_listbox.yview)
-scrollbar.pack(side="right", fill="y")
-post_listbox.config(yscrollcommand=scrollbar.set)
+# Sorting and filtering of the post list
+filter_frame = Frame(right_frame)
+filter_frame.pack(pady=5)
+sort_var = StringVar(value="Newest")
+OptionMenu(filter_frame, sort_var, *SORT_KEYS, command=lambda _: load_posts()).pack(side="left")
+draft_filter_var = StringVar(value="All")
+OptionMenu(filter_frame, draft_filter_var, "All", "Published", "Drafts", command=lambda _: load_posts()).pack(side="left")
+Label(filter_frame, text="Tag:").pack(side="left")
+tag_filter_entry = Entry(filter_frame, width=15)
+tag_filter_entry.pack(side="left")
+tag_filter_entry.bind("<Return>", lambda _: load_posts())
+
+# Type-ahead search over the loaded posts
+search_frame = Frame(right_frame)
+search_frame.pack(pady=5)
+Label(search_frame, text="Search:").pack(side="left")
+search_entry = Entry(search_frame, width=30)
+search_entry.pack(side="left")
+search_entry.bind("<KeyRelease>", search_posts)
+
+# Virtualized list to display posts, only the visible rows exist in Tk
+post_list = VirtualList(right_frame, width=50, height=10)
+post_list.pack(pady=10)
 
 # Load posts button
 load_button = Button(right_frame, text="Load Posts", command=load_posts)
@@ -353,6 +554,7 @@ delete_button = Button(right_frame, text="Delete Selected Post", command=delete_
 delete_button.pack(pady=5)
 
 # Start the GUI event loop
+root.after(100, poll_tasks)
 root.mainloop()
 
 
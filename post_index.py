@@ -0,0 +1,138 @@
+"""
+Cached listing of the site's posts for the Post Manager.
+
+Each post folder under content/posts is listed with os.scandir and its
+index.md front matter (title, date, draft, tags) is parsed once, then
+cached on disk next to ~/.markdown_processor_config.json. On refresh a
+post is only re-parsed when its folder or index.md mtime changed, so a
+reload costs one scandir plus a stat per post.
+"""
+import datetime
+import json
+import os
+
+from engine import parse_front_matter
+
+index_file = os.path.join(os.path.expanduser('~'), '.markdown_processor_posts.json')
+
+SORT_KEYS = {
+    "Newest": (lambda post: (post["date"], post["name"]), True),
+    "Oldest": (lambda post: (post["date"], post["name"]), False),
+    "Title": (lambda post: (post["title"].lower(), post["name"]), False),
+    "Folder": (lambda post: post["name"].lower(), False),
+}
+
+
+def _stamp(path: str) -> int | None:
+    try:
+        return os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+def read_index_md(post_dir: str) -> tuple[dict, str]:
+    """Front matter and body of a post's index.md, empty if it is missing or unreadable"""
+    try:
+        with open(os.path.join(post_dir, "index.md"), "r", encoding="utf-8") as file:
+            return parse_front_matter(file.read())
+    except (FileNotFoundError, UnicodeDecodeError):
+        return {}, ""
+
+
+def read_post(post_dir: str, name: str) -> dict:
+    """Parse the fields the Post Manager shows from a post's index.md"""
+    meta, _ = read_index_md(post_dir)
+    return post_fields(meta, name)
+
+
+def post_fields(meta: dict, name: str) -> dict:
+    date = meta.get("date") or ""
+    if isinstance(date, (datetime.date, datetime.datetime)):
+        date = date.isoformat()
+    tags = meta.get("tags") or []
+    if isinstance(tags, str):
+        tags = [tags]
+    return {
+        "name": name,
+        "title": str(meta.get("title") or name),
+        "date": str(date),
+        "draft": meta.get("draft") is True,
+        "tags": [str(tag) for tag in tags],
+    }
+
+
+class PostIndex:
+    read_post = staticmethod(read_post)
+
+    def __init__(self, posts_dir: str, cache_path: str = index_file):
+        self.posts_dir = os.path.abspath(posts_dir)
+        self.cache_path = cache_path
+        self.posts = {}
+
+    @classmethod
+    def load(cls, posts_dir: str, cache_path: str = index_file, refresh: bool = True) -> "PostIndex":
+        """Load the cached listing and, unless refresh is False, bring it up to date"""
+        index = cls(posts_dir, cache_path)
+        if os.path.exists(cache_path):
+            try:
+                with open(cache_path, "r") as file:
+                    index.posts = json.load(file).get(index.posts_dir, {})
+            except (json.JSONDecodeError, OSError):
+                index.posts = {}
+        if refresh and index.refresh():
+            index.save()
+        return index
+
+    def save(self):
+        data = {}
+        if os.path.exists(self.cache_path):
+            try:
+                with open(self.cache_path, "r") as file:
+                    data = json.load(file)
+            except (json.JSONDecodeError, OSError):
+                data = {}
+        data[self.posts_dir] = self.posts
+        tmp_path = self.cache_path + ".tmp"
+        with open(tmp_path, "w") as file:
+            # json.dumps uses the C encoder, json.dump does not
+            file.write(json.dumps(data))
+        os.replace(tmp_path, self.cache_path)
+
+    def refresh(self) -> set[str]:
+        """Re-read posts whose folder or index.md changed. Returns the names of posts changed or removed."""
+        changed = set()
+        seen = set()
+        if os.path.isdir(self.posts_dir):
+            with os.scandir(self.posts_dir) as entries:
+                for entry in entries:
+                    if not entry.is_dir():
+                        continue
+                    seen.add(entry.name)
+                    stamp = [entry.stat().st_mtime_ns, _stamp(os.path.join(entry.path, "index.md"))]
+                    cached = self.posts.get(entry.name)
+                    if cached is None or cached["stamp"] != stamp:
+                        self.posts[entry.name] = {**self.read_post(entry.path, entry.name), "stamp": stamp}
+                        changed.add(entry.name)
+
+        for name in set(self.posts) - seen:
+            del self.posts[name]
+            changed.add(name)
+        return changed
+
+    def tags(self) -> list[str]:
+        return sorted({tag for post in self.posts.values() for tag in post["tags"]})
+
+    def query(self, sort: str = "Newest", tag: str | None = None, draft: bool | None = None,
+              text: str | None = None) -> list[dict]:
+        """Posts filtered by tag, draft status and a title/folder substring, then sorted"""
+        posts = self.posts.values()
+        if tag:
+            posts = [post for post in posts if tag in post["tags"]]
+        if draft is not None:
+            posts = [post for post in posts if post["draft"] is draft]
+        if text:
+            needle = text.lower()
+            posts = [post for post in posts
+                     if needle in post["title"].lower() or needle in post["name"].lower()]
+        key, reverse = SORT_KEYS[sort]
+        return sorted(posts, key=key, reverse=reverse)
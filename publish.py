@@ -0,0 +1,252 @@
+"""
+Publish the site repository: stage, commit and push in as few steps as possible.
+
+The old push ran `git add .`, `git commit`, `git pull` and `git push`
+every time. `git add .` stats the whole working tree (public/, the theme
+submodule) and the pull costs a network round-trip even when there is
+nothing to send. publish() instead:
+
+  * stages only the paths the importer wrote this session,
+  * builds the commit in-process with pygit2 or dulwich when one of them
+    is installed, falling back to the git CLI,
+  * returns without touching the network when nothing was staged and the
+    branch is not ahead of its remote,
+  * pushes first and only pulls (with --rebase) when the push is rejected.
+
+Pushing always goes through the git CLI so SSH keys and credential
+helpers keep working.
+"""
+import os
+import subprocess
+
+from tracing import span
+
+DEFAULT_REMOTE = "origin"
+DEFAULT_BRANCH = "master"
+
+
+class NothingToPublish(Exception):
+    pass
+
+
+class WrongBranch(Exception):
+    pass
+
+
+def run_git(cmd, cwd):
+    """subprocess.run(check=True) returning stdout, the default command runner"""
+    with span(" ".join(cmd[:2])):
+        return subprocess.run(cmd, cwd=cwd, check=True, capture_output=True, text=True).stdout
+
+
+def relative_paths(site_repo: str, paths) -> list[str]:
+    """Repository-relative, '/'-separated paths inside site_repo"""
+    site_repo = os.path.abspath(site_repo)
+    relative = set()
+    for path in paths:
+        rel = os.path.relpath(os.path.abspath(path), site_repo)
+        if rel == "." or rel.startswith(".." + os.sep) or rel == "..":
+            continue
+        relative.add(rel.replace(os.sep, "/"))
+    return sorted(relative)
+
+
+def expand_paths(site_repo: str, relpaths, tracked) -> list[str]:
+    """
+    Turn a mix of files and folders into the files to stage: everything
+    currently on disk below each path plus the tracked entries below it
+    that no longer exist.
+    """
+    tracked = sorted(tracked)
+    files = set()
+    for rel in relpaths:
+        full = os.path.join(site_repo, rel)
+        if os.path.isdir(full):
+            for dirpath, _, filenames in os.walk(full):
+                for filename in filenames:
+                    files.add(os.path.relpath(os.path.join(dirpath, filename), site_repo).replace(os.sep, "/"))
+        else:
+            files.add(rel)
+        files.update(entry for entry in tracked if entry.startswith(rel + "/"))
+    return sorted(files)
+
+
+class CliBackend:
+    """
+    git CLI fallback. Stages with one `git add` limited to the written
+    paths and commits with write-tree/commit-tree/update-ref, which unlike
+    `git commit` never scans the rest of the working tree.
+    """
+    name = "git"
+
+    def __init__(self, site_repo, run=run_git):
+        self.site_repo = site_repo
+        self.run = run
+
+    def commit(self, relpaths, message) -> str | None:
+        if relpaths:
+            # A path written and deleted again before it was ever committed matches nothing,
+            # and git add stops on a pathspec that matches nothing
+            tracked = set(self.run(["git", "ls-files", "-z", "--", *relpaths], self.site_repo).split("\0"))
+            relpaths = [rel for rel in relpaths if os.path.lexists(os.path.join(self.site_repo, rel))
+                        or rel in tracked or any(entry.startswith(rel + "/") for entry in tracked)]
+        if relpaths:
+            self.run(["git", "add", "-A", "--", *relpaths], self.site_repo)
+        tree = self.run(["git", "write-tree"], self.site_repo).strip()
+        try:
+            head, head_tree = self.run(["git", "rev-parse", "HEAD", "HEAD^{tree}"], self.site_repo).split()
+        except subprocess.CalledProcessError:
+            head = head_tree = None
+        if tree == head_tree:
+            return None
+        parents = ["-p", head] if head else []
+        commit = self.run(["git", "commit-tree", tree, *parents, "-m", message], self.site_repo).strip()
+        self.run(["git", "update-ref", "-m", f"commit: {message}", "HEAD", commit, *([head] if head else [])],
+                 self.site_repo)
+        return commit
+
+    def is_ahead(self, remote, branch) -> bool:
+        try:
+            local, upstream = self.run(["git", "rev-parse", f"refs/heads/{branch}",
+                                        f"refs/remotes/{remote}/{branch}"], self.site_repo).split()
+        except subprocess.CalledProcessError:
+            # Never pushed, or no local branch yet
+            return True
+        return local != upstream
+
+
+class Pygit2Backend:
+    name = "pygit2"
+
+    def __init__(self, site_repo):
+        import pygit2
+        self.pygit2 = pygit2
+        self.site_repo = site_repo
+        self.repo = pygit2.Repository(site_repo)
+
+    def commit(self, relpaths, message) -> str | None:
+        index = self.repo.index
+        index.read()
+        for rel in expand_paths(self.site_repo, relpaths, (entry.path for entry in index)):
+            if os.path.exists(os.path.join(self.site_repo, rel)):
+                if not self.repo.path_is_ignored(rel):
+                    index.add(rel)
+            elif rel in index:
+                index.remove(rel)
+        index.write()
+        tree = index.write_tree()
+
+        parents = []
+        if not self.repo.head_is_unborn:
+            head = self.repo.head.peel(self.pygit2.Commit)
+            if head.tree_id == tree:
+                return None
+            parents = [head.id]
+        signature = self.repo.default_signature
+        return str(self.repo.create_commit("HEAD", signature, signature, message, tree, parents))
+
+    def is_ahead(self, remote, branch) -> bool:
+        local = self.repo.references.get(f"refs/heads/{branch}")
+        upstream = self.repo.references.get(f"refs/remotes/{remote}/{branch}")
+        return local is None or upstream is None or local.target != upstream.target
+
+
+class DulwichBackend:
+    name = "dulwich"
+
+    def __init__(self, site_repo):
+        from dulwich.ignore import IgnoreFilterManager
+        from dulwich.repo import Repo
+        self.site_repo = site_repo
+        self.repo = Repo(site_repo)
+        self.ignored = IgnoreFilterManager.from_repo(self.repo)
+
+    def commit(self, relpaths, message) -> str | None:
+        tracked = (path.decode("utf-8", "surrogateescape") for path in self.repo.open_index())
+        files = [rel for rel in expand_paths(self.site_repo, relpaths, tracked)
+                 if not self.ignored.is_ignored(rel)]
+        if files:
+            # stage() also drops index entries whose file was deleted
+            self.repo.stage(files)
+
+        tree = self.repo.open_index().commit(self.repo.object_store)
+        try:
+            if self.repo[self.repo.head()].tree == tree:
+                return None
+        except KeyError:
+            pass
+        return self.repo.do_commit(message.encode("utf-8")).decode("ascii")
+
+    def is_ahead(self, remote, branch) -> bool:
+        refs = self.repo.refs
+        local = refs.as_dict().get(f"refs/heads/{branch}".encode())
+        upstream = refs.as_dict().get(f"refs/remotes/{remote}/{branch}".encode())
+        return local is None or upstream is None or local != upstream
+
+
+BACKENDS = {"pygit2": Pygit2Backend, "dulwich": DulwichBackend}
+
+
+def open_backend(site_repo: str, backend: str | None = None, run=run_git):
+    """The requested backend, else the first installed in-process one, else the git CLI"""
+    if backend == "git":
+        return CliBackend(site_repo, run)
+    names = [backend] if backend else list(BACKENDS)
+    for name in names:
+        try:
+            return BACKENDS[name](site_repo)
+        except ImportError:
+            if backend:
+                raise
+    return CliBackend(site_repo, run)
+
+
+def _is_rejected(error: subprocess.CalledProcessError) -> bool:
+    stderr = error.stderr or ""
+    return "[rejected]" in stderr or "non-fast-forward" in stderr or "fetch first" in stderr
+
+
+def publish(site_repo, paths, message, remote=DEFAULT_REMOTE, branch=DEFAULT_BRANCH, backend=None,
+            run=run_git, progress=None) -> str:
+    """
+    Commit the given written/deleted paths and push them.
+
+    Returns the commit that was pushed. Raises NothingToPublish, without any
+    network access, when the paths hold no changes and nothing earlier is
+    waiting to be pushed, and WrongBranch, before committing anything, when
+    the site repository does not have the branch checked out.
+    """
+    def report(step, text):
+        if progress:
+            progress(step, 3, text)
+
+    site_repo = os.path.abspath(site_repo)
+    try:
+        current = run(["git", "symbolic-ref", "-q", "HEAD"], site_repo).strip()
+    except subprocess.CalledProcessError:
+        current = None
+    # The commit lands on HEAD while the push and the freshness check look at the branch
+    if current != f"refs/heads/{branch}":
+        checked_out = current.removeprefix("refs/heads/") if current else "a detached HEAD"
+        raise WrongBranch(f"The site repository is on {checked_out}; check out {branch} to publish.")
+    git = open_backend(site_repo, backend, run)
+    report(0, f"Committing with {git.name}...")
+    with span("publish commit", backend=git.name):
+        commit = git.commit(relative_paths(site_repo, paths), message)
+    if commit is None and not git.is_ahead(remote, branch):
+        raise NothingToPublish("No changes to publish.")
+
+    report(1, "Pushing...")
+    push = ["git", "push", remote, f"refs/heads/{branch}:refs/heads/{branch}"]
+    try:
+        run(push, site_repo)
+    except subprocess.CalledProcessError as e:
+        if not _is_rejected(e):
+            raise
+        # Someone pushed in between: replay our commit on top and try once more
+        report(2, "Remote has new commits, rebasing...")
+        run(["git", "pull", "--rebase", remote, branch], site_repo)
+        run(push, site_repo)
+        commit = None
+    report(3, "Pushed")
+    return commit or run(["git", "rev-parse", "HEAD"], site_repo).strip()
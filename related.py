@@ -0,0 +1,286 @@
+"""
+Precompute each post's related posts from the [related] indices in hugo.toml.
+
+Hugo scores every page against every other page on every build. Here the
+front matter of content/posts/*/index.md is cached (RelatedIndex) and an
+inverted index maps each keyword (a tag, a category, the year, a heading
+anchor) to the posts that have it, so scoring a post only visits the posts
+it shares a keyword with. Keywords nearly every post shares, like the
+year, are kept as bitsets over the posts sorted newest first and never
+enumerated: the posts they add only ever tie, and ties go to the newest.
+
+After a change only the changed posts and the posts sharing an old or new
+keyword with them are rescored. The results land in data/related/<post>.json:
+
+    [{"path": "/posts/first-post", "title": "First post", "score": 210}, ...]
+
+and layouts/partials/related.html reads them through .Site.Data.related,
+falling back to Hugo's own .Related for posts without a data file.
+"""
+import argparse
+import datetime
+import heapq
+import itertools
+import json
+import os
+import re
+import sys
+
+from engine import load_paths, resolve_site_structure
+from post_index import PostIndex, post_fields, read_index_md
+from render import load_site
+
+related_index_file = os.path.join(os.path.expanduser('~'), '.markdown_processor_related.json')
+
+DEFAULT_LIMIT = 3
+DEFAULT_INDICES = [{"name": "keywords", "weight": 100}, {"name": "date", "weight": 10, "pattern": "2006"}]
+# Keywords shared by more posts than this are scored as bitsets instead of enumerated
+BROAD_POSTINGS = 256
+MAX_BROAD = 8
+HEADING_RE = re.compile(r"^#{1,6}\s+(.+?)\s*#*\s*$", re.M)
+# Go reference-time layout pieces Hugo accepts in a date index's pattern
+GO_LAYOUT = [("2006", "%Y"), ("January", "%B"), ("Jan", "%b"), ("01", "%m"), ("02", "%d")]
+
+
+def anchor(heading: str) -> str:
+    """Hugo's default (GitHub style) heading ID"""
+    heading = re.sub(r"[^\w\- ]", "", heading.lower().strip())
+    return heading.replace(" ", "-")
+
+
+def read_related_post(post_dir: str, name: str) -> dict:
+    """PostIndex fields plus every list-like front matter field and the post's heading anchors"""
+    meta, body = read_index_md(post_dir)
+    post = post_fields(meta, name)
+    fields = {}
+    for key, value in meta.items():
+        if key in ("title", "date", "draft"):
+            continue
+        values = [value] if isinstance(value, (str, int, float)) and not isinstance(value, bool) else value
+        if isinstance(values, list):
+            fields[key] = [str(item) for item in values if isinstance(item, (str, int, float))]
+    return {
+        **post,
+        "fields": fields,
+        "fragments": sorted({anchor(heading) for heading in HEADING_RE.findall(body)}),
+    }
+
+
+class RelatedIndex(PostIndex):
+    """The Post Manager's cached listing, extended with the fields [related] can index"""
+    read_post = staticmethod(read_related_post)
+
+
+def date_keyword(date: str, pattern: str) -> str | None:
+    try:
+        day = datetime.datetime.fromisoformat(date.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    for layout, directive in GO_LAYOUT:
+        pattern = pattern.replace(layout, directive)
+    return day.strftime(pattern)
+
+
+class RelatedPosts:
+    def __init__(self, site_repo: str, limit: int | None = None, cache_path: str = related_index_file):
+        self.site_repo = os.path.abspath(site_repo)
+        self.cache_path = cache_path
+        self.posts_dir = resolve_site_structure(self.site_repo)
+        self.output_dir = os.path.join(self.site_repo, "data", "related")
+        site = load_site(self.site_repo)
+        config = site["related"]
+        self.indices = config.get("indices", DEFAULT_INDICES)
+        self.threshold = config.get("threshold", 80)
+        self.include_newer = config.get("includeNewer", False)
+        self.to_lower = config.get("toLower", False)
+        self.limit = limit or site["params"].get("article", {}).get("relatedContentLimit", DEFAULT_LIMIT)
+        self.build_future = site["build_future"]
+        # Kept between updates so a long-running caller only re-reads changed posts
+        self.index = None
+
+    def keywords(self, post: dict, index: dict, document: bool) -> set[str]:
+        """
+        Keywords of one post for one index. A post is matched by its own
+        headings (document side) against others' fragmentrefs for a
+        fragments index; every other index is symmetric.
+        """
+        name = index["name"]
+        if index.get("type") == "fragments" and document:
+            values = post["fragments"]
+        elif name == "date":
+            keyword = date_keyword(post["date"], index.get("pattern") or "2006") if post["date"] else None
+            values = [keyword] if keyword else []
+        else:
+            values = post["fields"].get(name, [])
+        if self.to_lower or index.get("toLower"):
+            return {value.lower() for value in values}
+        return set(values)
+
+    def is_listed(self, post: dict) -> bool:
+        if post["draft"]:
+            return False
+        return self.build_future or post["date"][:10] <= datetime.date.today().isoformat()
+
+    def build(self, posts: dict):
+        """Order the listed posts newest first and invert them into {index: {keyword: positions}}"""
+        self.order = sorted((post for post in posts.values() if self.is_listed(post)),
+                            key=lambda post: (post["date"], post["name"]), reverse=True)
+        self.position = {post["name"]: i for i, post in enumerate(self.order)}
+        self.postings = []
+        self.queries = []
+        for index in self.indices:
+            postings = {}
+            for i, post in enumerate(self.order):
+                for keyword in self.keywords(post, index, True):
+                    postings.setdefault(keyword, []).append(i)
+            self.postings.append(postings)
+            queries = postings
+            if index.get("type") == "fragments":
+                queries = {}
+                for i, post in enumerate(self.order):
+                    for keyword in self.keywords(post, index, False):
+                        queries.setdefault(keyword, []).append(i)
+            self.queries.append(queries)
+        self.bitsets = {}
+
+    def bitset(self, index_number: int, keyword: str) -> int:
+        key = (index_number, keyword)
+        if key not in self.bitsets:
+            mask = 0
+            for i in self.postings[index_number][keyword]:
+                mask |= 1 << i
+            self.bitsets[key] = mask
+        return self.bitsets[key]
+
+    def related(self, name: str) -> list[dict]:
+        """Top posts for one post, highest score first and newest first among equal scores"""
+        post = self.order[self.position[name]]
+        me = self.position[name]
+        scores = {}
+        broad = []
+        for number, index in enumerate(self.indices):
+            weight = index.get("weight", 0)
+            if not weight:
+                continue
+            for keyword in self.keywords(post, index, False):
+                positions = self.postings[number].get(keyword)
+                if not positions:
+                    continue
+                if len(positions) > BROAD_POSTINGS and len(broad) < MAX_BROAD:
+                    broad.append((weight, self.bitset(number, keyword)))
+                    continue
+                for i in positions:
+                    scores[i] = scores.get(i, 0) + weight
+
+        allowed = (1 << len(self.order)) - 1
+        if not self.include_newer:
+            # Posts are sorted newest first, so the older ones start at the first earlier date
+            first = next((i for i in range(me, -1, -1) if self.order[i]["date"] > post["date"]), -1) + 1
+            allowed &= ~((1 << first) - 1)
+        allowed &= ~(1 << me)
+        hits = 0
+        for i in scores:
+            hits |= 1 << i
+            scores[i] += sum(weight for weight, mask in broad if mask >> i & 1)
+        candidates = [(score, i) for i, score in scores.items() if allowed >> i & 1]
+
+        # Posts only the broad keywords reach score the sum of the broad keywords they are in,
+        # so for each combination of those keywords the newest few are all that can make the cut
+        remaining = allowed & ~hits
+        for size in range(len(broad), 0, -1):
+            for combination in itertools.combinations(range(len(broad)), size):
+                mask = remaining
+                for j, (_, bits) in enumerate(broad):
+                    mask = mask & bits if j in combination else mask & ~bits
+                score = sum(broad[j][0] for j in combination)
+                for _ in range(self.limit):
+                    if not mask:
+                        break
+                    low = mask & -mask
+                    candidates.append((score, low.bit_length() - 1))
+                    mask ^= low
+
+        top = heapq.nsmallest(self.limit, candidates, key=lambda candidate: (-candidate[0], candidate[1]))
+        if not top:
+            return []
+        best = top[0][0]
+        return [{"path": f"/posts/{self.order[i]['name']}", "title": self.order[i]["title"], "score": score}
+                for score, i in top if score * 100 >= best * self.threshold and score > 0]
+
+    def affected(self, old: dict | None, new: dict | None) -> set[str]:
+        """Listed posts whose score against a changed post can differ: those querying one of its keywords"""
+        names = set()
+        for number, index in enumerate(self.indices):
+            for post in (old, new):
+                if post is None:
+                    continue
+                for keyword in self.keywords(post, index, True):
+                    names.update(self.order[i]["name"] for i in self.queries[number].get(keyword, ()))
+        return names
+
+    def update(self, everything: bool = False) -> list[str]:
+        """Rescore the posts a change can reach and write their data files. Returns the files written or removed."""
+        if self.index is None:
+            self.index = RelatedIndex.load(self.posts_dir, self.cache_path, refresh=False)
+        index = self.index
+        before = dict(index.posts)
+        names = index.refresh()
+        if names:
+            index.save()
+        self.build(index.posts)
+
+        everything = everything or not os.path.isdir(self.output_dir)
+        if everything:
+            dirty = set(self.position)
+        else:
+            dirty = set()
+            for name in names:
+                dirty |= self.affected(before.get(name), index.posts.get(name))
+                dirty.add(name)
+
+        changed = []
+        for name in sorted(dirty):
+            path = os.path.join(self.output_dir, f"{name}.json")
+            if name in self.position:
+                changed.extend(self._write(path, self.related(name)))
+            elif os.path.exists(path):
+                os.remove(path)
+                changed.append(path)
+        if everything and os.path.isdir(self.output_dir):
+            for entry in os.listdir(self.output_dir):
+                if entry.endswith(".json") and entry[:-5] not in self.position:
+                    os.remove(os.path.join(self.output_dir, entry))
+                    changed.append(os.path.join(self.output_dir, entry))
+        return changed
+
+    def _write(self, path: str, related: list[dict]) -> list[str]:
+        data = json.dumps(related, ensure_ascii=False, indent=1).encode("utf-8")
+        try:
+            with open(path, "rb") as file:
+                if file.read() == data:
+                    return []
+        except FileNotFoundError:
+            os.makedirs(self.output_dir, exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as file:
+            file.write(data)
+        os.replace(tmp_path, path)
+        return [path]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Precompute related posts into data/related/")
+    parser.add_argument("--site", default=load_paths().get("site_repo"),
+                        help="Hugo site repository (default: configured site repo)")
+    parser.add_argument("--all", action="store_true", help="Rescore every post, not just the changed ones")
+    args = parser.parse_args(argv)
+    if not args.site or not os.path.isdir(args.site):
+        parser.error("site repository does not exist, pass --site")
+
+    for path in RelatedPosts(args.site).update(everything=args.all):
+        print(f"Updated {path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
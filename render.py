@@ -0,0 +1,594 @@
+"""
+Render content-only changes straight into public/ without a Hugo build.
+
+For the common case of a new or edited post this writes the post's page
+and patches the outputs that list it: the home page's recent cards, the
+home and section RSS feeds, the home JSON search index and the term and
+taxonomy pages of every taxonomy term the post gained or lost. Nothing
+else in public/ is touched, and files whose content did not change are
+not rewritten.
+
+Page chrome (head, menus, footer) comes from a page Hugo already built,
+so the theme stays the source of truth; only the main content is ours.
+The extracted shell and the compiled Markdown converter are cached, and
+front matter plus plain text of every post is kept in a PostIndex-style
+cache so a run only re-reads the posts that changed.
+
+Markdown rendering needs the `markdown` package (pip install -r requirements.txt).
+
+    python render.py --site ~/Projects/site [--all]
+"""
+import argparse
+import datetime
+import functools
+import html
+import json
+import math
+import os
+import re
+import shutil
+import sys
+import time
+from string import Template
+
+from engine import load_paths, resolve_site_structure
+from fastcopy import copy_file
+from media import MEDIA_DIR, MEDIA_URL_RE
+from post_index import PostIndex, post_fields, read_index_md
+from wikilinks import slugify
+
+render_index_file = os.path.join(os.path.expanduser('~'), '.markdown_processor_render.json')
+
+SHELL_CANDIDATES = (("tags/index.html", "/tags/"), ("categories/index.html", "/categories/"), ("404.html", "/404.html"))
+MARKDOWN_EXTENSIONS = ("fenced_code", "tables", "toc", "sane_lists")
+WORDS_PER_MINUTE = 213  # Hugo's ReadingTime divisor
+MAIN_RE = re.compile(r'(<main id="main-content" class="grow">)(.*?)(</main>)', re.S)
+RECENT_RE = re.compile(r'(<section class="w-full grid gap-4 sm:grid-cols-2 md:grid-cols-3">)(.*?)(</section>)',
+                       re.S)
+TAG_RE = re.compile(r"<[^>]+>")
+NO_DATE = datetime.datetime(1, 1, 1, tzinfo=datetime.timezone.utc)
+
+POST_TEMPLATE = Template("""
+<article>
+  <header id="single_header" class="mt-5 max-w-prose">
+    <h1 class="mt-0 text-4xl font-extrabold text-neutral-900 dark:text-neutral">$title</h1>
+    <div class="mt-1 mb-6 text-base text-neutral-500 dark:text-neutral-400 print:hidden">
+$meta
+    </div>
+  </header>
+  <section class="flex flex-col max-w-full mt-0 prose dark:prose-invert lg:flex-row">
+    <div class="min-w-0 min-h-0 max-w-fit">
+      <div class="article-content max-w-prose mb-20">
+$content
+      </div>
+    </div>
+  </section>
+</article>
+""")
+META_TEMPLATE = Template("""<div class="flex flex-row flex-wrap items-center">
+  $parts
+</div>""")
+LIST_TEMPLATE = Template("""
+<header>
+  <h1 class="mt-5 text-4xl font-extrabold text-neutral-900 dark:text-neutral">$title</h1>
+</header>
+<section class="space-y-10 w-full">
+$items
+</section>
+$pager
+""")
+PAGER_TEMPLATE = Template("""<nav class="flex flex-row pt-8 justify-between">
+  <span>$previous</span>
+  <span class="text-neutral-500 dark:text-neutral-400">$page / $pages</span>
+  <span>$next</span>
+</nav>""")
+ARTICLE_CARD_TEMPLATE = Template("""  <a class="flex flex-wrap article " href="$url">
+    $thumbnail<div class=" mt-3 md:mt-0">
+      <div class="items-center text-left text-xl font-semibold">
+        <div class="font-bold text-xl text-neutral-800 decoration-primary-500 hover:underline hover:underline-offset-2 dark:text-neutral"
+          href="$url">$title</div>
+      </div>
+      <div class="text-sm text-neutral-500 dark:text-neutral-400">
+$meta
+      </div>
+    </div>
+  </a>""")
+RECENT_CARD_TEMPLATE = Template("""
+  <a href="$url" class="min-w-full">
+    <div class="min-h-full border border-neutral-200 dark:border-neutral-700 border-2 rounded overflow-hidden shadow-2xl relative">
+        $thumbnail<div class="px-6 py-4">
+        <div class="font-bold text-xl text-neutral-800 decoration-primary-500 hover:underline hover:underline-offset-2 dark:text-neutral"
+          href="$url">$title</div>
+        <div class="text-sm text-neutral-500 dark:text-neutral-400">
+$meta
+        </div>
+      </div>
+      <div class="px-6 pt-4 pb-2">
+      </div>
+    </div>
+  </a>
+""")
+TERMS_TEMPLATE = Template("""
+<header>
+  <h1 class="mt-5 text-4xl font-extrabold text-neutral-900 dark:text-neutral">$title</h1>
+</header>
+<section class="flex flex-wrap max-w-prose -mx-2 overflow-hidden">
+$items
+</section>
+""")
+TERM_TEMPLATE = Template("""  <article class="w-full px-2 my-3 overflow-hidden sm:w-1/2 md:w-1/3 lg:w-1/4 xl:w-1/4">
+    <h2 class="flex items-center">
+      <a class="text-xl font-medium decoration-primary-500 hover:underline hover:underline-offset-2"
+        href="$url">$title</a>
+      <span class="px-2 text-base text-primary-500">&middot;</span>
+      <span class="text-base text-neutral-400">$count</span>
+    </h2>
+  </article>""")
+RSS_TEMPLATE = Template("""<?xml version="1.0" encoding="utf-8" standalone="yes"?>
+<rss version="2.0" xmlns:atom="http://www.w3.org/2005/Atom">
+  <channel>
+    <title>$title</title>
+    <link>$link</link>
+    <description>Recent content $where$site_title</description>
+    <generator>Hugo</generator>
+    <language>$language</language>$authors
+    <lastBuildDate>$build_date</lastBuildDate>
+    <atom:link href="${link}index.xml" rel="self" type="application/rss+xml" />$items
+  </channel>
+</rss>
+""")
+RSS_ITEM_TEMPLATE = Template("""
+    <item>
+      <title>$title</title>
+      <link>$link</link>
+      <pubDate>$date</pubDate>$author
+      <guid>$link</guid>
+      <description>$summary</description>
+    </item>""")
+ALIAS_TEMPLATE = Template("""<!DOCTYPE html>
+<html lang="$language">
+  <head>
+    <title>$url</title>
+    <link rel="canonical" href="$url">
+    <meta name="robots" content="noindex">
+    <meta charset="utf-8">
+    <meta http-equiv="refresh" content="0; url=$url">
+  </head>
+</html>
+""")
+
+
+@functools.lru_cache(maxsize=1)
+def markdown_converter():
+    import markdown
+    return markdown.Markdown(extensions=list(MARKDOWN_EXTENSIONS))
+
+
+def markdown_to_html(text: str) -> str:
+    return markdown_converter().reset().convert(text)
+
+
+def plain_text(markup: str) -> str:
+    return html.unescape(TAG_RE.sub("", markup)).strip()
+
+
+def read_rendered_post(post_dir: str, name: str) -> dict:
+    """PostIndex fields plus everything the listings need: slug, plain text, word count and taxonomies"""
+    meta, body = read_index_md(post_dir)
+    post = post_fields(meta, name)
+    text = plain_text(markdown_to_html(body)) if body.strip() else ""
+    featured = None
+    if os.path.isdir(post_dir):
+        featured = next((entry for entry in sorted(os.listdir(post_dir))
+                         if os.path.splitext(entry)[0].lower() in ("featured", "cover", "thumbnail")), None)
+    taxonomies = {}
+    for field in ("categories", "series", "authors"):
+        values = meta.get(field) or []
+        taxonomies[field] = [str(value) for value in ([values] if isinstance(values, str) else values)]
+    return {
+        **post,
+        **taxonomies,
+        "slug": slugify(str(meta.get("slug") or name)),
+        "summary": str(meta.get("summary") or ""),
+        "text": text,
+        "words": len(text.split()),
+        "featured": featured,
+    }
+
+
+class RenderIndex(PostIndex):
+    """The Post Manager's cached listing, extended with what the renderer needs"""
+    read_post = staticmethod(read_rendered_post)
+
+
+def load_site(site_repo: str) -> dict:
+    """Site settings from hugo.toml / config/_default, with Hugo's defaults"""
+    import tomllib
+    config = {}
+    for path in (os.path.join(site_repo, "hugo.toml"),
+                 os.path.join(site_repo, "config", "_default", "hugo.toml"),
+                 os.path.join(site_repo, "config", "_default", "languages.en.toml"),
+                 os.path.join(site_repo, "config", "_default", "params.toml")):
+        if os.path.exists(path):
+            with open(path, "rb") as file:
+                data = tomllib.load(file)
+            if os.path.basename(path) == "params.toml":
+                data = {"params": data}
+            params = {**config.get("params", {}), **data.pop("params", {})}
+            config.update(data)
+            config["params"] = params
+    author = config["params"].get("author", {}) if "params" in config else {}
+    return {
+        "title": config.get("title", ""),
+        "language": config.get("languageCode", config.get("defaultContentLanguage", "en")),
+        "author": f"{author['email']} ({author['name']})" if author.get("email") else "",
+        "taxonomies": config.get("taxonomies", {"tag": "tags", "category": "categories"}),
+        "pager_size": config.get("pagination", {}).get("pagerSize", 10),
+        "outputs": config.get("outputs", {}),
+        "build_future": config.get("buildFuture", False),
+        "related": config.get("related", {}),
+        "params": config.get("params", {}),
+    }
+
+
+class Shell:
+    """A page Hugo built, split around its title, canonical URL and <main> content"""
+
+    def __init__(self, markup: str, url: str):
+        match = MAIN_RE.search(markup)
+        if match is None:
+            raise ValueError("page has no <main id=\"main-content\"> element")
+        self.head = markup[:match.end(1)]
+        self.tail = markup[match.start(3):]
+        canonical = re.search(r'<link rel="canonical" href="([^"]*)"', self.head)
+        self.base_url = canonical.group(1)[:-len(url)] if canonical and canonical.group(1).endswith(url) else ""
+        self.url = url
+
+    def page(self, title: str, url: str, site_title: str, content: str) -> str:
+        title = html.escape(title, quote=False)
+        full_title = f"{title} &middot; {html.escape(site_title, quote=False)}" if title else site_title
+        head = re.sub(r"<title>.*?</title>", lambda _: f"<title>{full_title}</title>", self.head, count=1,
+                      flags=re.S)
+        head = head.replace(f'"{self.base_url}{self.url}"', f'"{self.base_url}{url}"')
+        head = re.sub(r'(<meta (?:property="og|name="twitter):title" content=")[^"]*"',
+                      lambda m: f'{m.group(1)}{html.escape(title)}"', head)
+        return head + content + self.tail
+
+
+@functools.lru_cache(maxsize=8)
+def _load_shell(path: str, url: str, mtime_ns: int) -> Shell:
+    with open(path, "r", encoding="utf-8") as file:
+        return Shell(file.read(), url)
+
+
+def load_shell(public_dir: str) -> Shell:
+    """The shell of the first built page we find, cached until that file changes"""
+    for relpath, url in SHELL_CANDIDATES:
+        path = os.path.join(public_dir, relpath)
+        if os.path.exists(path):
+            return _load_shell(path, url, os.stat(path).st_mtime_ns)
+    raise FileNotFoundError(f"No Hugo-built page to take the layout from in {public_dir}, run hugo once")
+
+
+def post_date(post: dict) -> datetime.datetime:
+    try:
+        date = datetime.datetime.fromisoformat(post["date"])
+    except ValueError:
+        return NO_DATE
+    return date if date.tzinfo else date.replace(tzinfo=datetime.timezone.utc)
+
+
+def display_date(date: datetime.datetime) -> str:
+    return f"{date.day} {date:%B} {date.year}"  # "2 January 2006"
+
+
+def rss_date(date: datetime.datetime) -> str:
+    import email.utils
+    return email.utils.format_datetime(date)
+
+
+def post_url(post: dict) -> str:
+    return f"/posts/{post['slug']}/"
+
+
+def term_url(taxonomy: str, term: str) -> str:
+    return f"/{taxonomy}/{slugify(term)}/"
+
+
+def term_title(term: str) -> str:
+    return term.title()
+
+
+def render_meta(post: dict) -> str:
+    date = post_date(post)
+    separator = '<span class="px-2 text-primary-500">&middot;</span>'
+    parts = [f'<time datetime="{date.isoformat().replace("+", "&#43;")}">{display_date(date)}</time>']
+    if post["words"]:
+        minutes = max(1, math.ceil(post["words"] / WORDS_PER_MINUTE))
+        parts.append(f"<span>{post['words']} words</span>")
+        parts.append(f'<span title="Reading time">{minutes} min{"s" if minutes > 1 else ""}</span>')
+    if post["draft"]:
+        parts.append('<span class="px-2 text-primary-500">Draft</span>')
+    return META_TEMPLATE.substitute(parts=separator.join(parts))
+
+
+def _thumbnail(post: dict, css: str) -> str:
+    if not post["featured"]:
+        return ""
+    return f'<div class="{css}" style="background-image:url({post_url(post)}{post["featured"]});"></div>\n        '
+
+
+def render_card(post: dict) -> str:
+    return ARTICLE_CARD_TEMPLATE.substitute(
+        url=post_url(post), title=html.escape(post["title"]), meta=render_meta(post),
+        thumbnail=_thumbnail(post, "w-full md:w-auto h-full thumbnail nozoom thumbnailshadow md:mr-7"))
+
+
+def render_recent_card(post: dict) -> str:
+    return RECENT_CARD_TEMPLATE.substitute(
+        url=post_url(post), title=html.escape(post["title"]), meta=render_meta(post),
+        thumbnail=_thumbnail(post, "w-full thumbnail_card nozoom"))
+
+
+def render_rss(site: dict, title: str, link: str, items: list[tuple[str, str, datetime.datetime, str]]) -> str:
+    """items are (title, link, date, summary), newest first"""
+    author = f"<author>{html.escape(site['author'])}</author>" if site["author"] else ""
+    authors = ""
+    if site["author"]:
+        authors = (f"\n    <managingEditor>{html.escape(site['author'])}</managingEditor>"
+                   f"\n    <webMaster>{html.escape(site['author'])}</webMaster>")
+    return RSS_TEMPLATE.substitute(
+        title=html.escape(f"{title} on {site['title']}" if title else site["title"]),
+        link=link,
+        where=f"in {html.escape(title)} on " if title else "on ",
+        site_title=html.escape(site["title"]),
+        language=site["language"],
+        authors=authors,
+        build_date=rss_date(max((date for _, _, date, _ in items), default=NO_DATE)),
+        items="".join(RSS_ITEM_TEMPLATE.substitute(title=html.escape(item_title), link=item_link,
+                                                   date=rss_date(date), author=author,
+                                                   summary=html.escape(summary))
+                      for item_title, item_link, date, summary in items),
+    )
+
+
+def _post_items(posts) -> list:
+    return [(post["title"], post_url(post), post_date(post), post["summary"]) for post in posts]
+
+
+def search_entry(post: dict) -> dict:
+    """One post's entry in the home JSON output, in the shape Blowfish's search expects"""
+    return {
+        "content": post["text"],
+        "date": display_date(post_date(post)),
+        "externalUrl": None,
+        "permalink": post_url(post),
+        "section": "Posts",
+        "summary": post["summary"],
+        "title": post["title"],
+        "type": "posts",
+    }
+
+
+class Renderer:
+    def __init__(self, site_repo: str, cache_path: str = render_index_file):
+        self.site_repo = site_repo
+        self.posts_dir = resolve_site_structure(site_repo)
+        self.public_dir = os.path.join(site_repo, "public")
+        self.cache_path = cache_path
+        self.site = load_site(site_repo)
+        self.changed = []
+
+    def write(self, relpath: str, text: str):
+        """Write a public/ file only if its content differs"""
+        path = os.path.join(self.public_dir, relpath)
+        data = text.encode("utf-8")
+        try:
+            with open(path, "rb") as file:
+                if file.read() == data:
+                    return
+        except FileNotFoundError:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as file:
+            file.write(data)
+        os.replace(tmp_path, path)
+        self.changed.append(path)
+
+    def remove(self, relpath: str):
+        path = os.path.join(self.public_dir, relpath)
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+            self.changed.append(path)
+
+    def remove_file(self, relpath: str):
+        """Delete a file a post no longer produces, and the folders it leaves empty"""
+        path = os.path.join(self.public_dir, relpath)
+        if not os.path.isfile(path):
+            return
+        os.remove(path)
+        self.changed.append(path)
+        directory = os.path.dirname(path)
+        while directory != self.public_dir and not os.listdir(directory):
+            os.rmdir(directory)
+            directory = os.path.dirname(directory)
+
+    def is_published(self, post: dict) -> bool:
+        if post["draft"]:
+            return False
+        return self.site["build_future"] or post_date(post) <= datetime.datetime.now(datetime.timezone.utc)
+
+    def render(self, everything: bool = False) -> list[str]:
+        """Bring public/ up to date with content/posts. Returns the paths written or removed."""
+        self.changed = []
+        index = RenderIndex.load(self.posts_dir, self.cache_path, refresh=False)
+        before = dict(index.posts)
+        names = index.refresh()
+        if everything:
+            names = set(index.posts) | set(before)
+        if not names:
+            return []
+
+        shell = load_shell(self.public_dir)
+        published = sorted((post for post in index.posts.values() if self.is_published(post)),
+                           key=lambda post: (post_date(post), post["title"]), reverse=True)
+        live = {post["name"] for post in published}
+
+        orphans = set()
+        for name in names:
+            old = before.get(name)
+            if old is not None and (name not in live or old["slug"] != index.posts[name]["slug"]):
+                self.remove(os.path.join("posts", old["slug"]))
+            outputs = self.render_post(shell, index.posts[name]) if name in live else []
+            if name in index.posts:
+                index.posts[name]["outputs"] = outputs
+            # A deleted or renamed bundle resource, or media the post stopped embedding
+            orphans.update(set(old.get("outputs", ()) if old else ()) - set(outputs))
+        claimed = {path for post in index.posts.values() for path in post.get("outputs", ())}
+        for relpath in sorted(orphans - claimed):
+            self.remove_file(relpath)
+        # Saved after rendering, so the outputs are recorded and an interrupted run renders again
+        index.save()
+
+        self.render_home(published)
+        self.render_section(shell, published)
+        for taxonomy in self.site["taxonomies"].values():
+            terms = {term for name in names for post in (before.get(name), index.posts.get(name))
+                     if post for term in post.get(taxonomy, [])}
+            if everything or terms:
+                self.render_taxonomy(shell, taxonomy, published, None if everything else terms)
+        return self.changed
+
+    def render_post(self, shell: Shell, post: dict) -> list[str]:
+        """Write a post's page and copy its resources. Returns the files it produced, relative to public/."""
+        post_dir = os.path.join(self.posts_dir, post["name"])
+        _, body = read_index_md(post_dir)
+        content = POST_TEMPLATE.substitute(title=html.escape(post["title"]), meta=render_meta(post),
+                                           content=markdown_to_html(body))
+        target = os.path.join("posts", post["slug"])
+        outputs = [os.path.join(target, "index.html")]
+        self.write(outputs[0], shell.page(post["title"], post_url(post), self.site["title"], content))
+        # Page bundle resources are served next to the page, at the same relative path
+        for dirpath, _, filenames in os.walk(post_dir):
+            for filename in filenames:
+                if filename.endswith(".md"):
+                    continue
+                source = os.path.join(dirpath, filename)
+                outputs.append(os.path.join(target, os.path.relpath(source, post_dir)))
+                if copy_file(source, os.path.join(self.public_dir, outputs[-1])) is not None:
+                    self.changed.append(os.path.join(self.public_dir, outputs[-1]))
+        # Shared media is served from /media/, as Hugo copies static/media
+        for name in sorted(set(MEDIA_URL_RE.findall(body))):
+            source = os.path.join(self.site_repo, MEDIA_DIR, name)
+            if not os.path.exists(source):
+                continue
+            outputs.append(os.path.join("media", name))
+            if copy_file(source, os.path.join(self.public_dir, outputs[-1])) is not None:
+                self.changed.append(os.path.join(self.public_dir, outputs[-1]))
+        return outputs
+
+    def render_home(self, published: list[dict]):
+        outputs = self.site["outputs"].get("home", ["HTML", "RSS"])
+        home_html = os.path.join(self.public_dir, "index.html")
+        if "HTML" in outputs and os.path.exists(home_html):
+            with open(home_html, "r", encoding="utf-8") as file:
+                markup = file.read()
+            cards = "".join(render_recent_card(post) for post in published[:5])
+            markup = RECENT_RE.sub(lambda m: m.group(1) + cards + m.group(3), markup, count=1)
+            self.write("index.html", markup)
+        if "RSS" in outputs:
+            self.write("index.xml", render_rss(self.site, "", "/", _post_items(published)))
+        if "JSON" in outputs:
+            self.render_search_index(published)
+
+    def render_search_index(self, published: list[dict]):
+        """Replace the post entries of index.json, keeping the section and term entries Hugo wrote"""
+        entries = []
+        try:
+            with open(os.path.join(self.public_dir, "index.json"), "r", encoding="utf-8") as file:
+                entries = [entry for entry in json.load(file) if entry.get("type") != "posts"
+                           or entry.get("permalink") == "/posts/"]
+        except (FileNotFoundError, json.JSONDecodeError):
+            pass
+        entries.extend(search_entry(post) for post in published)
+        self.write("index.json", json.dumps(entries, ensure_ascii=False, separators=(",", ":")))
+
+    def render_section(self, shell: Shell, published: list[dict]):
+        self.render_list(shell, "Posts", "/posts/", published)
+
+    def render_list(self, shell: Shell, title: str, url: str, posts: list[dict]):
+        """A paginated list page at url (page 1 there, page N at url/page/N/) plus its RSS feed"""
+        relpath = url.strip("/")
+        size = self.site["pager_size"]
+        pages = max(1, math.ceil(len(posts) / size))
+        for page in range(1, pages + 1):
+            page_url = url if page == 1 else f"{url}page/{page}/"
+            links = {}
+            if page > 1:
+                links["previous"] = f'<a href="{url if page == 2 else f"{url}page/{page - 1}/"}">&larr;</a>'
+            if page < pages:
+                links["next"] = f'<a href="{url}page/{page + 1}/">&rarr;</a>'
+            pager = PAGER_TEMPLATE.substitute(page=page, pages=pages, previous=links.get("previous", ""),
+                                              next=links.get("next", "")) if pages > 1 else ""
+            window = posts[(page - 1) * size:page * size]
+            content = LIST_TEMPLATE.substitute(title=html.escape(title), pager=pager,
+                                               items="\n".join(render_card(post) for post in window))
+            self.write(os.path.join(page_url.strip("/"), "index.html"),
+                       shell.page(title, page_url, self.site["title"], content))
+        # Hugo's alias for page 1, and no pages past the new last one
+        self.write(os.path.join(relpath, "page", "1", "index.html"),
+                   ALIAS_TEMPLATE.substitute(language=self.site["language"], url=shell.base_url + url))
+        page = pages + 1
+        while os.path.isdir(os.path.join(self.public_dir, relpath, "page", str(page))):
+            self.remove(os.path.join(relpath, "page", str(page)))
+            page += 1
+        self.write(os.path.join(relpath, "index.xml"), render_rss(self.site, title, url, _post_items(posts)))
+
+    def render_taxonomy(self, shell: Shell, taxonomy: str, published: list[dict], terms: set[str] | None):
+        """The taxonomy list page and the pages of the given terms (all terms when None)"""
+        by_term = {}
+        for post in published:
+            for term in post.get(taxonomy, []):
+                by_term.setdefault(term, []).append(post)
+        title = term_title(taxonomy)
+
+        for term in (set(by_term) if terms is None else terms):
+            relpath = term_url(taxonomy, term).strip("/")
+            posts = by_term.get(term)
+            if not posts:
+                self.remove(relpath)
+                continue
+            self.render_list(shell, term_title(term), term_url(taxonomy, term), posts)
+
+        names = sorted(by_term, key=str.lower)
+        items = "\n".join(TERM_TEMPLATE.substitute(url=term_url(taxonomy, term), title=html.escape(term_title(term)),
+                                                   count=len(by_term[term])) for term in names)
+        self.write(os.path.join(taxonomy, "index.html"),
+                   shell.page(title, f"/{taxonomy}/", self.site["title"], TERMS_TEMPLATE.substitute(title=title,
+                                                                                                   items=items)))
+        self.write(os.path.join(taxonomy, "index.xml"),
+                   render_rss(self.site, title, f"/{taxonomy}/",
+                              [(term_title(term), term_url(taxonomy, term), post_date(by_term[term][0]), "")
+                               for term in names]))
+
+
+def main(argv=None):
+    paths = load_paths()
+    parser = argparse.ArgumentParser(description="Patch public/ for content changes without running Hugo")
+    parser.add_argument("--site", default=paths.get("site_repo"),
+                        help="Hugo site repository (default: configured site repo)")
+    parser.add_argument("--all", action="store_true", help="Re-render every post and listing")
+    args = parser.parse_args(argv)
+    if not args.site or not os.path.isdir(args.site):
+        parser.error("site repository does not exist, pass --site")
+
+    start = time.perf_counter()
+    changed = Renderer(args.site).render(everything=args.all)
+    for path in changed:
+        print(f"Updated {path}")
+    print(f"{len(changed)} files changed in {(time.perf_counter() - start) * 1000:.0f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,273 @@
+"""
+Sharded, incrementally updated search index for the site.
+
+Hugo's home JSON output holds the full text of every post and is rebuilt
+and downloaded whole. Instead the importer keeps an inverted index under
+static/search/, split into one shard per two-letter token prefix:
+
+    search/manifest.json   {"version": 1, "shards": {"ob": "<hash>", ...}}
+    search/ob.json         {"terms": {"obsidian": {"first-post": 3, ...}},
+                            "docs": {"first-post": ["Title", "/posts/first-post/", "9 December 2024"]}}
+
+A query only fetches the shards of its words' prefixes (the manifest
+hashes let the browser cache them). Each post's index.md is hashed; only
+posts whose hash changed are re-tokenized, and only the shards holding
+their old or new tokens are rewritten. assets/js/search.js is the
+matching client; it falls back to Hugo's index.json when the shards are
+missing.
+
+The Pages workflow builds the shards before Hugo runs and fails the build
+when the published site lacks them:
+
+    python search_index.py --site . --all
+    python search_index.py --check public/search
+"""
+import argparse
+import datetime
+import hashlib
+import json
+import os
+import re
+import sys
+from collections import Counter
+
+from engine import load_paths, resolve_site_structure
+from manifest import file_digest
+from post_index import post_fields, read_index_md
+from wikilinks import slugify
+
+search_index_file = os.path.join(os.path.expanduser('~'), '.markdown_processor_search.json')
+
+SEARCH_VERSION = 1
+PREFIX_LENGTH = 2
+TITLE_WEIGHT = 5
+WORD_RE = re.compile(r"\w{2,}")
+# Link targets, HTML tags and code fences carry no searchable words
+NOISE_RE = re.compile(r"\]\([^)]*\)|<[^>]+>|```.*?```", re.S)
+
+
+def tokenize(text: str) -> Counter:
+    return Counter(word for word in WORD_RE.findall(text.lower()) if not word.isdigit())
+
+
+def shard_key(token: str) -> str:
+    return token[:PREFIX_LENGTH]
+
+
+def read_document(post_dir: str, name: str) -> dict:
+    """Title, URL, date and weighted term counts of one post"""
+    meta, body = read_index_md(post_dir)
+    post = post_fields(meta, name)
+    terms = tokenize(NOISE_RE.sub(" ", body))
+    for token, count in tokenize(post["title"]).items():
+        terms[token] += count * TITLE_WEIGHT
+    date = ""
+    if post["date"]:
+        try:
+            day = datetime.date.fromisoformat(post["date"][:10])
+            date = f"{day.day} {day:%B} {day.year}"
+        except ValueError:
+            pass
+    return {
+        "title": post["title"],
+        "url": f"/posts/{slugify(str(meta.get('slug') or name))}/",
+        "date": date,
+        "draft": post["draft"],
+        "terms": dict(terms),
+    }
+
+
+class SearchIndex:
+    def __init__(self, site_repo: str, cache_path: str = search_index_file):
+        self.site_repo = os.path.abspath(site_repo)
+        self.cache_path = cache_path
+        self.posts_dir = resolve_site_structure(self.site_repo)
+        self.output_dirs = [os.path.join(self.site_repo, "static", "search")]
+        if os.path.isdir(os.path.join(self.site_repo, "public")):
+            # Keep a built public/ in step without waiting for the next Hugo build
+            self.output_dirs.append(os.path.join(self.site_repo, "public", "search"))
+        self.posts = {}
+        self.shard_hashes = {}
+        self.modified = False
+
+    @classmethod
+    def load(cls, site_repo: str, cache_path: str = search_index_file) -> "SearchIndex":
+        index = cls(site_repo, cache_path)
+        if os.path.exists(cache_path):
+            try:
+                with open(cache_path, "r") as file:
+                    data = json.load(file).get(index.site_repo, {})
+                if data.get("version") == SEARCH_VERSION:
+                    index.posts = data["posts"]
+                    index.shard_hashes = data["shards"]
+            except (json.JSONDecodeError, OSError, KeyError):
+                pass
+        return index
+
+    def save(self):
+        data = {}
+        if os.path.exists(self.cache_path):
+            try:
+                with open(self.cache_path, "r") as file:
+                    data = json.load(file)
+            except (json.JSONDecodeError, OSError):
+                data = {}
+        data[self.site_repo] = {"version": SEARCH_VERSION, "posts": self.posts, "shards": self.shard_hashes}
+        tmp_path = self.cache_path + ".tmp"
+        with open(tmp_path, "w") as file:
+            file.write(json.dumps(data))
+        os.replace(tmp_path, self.cache_path)
+
+    def refresh(self) -> dict[str, tuple[dict | None, dict | None]]:
+        """Re-read posts whose index.md hash changed. Returns {name: (old document, new document)}."""
+        changes = {}
+        seen = set()
+        if os.path.isdir(self.posts_dir):
+            with os.scandir(self.posts_dir) as entries:
+                for entry in entries:
+                    index_md = os.path.join(entry.path, "index.md")
+                    if not entry.is_dir() or not os.path.exists(index_md):
+                        continue
+                    seen.add(entry.name)
+                    stat = os.stat(index_md)
+                    stamp = [stat.st_mtime_ns, stat.st_size]
+                    cached = self.posts.get(entry.name)
+                    if cached is not None and cached["stamp"] == stamp:
+                        continue
+                    digest = file_digest(index_md)
+                    self.modified = True
+                    if cached is not None and cached["hash"] == digest:
+                        cached["stamp"] = stamp
+                        continue
+                    self.posts[entry.name] = {**read_document(entry.path, entry.name), "stamp": stamp, "hash": digest}
+                    changes[entry.name] = (cached, self.posts[entry.name])
+
+        for name in set(self.posts) - seen:
+            changes[name] = (self.posts.pop(name), None)
+            self.modified = True
+        return changes
+
+    def load_shard(self, key: str) -> dict:
+        try:
+            with open(os.path.join(self.output_dirs[0], f"{key}.json"), "r", encoding="utf-8") as file:
+                return json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {"terms": {}, "docs": {}}
+
+    def update(self, rebuild: bool = False) -> list[str]:
+        """
+        Bring the shards up to date with content/posts, patching only the
+        shards the changed posts touch. Returns the files written or removed.
+        """
+        # Without the cache the old postings in the shard files are unknown, so start over
+        rebuild = rebuild or not self.shard_hashes
+        changes = self.refresh()
+        shards = {}
+        if rebuild:
+            changes = {name: (None, post) for name, post in self.posts.items()}
+            shards = {key: {"terms": {}, "docs": {}} for key in self.shard_hashes}
+
+        def shard_for(token):
+            key = shard_key(token)
+            if key not in shards:
+                shards[key] = {"terms": {}, "docs": {}} if rebuild else self.load_shard(key)
+            return shards[key]
+
+        for name, (old, new) in changes.items():
+            if new is not None and new["draft"]:
+                new = None
+            for token in (old or {}).get("terms", ()):
+                shard = shard_for(token)
+                postings = shard["terms"].get(token, {})
+                postings.pop(name, None)
+                if not postings:
+                    shard["terms"].pop(token, None)
+                shard["docs"].pop(name, None)
+            for token, count in (new or {}).get("terms", {}).items():
+                shard = shard_for(token)
+                shard["terms"].setdefault(token, {})[name] = count
+                shard["docs"][name] = [new["title"], new["url"], new["date"]]
+
+        changed = []
+        for key, shard in sorted(shards.items()):
+            if shard["terms"]:
+                shard = {"terms": dict(sorted(shard["terms"].items())), "docs": shard["docs"]}
+                data = json.dumps(shard, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+                self.shard_hashes[key] = hashlib.sha256(data).hexdigest()[:12]
+                changed.extend(self._write(f"{key}.json", data))
+            elif key in self.shard_hashes:
+                del self.shard_hashes[key]
+                changed.extend(self._remove(f"{key}.json"))
+
+        manifest = {"version": SEARCH_VERSION, "prefix": PREFIX_LENGTH,
+                    "shards": dict(sorted(self.shard_hashes.items()))}
+        changed.extend(self._write("manifest.json", json.dumps(manifest, separators=(",", ":")).encode("utf-8")))
+        if self.modified or rebuild:
+            self.save()
+        return changed
+
+    def _write(self, name: str, data: bytes) -> list[str]:
+        written = []
+        for output_dir in self.output_dirs:
+            path = os.path.join(output_dir, name)
+            try:
+                with open(path, "rb") as file:
+                    if file.read() == data:
+                        continue
+            except FileNotFoundError:
+                os.makedirs(output_dir, exist_ok=True)
+            tmp_path = path + ".tmp"
+            with open(tmp_path, "wb") as file:
+                file.write(data)
+            os.replace(tmp_path, path)
+            written.append(path)
+        return written
+
+    def _remove(self, name: str) -> list[str]:
+        removed = []
+        for output_dir in self.output_dirs:
+            path = os.path.join(output_dir, name)
+            if os.path.exists(path):
+                os.remove(path)
+                removed.append(path)
+        return removed
+
+
+def missing_shards(search_dir: str) -> list[str]:
+    """Files of a built index that are absent: the manifest, or the shards it lists"""
+    try:
+        with open(os.path.join(search_dir, "manifest.json"), "r", encoding="utf-8") as file:
+            manifest = json.load(file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return ["manifest.json"]
+    return [f"{key}.json" for key in manifest.get("shards", {})
+            if not os.path.exists(os.path.join(search_dir, f"{key}.json"))]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the sharded search index under static/search/")
+    parser.add_argument("--site", default=load_paths().get("site_repo"),
+                        help="Hugo site repository (default: configured site repo)")
+    parser.add_argument("--all", action="store_true", help="Rebuild every shard, not just the changed ones")
+    parser.add_argument("--check", metavar="DIR",
+                        help="Only verify that DIR holds the manifest and every shard it lists")
+    args = parser.parse_args(argv)
+
+    if args.check:
+        missing = missing_shards(args.check)
+        for name in missing:
+            print(f"Missing {os.path.join(args.check, name)}", file=sys.stderr)
+        if missing:
+            return 1
+        print(f"Search index in {args.check} is complete")
+        return 0
+
+    if not args.site or not os.path.isdir(args.site):
+        parser.error("site repository does not exist, pass --site")
+    for path in SearchIndex.load(args.site).update(rebuild=args.all):
+        print(f"Updated {path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
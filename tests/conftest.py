@@ -0,0 +1,39 @@
+import os
+import subprocess
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+# The modules keep their caches in ~, resolved at import: point that at a scratch folder first
+os.environ["HOME"] = tempfile.mkdtemp(prefix="markdown-processor-home-")
+
+
+def git(*args, cwd=None) -> str:
+    return subprocess.run(["git", *args], cwd=cwd, check=True, capture_output=True, text=True).stdout
+
+
+def write(path, text=""):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as file:
+        file.write(text)
+    return path
+
+
+@pytest.fixture
+def site_repo(tmp_path):
+    """A site repository cloned from a local bare remote, with one commit on master"""
+    remote = tmp_path / "remote.git"
+    site = tmp_path / "site"
+    git("init", "-q", "--bare", "-b", "master", str(remote))
+    git("clone", "-q", str(remote), str(site))
+    git("config", "user.name", "test", cwd=site)
+    git("config", "user.email", "test@example.com", cwd=site)
+    git("checkout", "-q", "-b", "master", cwd=site)
+    write(str(site / "content" / "posts" / "hello" / "index.md"), "---\ntitle: Hello\n---\nHello\n")
+    git("add", "-A", cwd=site)
+    git("commit", "-q", "-m", "initial", cwd=site)
+    git("push", "-q", "-u", "origin", "master", cwd=site)
+    return str(site)
@@ -0,0 +1,55 @@
+import os
+
+from attachments import AttachmentIndex
+from conftest import write
+
+
+def test_resolve_prefers_exact_then_local_then_shallowest(tmp_path):
+    vault = str(tmp_path / "vault")
+    write(os.path.join(vault, "pic.png"))
+    write(os.path.join(vault, "Trips", "pic.png"))
+    write(os.path.join(vault, "Trips", "cover.jpg"))
+    write(os.path.join(vault, "Trips", "Deep", "cover.jpg"))
+    write(os.path.join(vault, "Trips", "Deep", "Map.PNG"))
+    write(os.path.join(vault, ".obsidian", "hidden.png"))
+    index = AttachmentIndex.load(vault, str(tmp_path / "attachments.json"))
+    assert index.resolve("pic.png") == os.path.join(vault, "pic.png")
+    assert index.resolve("pic.png", os.path.join(vault, "Trips")) == os.path.join(vault, "pic.png")
+    assert index.resolve("cover.jpg") == os.path.join(vault, "Trips", "cover.jpg")
+    deep = os.path.join(vault, "Trips", "Deep")
+    assert index.resolve("cover.jpg", deep) == os.path.join(deep, "cover.jpg")
+    assert index.resolve("Trips/pic.png") == os.path.join(vault, "Trips", "pic.png")
+    assert index.resolve("map.png") == os.path.join(vault, "Trips", "Deep", "Map.PNG")
+    assert index.resolve("hidden.png") is None
+
+
+def test_only_changed_folders_are_rescanned(tmp_path):
+    vault = str(tmp_path / "vault")
+    cache = str(tmp_path / "attachments.json")
+    write(os.path.join(vault, "A", "one.png"))
+    write(os.path.join(vault, "B", "two.png"))
+    AttachmentIndex.load(vault, cache)
+
+    index = AttachmentIndex.load(vault, cache)
+    assert index.refresh() is False
+    write(os.path.join(vault, "B", "three.png"))
+    os.remove(os.path.join(vault, "A", "one.png"))
+    assert index.refresh() is True
+    assert index.resolve("three.png") == os.path.join(vault, "B", "three.png")
+    assert index.resolve("one.png") is None
+
+    # A removed folder takes its files out of the index
+    os.remove(os.path.join(vault, "B", "two.png"))
+    os.remove(os.path.join(vault, "B", "three.png"))
+    os.rmdir(os.path.join(vault, "B"))
+    index.refresh()
+    assert "B" not in index.dirs and index.resolve("two.png") is None
+
+
+def test_cache_survives_a_reload(tmp_path):
+    vault = str(tmp_path / "vault")
+    cache = str(tmp_path / "attachments.json")
+    write(os.path.join(vault, "A", "one.png"))
+    AttachmentIndex.load(vault, cache)
+    write(os.path.join(vault, "A", "two.pdf"))
+    assert AttachmentIndex.load(vault, cache).resolve("two.pdf") == os.path.join(vault, "A", "two.pdf")
@@ -0,0 +1,50 @@
+import os
+
+import pytest
+
+from catalog import Catalog, match_query
+from conftest import write
+
+
+@pytest.fixture
+def vault(tmp_path):
+    vault = str(tmp_path / "vault")
+    write(os.path.join(vault, "Garden.md"), "---\ntitle: Garden log\ntags: [home, '#outdoor']\n---\nTomatoes and basil\n")
+    write(os.path.join(vault, "Ideas.md"), "Tomato soup recipe, unpublished\n")
+    write(os.path.join(vault, ".obsidian", "Hidden.md"), "---\ntitle: Hidden\n---\ntomato\n")
+    return vault
+
+
+@pytest.fixture
+def catalog(tmp_path):
+    catalog = Catalog(str(tmp_path / "catalog.db"))
+    yield catalog
+    catalog.close()
+
+
+def titles(notes):
+    return sorted(note["title"] for note in notes)
+
+
+def test_match_query():
+    assert match_query("tomato so") == '"tomato" "so"*'
+    assert match_query("!!") is None
+
+
+def test_refresh_and_query(catalog, vault):
+    assert catalog.refresh(vault) == (2, 0)
+    assert catalog.refresh(vault) == (0, 0)
+    assert titles(catalog.query(vault, "tomat")) == ["Garden log", "Ideas"]
+    assert titles(catalog.query(vault, "tomat", publishable=False)) == ["Ideas"]
+    garden = catalog.query(vault, tag="outdoor")
+    assert titles(garden) == ["Garden log"] and garden[0]["slug"] == "garden"
+    assert garden[0]["tags"] == ["home", "outdoor"]
+
+
+def test_refresh_follows_edits_and_deletes(catalog, vault):
+    catalog.refresh(vault)
+    write(os.path.join(vault, "Ideas.md"), "Pumpkin pie\n")
+    os.remove(os.path.join(vault, "Garden.md"))
+    assert catalog.refresh(vault) == (1, 1)
+    assert catalog.query(vault, "tomato") == []
+    assert titles(catalog.query(vault, "pumpkin")) == ["Ideas"]
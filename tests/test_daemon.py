@@ -0,0 +1,70 @@
+import http.client
+import json
+import os
+import stat
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+import daemon
+
+
+@pytest.fixture
+def server():
+    server = daemon.make_server(port=0, workers=1)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+    server.queue.executor.shutdown(wait=False, cancel_futures=True)
+
+
+def request(server, method, path, body=None, headers=None):
+    connection = http.client.HTTPConnection("127.0.0.1", server.server_address[1], timeout=10)
+    try:
+        connection.request(method, path, body=body, headers=headers or {})
+        response = connection.getresponse()
+        return response.status, json.loads(response.read() or b"null")
+    finally:
+        connection.close()
+
+
+def authorized(server, **headers):
+    return {"Authorization": f"Bearer {server.token}", "Content-Type": "application/json", **headers}
+
+
+def test_token_file_is_private(server):
+    assert stat.S_IMODE(os.stat(daemon.token_file).st_mode) == 0o600
+    assert daemon.load_token() == server.token
+
+
+def test_call_sends_the_token(server):
+    code, reply = daemon.call(SimpleNamespace(socket=None, port=server.server_address[1]), "GET", "/status")
+    assert code == 200 and reply["workers"] == 1
+
+
+def test_requests_without_token_are_refused(server):
+    assert request(server, "GET", "/jobs")[0] == 401
+    code, _ = request(server, "POST", "/jobs", json.dumps({"kind": "publish"}),
+                      {"Content-Type": "application/json", "Authorization": "Bearer wrong"})
+    assert code == 401
+
+
+def test_simple_cross_origin_post_is_refused(server):
+    # What a page can send without a preflight: text/plain, with its Origin
+    headers = authorized(server, **{"Content-Type": "text/plain"})
+    assert request(server, "POST", "/jobs", json.dumps({"kind": "publish"}), headers)[0] == 415
+    headers = authorized(server, Origin="https://example.com")
+    assert request(server, "POST", "/jobs", json.dumps({"kind": "publish"}), headers)[0] == 403
+
+
+def test_foreign_host_is_refused(server):
+    headers = authorized(server, Host=f"attacker.example:{server.server_address[1]}")
+    assert request(server, "GET", "/status", headers=headers)[0] == 403
+
+
+def test_authorized_post_reaches_the_queue(server):
+    code, reply = request(server, "POST", "/jobs", json.dumps({"kind": "bogus"}), authorized(server))
+    assert code == 400 and "unknown job kind" in reply["error"]
@@ -0,0 +1,115 @@
+import os
+
+import pytest
+
+from conftest import write
+from engine import import_changes, import_vault, parse_front_matter
+from manifest import Manifest
+
+
+@pytest.fixture
+def vault(tmp_path):
+    vault = str(tmp_path / "vault")
+    write(os.path.join(vault, "First.md"), "---\ntitle: First\n---\nSee [[Second]] and ![[photo.png]]\n")
+    write(os.path.join(vault, "Second.md"), "---\ntitle: Second\n---\nPlain\n")
+    write(os.path.join(vault, "Private.md"), "No front matter, never published\n")
+    write(os.path.join(vault, "photo.png"), "png")
+    return vault
+
+
+@pytest.fixture
+def site(tmp_path):
+    return str(tmp_path / "site")
+
+
+@pytest.fixture
+def manifest(tmp_path):
+    return Manifest(str(tmp_path / "manifest.json"))
+
+
+def posts(site):
+    return sorted(os.listdir(os.path.join(site, "content", "posts")))
+
+
+def read(path):
+    with open(path, encoding="utf-8") as file:
+        return file.read()
+
+
+def test_front_matter():
+    meta, body = parse_front_matter("---\ntitle: Hi\ndraft: false\ntags: [a, b]\n---\nBody\n")
+    assert meta["title"] == "Hi" and meta["draft"] is False and meta["tags"] == ["a", "b"]
+    assert body.strip() == "Body"
+    assert parse_front_matter("No front matter") == ({}, "No front matter")
+
+
+def test_import_writes_bundles_once(vault, site, manifest):
+    changed = import_vault(vault, site, workers=1, manifest=manifest)
+    first = os.path.join(site, "content", "posts", "first")
+    assert posts(site) == ["first", "second"]
+    assert os.path.join(first, "index.md") in changed
+    assert os.path.exists(os.path.join(first, "photo.png"))
+    assert "[Second](../second/)" in read(os.path.join(first, "index.md"))
+
+    reloaded = Manifest.load(manifest.path)
+    assert import_vault(vault, site, workers=1, manifest=reloaded) == []
+
+
+def test_edit_rewrites_only_that_bundle(vault, site, manifest):
+    import_vault(vault, site, workers=1, manifest=manifest)
+    write(os.path.join(vault, "Second.md"), "---\ntitle: Second\n---\nEdited\n")
+    changed = import_vault(vault, site, workers=1, manifest=manifest)
+    assert changed == [os.path.join(site, "content", "posts", "second", "index.md")]
+
+
+def test_stale_bundles_are_removed(vault, site, manifest):
+    import_vault(vault, site, workers=1, manifest=manifest)
+    os.remove(os.path.join(vault, "Second.md"))
+    changed = import_vault(vault, site, workers=1, manifest=manifest)
+    assert posts(site) == ["first"]
+    assert os.path.join(site, "content", "posts", "second") in changed
+    # The link to the deleted note falls back to plain text
+    assert "See Second and" in read(os.path.join(site, "content", "posts", "first", "index.md"))
+    assert not any(folder.endswith("second") for folder in manifest.bundles)
+
+
+def test_unpublished_note_is_removed(vault, site, manifest):
+    import_vault(vault, site, workers=1, manifest=manifest)
+    write(os.path.join(vault, "Second.md"), "---\ntitle: Second\npublish: false\n---\nPlain\n")
+    import_vault(vault, site, workers=1, manifest=manifest)
+    assert posts(site) == ["first"]
+
+
+def test_changes_follow_slug_renames_and_attachments(vault, site, manifest):
+    import_vault(vault, site, workers=1, manifest=manifest)
+    second = write(os.path.join(vault, "Second.md"), "---\ntitle: Second\nslug: renamed\n---\nPlain\n")
+    import_changes(vault, site, [second], manifest=manifest)
+    assert posts(site) == ["first", "renamed"]
+    # First links to Second, so its link follows the new slug
+    assert "[Second](../renamed/)" in read(os.path.join(site, "content", "posts", "first", "index.md"))
+
+    photo = write(os.path.join(vault, "photo.png"), "new png")
+    changed = import_changes(vault, site, [photo], manifest=manifest)
+    assert os.path.join(site, "content", "posts", "first", "photo.png") in changed
+    assert read(os.path.join(site, "content", "posts", "first", "photo.png")) == "new png"
+
+
+def test_attachment_added_after_the_note(vault, site, manifest):
+    note = write(os.path.join(vault, "Later.md"), "---\ntitle: Later\n---\n![[pic.png]] ![[sub/chart.png]]\n")
+    import_vault(vault, site, workers=1, manifest=manifest)
+    later = os.path.join(site, "content", "posts", "later")
+    # Nothing to copy yet, so the embeds stay as written instead of linking to absent files
+    assert os.listdir(later) == ["index.md"]
+    assert "![[pic.png]] ![[sub/chart.png]]" in read(os.path.join(later, "index.md"))
+    assert import_vault(vault, site, workers=1, manifest=manifest) == []
+
+    write(os.path.join(vault, "pic.png"), "png")
+    changed = import_vault(vault, site, workers=1, manifest=manifest)
+    assert os.path.join(later, "pic.png") in changed
+    assert "![Image Description](pic.png)" in read(os.path.join(later, "index.md"))
+
+    chart = write(os.path.join(vault, "sub", "chart.png"), "chart")
+    changed = import_changes(vault, site, [chart], manifest=manifest)
+    assert os.path.join(later, "sub", "chart.png") in changed
+    assert manifest.bundles[later]["missing"] == []
+    assert note in manifest.bundles[later]["roots"]
@@ -0,0 +1,94 @@
+import errno
+import os
+import sys
+
+import pytest
+
+import fastcopy
+from conftest import write
+from fastcopy import copy_file, is_identical
+
+DATA = "attachment " * 1000
+
+
+def fail(*args):
+    raise OSError(errno.EXDEV, "cross-device")
+
+
+def read(path):
+    with open(path) as file:
+        return file.read()
+
+
+@pytest.fixture
+def source(tmp_path):
+    return write(str(tmp_path / "vault" / "a.png"), DATA)
+
+
+@pytest.fixture
+def no_reflink(monkeypatch):
+    monkeypatch.setattr(fastcopy, "_reflink", lambda src, dst: False)
+
+
+def test_copy_then_skip(source, tmp_path):
+    target = str(tmp_path / "site" / "a.png")
+    assert copy_file(source, target) is not None
+    assert read(target) == DATA
+    assert os.stat(target).st_mtime_ns == os.stat(source).st_mtime_ns
+    assert copy_file(source, target) is None
+    assert os.listdir(os.path.dirname(target)) == ["a.png"]
+
+
+@pytest.mark.skipif(not hasattr(os, "copy_file_range"), reason="no copy_file_range")
+def test_copy_file_range_after_reflink(source, tmp_path, no_reflink):
+    assert copy_file(source, str(tmp_path / "b.png")) == "copy_file_range"
+
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="sendfile to a file needs Linux")
+def test_sendfile_after_copy_file_range(source, tmp_path, no_reflink, monkeypatch):
+    monkeypatch.setattr(os, "copy_file_range", fail, raising=False)
+    target = str(tmp_path / "b.png")
+    assert copy_file(source, target) == "sendfile"
+    assert read(target) == DATA
+
+
+def test_plain_copy_last(source, tmp_path, no_reflink, monkeypatch):
+    monkeypatch.setattr(os, "copy_file_range", fail, raising=False)
+    monkeypatch.setattr(fastcopy, "_sendfile", fail)
+    target = str(tmp_path / "b.png")
+    assert copy_file(source, target) == "copy"
+    assert read(target) == DATA
+
+
+def test_partial_kernel_copy_is_rewound(source, tmp_path, no_reflink, monkeypatch):
+    calls = []
+
+    def half_then_fail(in_fd, out_fd, count):
+        if calls:
+            fail()
+        calls.append(count)
+        return os.write(out_fd, os.read(in_fd, 100))
+
+    monkeypatch.setattr(os, "copy_file_range", half_then_fail, raising=False)
+    monkeypatch.setattr(fastcopy, "_sendfile", fail)
+    target = str(tmp_path / "b.png")
+    assert copy_file(source, target) == "copy"
+    assert read(target) == DATA
+
+
+def test_hardlink(source, tmp_path):
+    target = str(tmp_path / "vault" / "linked.png")
+    assert copy_file(source, target, hardlink=True) == "hardlink"
+    assert os.path.samefile(source, target)
+
+
+def test_is_identical(source, tmp_path):
+    other = str(tmp_path / "other.png")
+    assert not is_identical(source, other)
+    write(other, DATA)
+    # Different mtime, same bytes
+    assert is_identical(source, other)
+    write(other, DATA.upper())
+    assert not is_identical(source, other)
+    write(other, "short")
+    assert not is_identical(source, other)
@@ -0,0 +1,47 @@
+import os
+
+from image_cache import ImageCache
+
+PARAMS = {"format": "webp", "width": 330, "quality": 80}
+
+
+def fill(cache, digest, size=100, params=PARAMS):
+    def produce(path):
+        with open(path, "wb") as file:
+            file.write(b"x" * size)
+    return cache.get_or_create(digest, params, produce)
+
+
+def age(path, seconds):
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns - seconds * 10 ** 9))
+
+
+def test_hits_and_misses(tmp_path):
+    cache = ImageCache(str(tmp_path / "cache"))
+    first = fill(cache, "a" * 64)
+    assert fill(cache, "a" * 64) == first
+    assert fill(cache, "a" * 64, params={**PARAMS, "quality": 50}) != first
+    assert (cache.hits, cache.misses) == (1, 2)
+    assert cache.summary() == "Image cache: 1 hits, 2 misses (33% hit rate)"
+    assert not any(name.endswith(".tmp") for _, _, names in os.walk(cache.root) for name in names)
+
+
+def test_evicts_least_recently_used_down_to_the_cap(tmp_path):
+    cache = ImageCache(str(tmp_path / "cache"), max_bytes=250)
+    old, used, new = (fill(cache, digest * 64) for digest in "abc")
+    age(old, 30)
+    age(used, 20)
+    age(new, 10)
+    # A hit makes an entry the most recently used
+    fill(cache, "b" * 64)
+    assert cache.size() == 300
+    assert cache.evict() == 100
+    assert not os.path.exists(old) and os.path.exists(used) and os.path.exists(new)
+    assert cache.evict() == 0
+
+
+def test_empty_cache(tmp_path):
+    cache = ImageCache(str(tmp_path / "missing"))
+    assert cache.size() == 0 and cache.evict() == 0
+    assert cache.summary() == "Image cache: 0 hits, 0 misses"
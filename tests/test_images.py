@@ -0,0 +1,96 @@
+import os
+
+import pytest
+
+pytest.importorskip("PIL")
+from PIL import Image
+
+from image_cache import ImageCache
+from images import ImageOptions, VariantStamps, plan_variants, render_picture, run_jobs
+from manifest import file_digest
+
+
+@pytest.fixture
+def picture(tmp_path):
+    path = str(tmp_path / "vault" / "shot.png")
+    os.makedirs(os.path.dirname(path))
+    Image.linear_gradient("L").resize((800, 450)).convert("RGB").save(path)
+    return path
+
+
+def jobs_for(source, target_folder, quality, widths=(330, 660)):
+    options = ImageOptions(quality=quality, widths=widths, formats=("webp",))
+    return [{"source": source, "target": os.path.join(target_folder, variant["name"]),
+             "width": variant["width"], "format": variant["format"], "quality": quality,
+             "digest": file_digest(source), "cache_dir": None}
+            for variant in plan_variants(source, "shot.png", options)]
+
+
+def test_plan_variants_adds_original_width_when_small(picture):
+    options = ImageOptions(widths=(330, 660, 1024), formats=("webp",))
+    assert [v["width"] for v in plan_variants(picture, "shot.png", options)] == [330, 660, 800]
+    assert plan_variants(picture, "shot.gif", options) == []
+
+
+def test_render_picture_falls_back_to_mid_size(picture):
+    variants = plan_variants(picture, "a b.png", ImageOptions(widths=(330, 660), formats=("webp",)))
+    html = render_picture(variants, "Alt <x>", 800)
+    assert 'srcset="a%20b-330.webp 330w, a%20b-660.webp 660w"' in html
+    assert 'src="a%20b-660.webp"' in html and 'alt="Alt &lt;x&gt;"' in html
+
+
+def test_unchanged_variants_are_not_re_encoded(picture, tmp_path):
+    bundle = str(tmp_path / "bundle")
+    stamps = str(tmp_path / "variants.json")
+    assert len(run_jobs(jobs_for(picture, bundle, 80), workers=1, stamps_path=stamps)) == 2
+    assert run_jobs(jobs_for(picture, bundle, 80), workers=1, stamps_path=stamps) == []
+
+
+def test_quality_change_re_encodes_existing_variants(picture, tmp_path):
+    bundle = str(tmp_path / "bundle")
+    stamps = str(tmp_path / "variants.json")
+    run_jobs(jobs_for(picture, bundle, 90), workers=1, stamps_path=stamps)
+    before = os.path.getsize(os.path.join(bundle, "shot-330.webp"))
+    # The old outputs are newer than the source, which used to be enough to keep them
+    written = run_jobs(jobs_for(picture, bundle, 10), workers=1, stamps_path=stamps)
+    assert len(written) == 2
+    assert os.path.getsize(os.path.join(bundle, "shot-330.webp")) < before
+
+
+def test_edited_source_re_encodes(picture, tmp_path):
+    bundle = str(tmp_path / "bundle")
+    stamps = str(tmp_path / "variants.json")
+    run_jobs(jobs_for(picture, bundle, 80), workers=1, stamps_path=stamps)
+    Image.new("RGB", (800, 450), (255, 0, 0)).save(picture)
+    assert len(run_jobs(jobs_for(picture, bundle, 80), workers=1, stamps_path=stamps)) == 2
+
+
+def test_cache_hits_for_same_source_elsewhere(picture, tmp_path):
+    cache = ImageCache(str(tmp_path / "cache"))
+    stamps = str(tmp_path / "variants.json")
+    for folder in ("one", "two"):
+        jobs = [{**job, "cache_dir": cache.root} for job in jobs_for(picture, str(tmp_path / folder), 80)]
+        run_jobs(jobs, workers=1, cache=cache, stamps_path=stamps)
+    assert (cache.hits, cache.misses) == (2, 2)
+
+
+def test_duplicate_targets_are_encoded_once(picture, tmp_path):
+    bundle = str(tmp_path / "bundle")
+    jobs = jobs_for(picture, bundle, 80) * 3
+    written = run_jobs(jobs, workers=2, stamps_path=str(tmp_path / "variants.json"))
+    assert sorted(written) == [os.path.join(bundle, "shot-330.webp"), os.path.join(bundle, "shot-660.webp")]
+    assert sorted(os.listdir(bundle)) == ["shot-330.webp", "shot-660.webp"]
+
+
+def test_concurrent_stamp_saves_keep_each_other(picture, tmp_path):
+    path = str(tmp_path / "variants.json")
+    one, two = jobs_for(picture, str(tmp_path / "bundle"), 80)
+    for job in (one, two):
+        os.makedirs(os.path.dirname(job["target"]), exist_ok=True)
+        open(job["target"], "wb").close()
+    first, second = VariantStamps.load(path), VariantStamps.load(path)
+    first.record(one)
+    second.record(two)
+    first.save()
+    second.save()
+    assert VariantStamps.load(path).is_current(one) and VariantStamps.load(path).is_current(two)
@@ -0,0 +1,88 @@
+import os
+
+import pytest
+
+from conftest import write
+from link_graph import LinkGraph
+
+PUBLISHED = "---\ntitle: {}\n---\n"
+
+
+@pytest.fixture
+def vault(tmp_path):
+    vault = str(tmp_path / "vault")
+    write(os.path.join(vault, "Hub.md"), PUBLISHED.format("Hub") + "[[Leaf]] [[Later]] `[[Code]]` ![[x.png]]\n")
+    write(os.path.join(vault, "Leaf.md"), PUBLISHED.format("Leaf") + "Back to [[hub]]\n")
+    write(os.path.join(vault, "Other.md"), PUBLISHED.format("Other") + "Unrelated\n")
+    write(os.path.join(vault, "Drafts", "Leaf.md"), "Unpublished [[Hub]]\n")
+    return vault
+
+
+@pytest.fixture
+def graph(vault, tmp_path):
+    return LinkGraph.load(vault, str(tmp_path / "links.json"))
+
+
+def path(graph, rel_path):
+    return os.path.join(graph.vault, rel_path)
+
+
+def test_links_skip_code_and_attachments(graph):
+    assert graph.notes["Hub.md"]["links"] == ["Later", "Leaf"]
+
+
+def test_resolve_prefers_same_folder_then_shallowest(graph):
+    assert graph.resolve("Leaf") == "Leaf.md"
+    assert graph.resolve("leaf", os.path.join("Drafts", "Note.md")) == os.path.join("Drafts", "Leaf.md")
+    assert graph.resolve("Drafts/Leaf") == os.path.join("Drafts", "Leaf.md")
+    assert graph.resolve("Later") is None
+
+
+def test_note_url_and_backlinks(graph):
+    hub = path(graph, "Hub.md")
+    assert graph.note_url(hub, "Leaf", "Part") == "../leaf/#part"
+    # Missing and unpublished notes render as plain text
+    assert graph.note_url(hub, "Later", "") is None
+    assert graph.note_url(path(graph, "Leaf.md"), "Drafts/Leaf", "") is None
+    # Only published notes count as backlinks
+    assert graph.backlinks(hub) == [("Leaf", "leaf")]
+    assert "- [Leaf](../leaf/)" in graph.backlinks_section(hub)
+    assert graph.backlinks_section(path(graph, "Other.md")) == ""
+
+
+def test_refresh_only_rereads_changed_notes(graph):
+    assert graph.refresh() == {}
+    write(path(graph, "Other.md"), PUBLISHED.format("Other") + "Now [[Leaf]]\n")
+    changes = graph.refresh([path(graph, "Other.md")])
+    assert list(changes) == ["Other.md"]
+
+
+def test_affected_by_new_link(graph):
+    write(path(graph, "Other.md"), PUBLISHED.format("Other") + "Now [[Leaf]]\n")
+    # Leaf gains a backlink
+    assert graph.affected(graph.refresh()) == {path(graph, "Leaf.md")}
+
+
+def test_affected_by_new_note(graph):
+    write(path(graph, "Later.md"), PUBLISHED.format("Later") + "\n")
+    # Hub's plain-text [[Later]] becomes a link
+    assert graph.affected(graph.refresh()) == {path(graph, "Hub.md")}
+
+
+def test_affected_by_removed_note(graph):
+    os.remove(path(graph, "Leaf.md"))
+    # Hub's link to Leaf goes, and Drafts/Leaf is now what [[Leaf]] resolves to
+    assert graph.affected(graph.refresh()) == {path(graph, "Hub.md")}
+
+
+def test_affected_by_retitled_note(graph):
+    write(path(graph, "Leaf.md"), "---\ntitle: Renamed leaf\n---\nBack to [[hub]]\n")
+    # Hub lists Leaf under its title in its backlinks
+    assert path(graph, "Hub.md") in graph.affected(graph.refresh())
+
+
+def test_cache_round_trip(graph, vault, tmp_path):
+    graph.save()
+    reloaded = LinkGraph.load(vault, str(tmp_path / "links.json"), refresh=False)
+    assert reloaded.notes == graph.notes
+    assert reloaded.refresh() == {}
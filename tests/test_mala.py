@@ -0,0 +1,116 @@
+import asyncio
+import os
+import sys
+
+import pytest
+
+from conftest import git, write
+from mala import CommandTimeout, GitDeployer
+
+
+def deploy(site, **kwargs):
+    return asyncio.run(GitDeployer(site, "public", on_output=None).deploy_tree(**kwargs))
+
+
+def remote_gh_pages(site):
+    out = git("ls-remote", "origin", "refs/heads/gh-pages", cwd=site)
+    return out.split()[0] if out else None
+
+
+def commit_public(site, text):
+    write(os.path.join(site, "public", "index.html"), text)
+    git("add", "public", cwd=site)
+    git("commit", "-q", "-m", "build", cwd=site)
+
+
+def test_first_deploy_creates_gh_pages(site_repo):
+    commit_public(site_repo, "<p>one</p>")
+    commit = deploy(site_repo)
+    assert remote_gh_pages(site_repo) == commit
+    assert git("show", f"{commit}:index.html", cwd=site_repo) == "<p>one</p>"
+
+
+def test_unchanged_public_is_a_no_op(site_repo):
+    commit_public(site_repo, "<p>one</p>")
+    first = deploy(site_repo)
+    git("commit", "-q", "--allow-empty", "-m", "unrelated", cwd=site_repo)
+    assert deploy(site_repo) is None
+    assert remote_gh_pages(site_repo) == first
+
+
+def test_update_builds_on_the_deployed_commit(site_repo):
+    commit_public(site_repo, "<p>one</p>")
+    first = deploy(site_repo)
+    commit_public(site_repo, "<p>two</p>")
+    second = deploy(site_repo)
+    assert remote_gh_pages(site_repo) == second
+    assert git("rev-parse", f"{second}^", cwd=site_repo).strip() == first
+
+
+def test_deploy_from_elsewhere_is_fetched_not_overwritten(site_repo, tmp_path):
+    commit_public(site_repo, "<p>one</p>")
+    deploy(site_repo)
+    # Another machine deploys after this clone last looked at gh-pages
+    other = str(tmp_path / "other")
+    git("clone", "-q", "-b", "gh-pages", os.path.join(os.path.dirname(site_repo), "remote.git"), other)
+    git("-c", "user.name=other", "-c", "user.email=other@example.com",
+        "commit", "-q", "--allow-empty", "-m", "hotfix", cwd=other)
+    git("push", "-q", "origin", "gh-pages", cwd=other)
+    hotfix = git("rev-parse", "HEAD", cwd=other).strip()
+
+    commit_public(site_repo, "<p>two</p>")
+    commit = deploy(site_repo)
+    assert git("rev-parse", f"{commit}^", cwd=site_repo).strip() == hotfix
+
+
+def test_uncommitted_public_is_refused(site_repo):
+    with pytest.raises(Exception, match="not committed"):
+        deploy(site_repo)
+
+
+def sleeper(pid_file):
+    return [sys.executable, "-c",
+            f"import os, time; open({pid_file!r}, 'w').write(str(os.getpid())); print('started', flush=True); "
+            "time.sleep(30)"]
+
+
+def assert_killed(pid_file):
+    with open(pid_file) as file:
+        pid = int(file.read())
+    with pytest.raises(ProcessLookupError):
+        os.kill(pid, 0)
+
+
+def test_run_command_streams_output(tmp_path):
+    lines = []
+    deployer = GitDeployer(str(tmp_path), "public", on_output=lambda stream, line: lines.append((stream, line)))
+    command = [sys.executable, "-c", "import sys; print('out'); print('err', file=sys.stderr); sys.exit(3)"]
+    assert deployer.run_command(command) == (3, "out", "err")
+    assert sorted(lines) == [("stderr", "err"), ("stdout", "out")]
+    assert [step for step, _ in deployer.timings] == [f"{sys.executable} -c"]
+
+
+def test_run_command_timeout_kills_the_process(tmp_path):
+    pid_file = str(tmp_path / "pid")
+    deployer = GitDeployer(str(tmp_path), "public", timeout=1, on_output=None)
+    with pytest.raises(CommandTimeout):
+        deployer.run_command(sleeper(pid_file))
+    assert_killed(pid_file)
+    assert len(deployer.timings) == 1
+
+
+def test_cancelling_kills_the_process(tmp_path):
+    pid_file = str(tmp_path / "pid")
+    started = asyncio.Event()
+    deployer = GitDeployer(str(tmp_path), "public", on_output=lambda stream, line: started.set())
+
+    async def cancel_when_started():
+        task = asyncio.create_task(deployer.run_command_async(sleeper(pid_file), step="sleep"))
+        await started.wait()
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(cancel_when_started())
+    assert_killed(pid_file)
+    assert [step for step, _ in deployer.timings] == ["sleep"]
@@ -0,0 +1,64 @@
+import os
+
+import pytest
+
+from conftest import write
+from manifest import Manifest, file_digest
+
+
+@pytest.fixture
+def bundle(tmp_path):
+    note = write(str(tmp_path / "vault" / "Note.md"), "note")
+    picture = write(str(tmp_path / "vault" / "pic.png"), "png")
+    target = str(tmp_path / "site" / "note")
+    write(os.path.join(target, "index.md"), "built")
+    manifest = Manifest(str(tmp_path / "manifest.json"))
+    manifest.record(target, [note], [note, picture], ["index.md"], {"quality": 80})
+    return manifest, target, note, picture
+
+
+def test_fresh_until_an_input_changes(bundle):
+    manifest, target, note, picture = bundle
+    assert manifest.is_fresh(target, [note], {"quality": 80})
+    write(picture, "new png")
+    assert not manifest.is_unchanged(picture)
+    assert not manifest.is_fresh(target, [note], {"quality": 80})
+
+
+def test_touch_is_settled_by_the_hash(bundle):
+    manifest, target, note, picture = bundle
+    stat = os.stat(picture)
+    os.utime(picture, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    assert manifest.is_unchanged(picture)
+    assert manifest.files[picture]["mtime_ns"] == stat.st_mtime_ns + 10 ** 9
+    # Same size and a new mtime, but different bytes
+    write(picture, "PNG")
+    os.utime(picture, ns=(stat.st_atime_ns, stat.st_mtime_ns + 2 * 10 ** 9))
+    assert not manifest.is_unchanged(picture)
+
+
+def test_stale_on_settings_roots_outputs_or_missing_embeds(bundle):
+    manifest, target, note, picture = bundle
+    assert not manifest.is_fresh(target, [note], {"quality": 50})
+    assert not manifest.is_fresh(target, [note, picture], {"quality": 80})
+    assert not manifest.is_fresh(os.path.join(target, "..", "other"), [note], {"quality": 80})
+    manifest.record(target, [note], [note], ["index.md"], None, missing=["chart.png"])
+    assert manifest.is_fresh(target, [note], None, resolve=lambda link: None)
+    assert not manifest.is_fresh(target, [note], None, resolve=lambda link: "/vault/chart.png")
+    os.remove(os.path.join(target, "index.md"))
+    assert not manifest.is_fresh(target, [note], None)
+
+
+def test_save_load_and_forget(bundle, tmp_path):
+    manifest, target, note, picture = bundle
+    manifest.save()
+    loaded = Manifest.load(manifest.path)
+    assert loaded.bundles == manifest.bundles
+    assert loaded.files[picture]["sha256"] == file_digest(picture)
+    loaded.forget(target)
+    assert loaded.bundles == {} and loaded.files == {}
+
+
+def test_corrupt_manifest_starts_over(tmp_path):
+    path = write(str(tmp_path / "manifest.json"), "{not json")
+    assert Manifest.load(path).bundles == {}
@@ -0,0 +1,27 @@
+import os
+
+from conftest import write
+from media import MEDIA_DIR, MediaStore
+
+
+def test_names_are_content_addressed(tmp_path):
+    store = MediaStore(str(tmp_path / "site"))
+    one = write(str(tmp_path / "vault" / "a" / "Photo.PNG"), "same")
+    two = write(str(tmp_path / "vault" / "b" / "copy.png"), "same")
+    assert store.name(one) == store.name(two)
+    assert store.name(one).endswith(".png") and len(store.name(one)) == 16 + 4
+    bundle = str(tmp_path / "site" / "content" / "posts" / "post")
+    assert store.relative_path(one, bundle) == os.path.join("..", "..", "..", MEDIA_DIR, store.name(one))
+    assert store.url(store.name(one)) == "/media/" + store.name(one)
+
+
+def test_collect_garbage_keeps_linked_files(tmp_path):
+    site = str(tmp_path / "site")
+    store = MediaStore(site)
+    used = write(os.path.join(store.root, "0123456789abcdef.png"), "x")
+    unused = write(os.path.join(store.root, "fedcba9876543210.png"), "y")
+    other = write(os.path.join(store.root, "README.txt"), "kept")
+    posts = os.path.join(site, "content", "posts")
+    write(os.path.join(posts, "post", "index.md"), "![a](/media/0123456789abcdef.png)\n")
+    assert store.collect_garbage(posts) == [unused]
+    assert os.path.exists(used) and os.path.exists(other)
@@ -0,0 +1,77 @@
+import gzip
+import os
+
+from conftest import git, write
+from mala import GitDeployer
+from minify import Minifier, minify_css, minify_html, process_file
+
+PAGE = "<html>\n  <body>\n    <p>" + "Hello there. " * 40 + "</p>\n  </body>\n</html>\n"
+
+
+def test_minifiers():
+    assert minify_html("<ul>\n  <li>a</li>\n</ul>\n<pre>  x\n  y</pre>") == "<ul><li>a</li></ul><pre>  x\n  y</pre>"
+    assert minify_css("a {\n  color: red;\n}\n/* gone */") == "a{color:red}"
+
+
+def test_unwritten_gz_is_not_required_or_reported(tmp_path):
+    # Too small for gzip to pay off, so no .gz is written
+    path = write(str(tmp_path / "public" / "tiny.css"), "a{b:c}")
+    first = process_file(path, path, {})
+    assert first["outputs"] == [] and ".gz" not in first
+    assert not os.path.exists(path + ".gz")
+    assert process_file(path, path, first)["written"] == []
+
+    minifier = Minifier(str(tmp_path / "public"), str(tmp_path / "minify.json"))
+    minifier.run(workers=1)
+    assert ".gz" not in minifier.report()[".css"]
+
+
+def test_skip_needs_the_recorded_outputs(tmp_path):
+    path = write(str(tmp_path / "public" / "index.html"), PAGE)
+    first = process_file(path, path, {})
+    assert first["outputs"] == [".gz"]
+    os.remove(path + ".gz")
+    assert process_file(path, path, first)["written"] == [path + ".gz"]
+
+
+def test_staging_leaves_public_untouched(tmp_path):
+    public = str(tmp_path / "public")
+    out = str(tmp_path / "staged")
+    path = write(os.path.join(public, "index.html"), PAGE)
+    changed, report = Minifier.load(public, str(tmp_path / "minify.json"), out).run(workers=1)
+    staged = os.path.join(out, "index.html")
+    assert sorted(changed) == [staged, staged + ".gz"]
+    assert open(path).read() == PAGE
+    assert gzip.decompress(open(staged + ".gz", "rb").read()) == open(staged, "rb").read()
+    assert report[".html"]["minified"] < report[".html"]["original"]
+
+    assert Minifier.load(public, str(tmp_path / "minify.json"), out).run(workers=1)[0] == []
+    os.remove(path)
+    Minifier.load(public, str(tmp_path / "minify.json"), out).run(workers=1)
+    assert os.listdir(out) == []
+
+
+def test_minified_deploy_keeps_the_working_tree_clean(site_repo):
+    write(os.path.join(site_repo, "public", "index.html"), PAGE)
+    write(os.path.join(site_repo, "public", "logo.png"), "png")
+    git("add", "public", cwd=site_repo)
+    git("commit", "-q", "-m", "build", cwd=site_repo)
+
+    assert GitDeployer(site_repo, "public", on_output=None).deploy(minify=True)
+    assert git("status", "--porcelain", cwd=site_repo) == ""
+    files = git("ls-tree", "--name-only", "origin/gh-pages", cwd=site_repo).split()
+    assert files == ["index.html", "index.html.gz", "logo.png"]
+    deployed = git("show", "origin/gh-pages:index.html", cwd=site_repo)
+    assert deployed == minify_html(PAGE)
+
+
+def test_javascript_is_left_as_is(tmp_path):
+    script = "var x = a / b / c;\nvar y = b + /x/.source;  // division, then a regex\n"
+    assert minify_html(f"<p>a</p>\n<script>{script}</script>") == f"<p>a</p><script>{script}</script>"
+    path = write(str(tmp_path / "public" / "app.js"), script * 40)
+    result = process_file(path, path, {})
+    with open(path) as file:
+        assert file.read() == script * 40
+    assert result["outputs"] == [".gz"]
+    with gzip.open(path + ".gz", "rt") as file:
+        assert file.read() == script * 40
@@ -0,0 +1,43 @@
+import os
+
+import pytest
+
+from conftest import write
+from post_index import PostIndex
+
+
+def post(posts_dir, name, title, date, tags="[]", draft="false"):
+    write(os.path.join(posts_dir, name, "index.md"),
+          f"---\ntitle: {title}\ndate: {date}\ntags: {tags}\ndraft: {draft}\n---\nBody\n")
+
+
+@pytest.fixture
+def posts_dir(tmp_path):
+    posts_dir = str(tmp_path / "posts")
+    post(posts_dir, "rome", "Roman Holiday", "2024-01-02", tags="[travel]")
+    post(posts_dir, "oslo", "Oslo in Winter", "2024-03-04", tags="[travel, cold]")
+    post(posts_dir, "bread", "Sourdough", "2023-05-06", draft="true")
+    return posts_dir
+
+
+def test_query(posts_dir, tmp_path):
+    index = PostIndex.load(posts_dir, str(tmp_path / "posts.json"))
+    assert [p["name"] for p in index.query()] == ["oslo", "rome", "bread"]
+    assert [p["name"] for p in index.query("Title")] == ["oslo", "rome", "bread"]
+    assert [p["name"] for p in index.query(tag="travel", sort="Oldest")] == ["rome", "oslo"]
+    assert [p["name"] for p in index.query(draft=True)] == ["bread"]
+    assert [p["name"] for p in index.query(text="ROM")] == ["rome"]
+    assert index.tags() == ["cold", "travel"]
+
+
+def test_refresh_reports_changed_and_removed_posts(posts_dir, tmp_path):
+    cache = str(tmp_path / "posts.json")
+    PostIndex.load(posts_dir, cache)
+    index = PostIndex.load(posts_dir, cache, refresh=False)
+    assert index.refresh() == set()
+    post(posts_dir, "rome", "Rome Again", "2024-01-02")
+    os.remove(os.path.join(posts_dir, "bread", "index.md"))
+    os.rmdir(os.path.join(posts_dir, "bread"))
+    assert index.refresh() == {"rome", "bread"}
+    assert index.posts["rome"]["title"] == "Rome Again"
+
@@ -0,0 +1,83 @@
+import os
+import subprocess
+
+import pytest
+
+from conftest import git, write
+from publish import NothingToPublish, WrongBranch, expand_paths, publish, relative_paths
+
+
+def test_relative_paths_skip_outside_repo(tmp_path):
+    site = str(tmp_path / "site")
+    paths = [os.path.join(site, "content", "a.md"), str(tmp_path / "elsewhere.md"), site]
+    assert relative_paths(site, paths) == ["content/a.md"]
+
+
+def test_expand_paths_lists_deleted_tracked_files(tmp_path):
+    site = str(tmp_path)
+    write(os.path.join(site, "posts", "a", "index.md"))
+    files = expand_paths(site, ["posts/a"], ["posts/a/index.md", "posts/a/old.png", "posts/b/index.md"])
+    assert files == ["posts/a/index.md", "posts/a/old.png"]
+
+
+def test_publish_commits_only_written_paths(site_repo):
+    written = write(os.path.join(site_repo, "content", "posts", "new", "index.md"), "new\n")
+    write(os.path.join(site_repo, "scratch.txt"), "not ours\n")
+    commit = publish(site_repo, [written], "Add new", backend="git")
+    assert git("rev-parse", "origin/master", cwd=site_repo).strip() == commit
+    assert git("show", "--name-only", "--format=", commit, cwd=site_repo).split() == ["content/posts/new/index.md"]
+
+
+def test_publish_without_changes_stays_offline(site_repo):
+    calls = []
+
+    def run(cmd, cwd):
+        calls.append(cmd[:2])
+        from publish import run_git
+        return run_git(cmd, cwd)
+
+    with pytest.raises(NothingToPublish):
+        publish(site_repo, [os.path.join(site_repo, "content", "posts", "hello", "index.md")], "Nothing",
+                backend="git", run=run)
+    assert ["git", "push"] not in calls
+
+
+def test_publish_with_path_deleted_in_same_session(site_repo):
+    # Imported, then deleted again before anything was committed
+    gone = write(os.path.join(site_repo, "content", "posts", "gone", "index.md"), "gone\n")
+    os.remove(gone)
+    os.rmdir(os.path.dirname(gone))
+    kept = write(os.path.join(site_repo, "content", "posts", "kept", "index.md"), "kept\n")
+    removed = os.path.join(site_repo, "content", "posts", "hello", "index.md")
+    os.remove(removed)
+
+    commit = publish(site_repo, [gone, os.path.dirname(gone), kept, removed], "Sync", backend="git")
+    assert git("ls-tree", "-r", "--name-only", commit, cwd=site_repo).split() == ["content/posts/kept/index.md"]
+
+
+def test_publish_only_deleted_unknown_path_is_nothing(site_repo):
+    gone = write(os.path.join(site_repo, "static", "search", "zz.json"), "{}")
+    os.remove(gone)
+    with pytest.raises(NothingToPublish):
+        publish(site_repo, [gone], "Nothing", backend="git")
+
+
+def test_publish_refuses_another_branch(site_repo):
+    git("checkout", "-q", "-b", "feature", cwd=site_repo)
+    written = write(os.path.join(site_repo, "content", "posts", "draft", "index.md"), "draft\n")
+    with pytest.raises(WrongBranch, match="on feature"):
+        publish(site_repo, [written], "Add draft", backend="git")
+    # Nothing was committed and the remote master is untouched
+    assert git("rev-parse", "feature", cwd=site_repo) == git("rev-parse", "origin/master", cwd=site_repo)
+    git("checkout", "-q", "--detach", cwd=site_repo)
+    with pytest.raises(WrongBranch, match="detached HEAD"):
+        publish(site_repo, [written], "Add draft", backend="git")
+
+
+def test_publish_leaves_upstream_tracking_alone(site_repo):
+    git("branch", "-q", "--unset-upstream", cwd=site_repo)
+    written = write(os.path.join(site_repo, "content", "posts", "new", "index.md"), "new\n")
+    commit = publish(site_repo, [written], "Add new", backend="git")
+    assert git("ls-remote", "origin", "refs/heads/master", cwd=site_repo).split()[0] == commit
+    with pytest.raises(subprocess.CalledProcessError):
+        git("rev-parse", "--abbrev-ref", "master@{upstream}", cwd=site_repo)
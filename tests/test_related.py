@@ -0,0 +1,92 @@
+import json
+import os
+
+from conftest import write
+from related import RelatedPosts, anchor, date_keyword
+
+CONFIG = """[related]
+  threshold = 80
+  includeNewer = {}
+
+    [[related.indices]]
+        name = "tags"
+        weight = 100
+
+    [[related.indices]]
+        name = "date"
+        weight = 10
+        pattern = "2006"
+"""
+
+
+def post(site, name, date, tags, extra=""):
+    return write(os.path.join(site, "content", "posts", name, "index.md"),
+                 f"---\ntitle: {name.title()}\ndate: {date}\ntags: [{', '.join(tags)}]\n{extra}---\nBody\n")
+
+
+def make_site(tmp_path, include_newer="true"):
+    site = str(tmp_path / "site")
+    write(os.path.join(site, "hugo.toml"), CONFIG.format(include_newer))
+    post(site, "a", "2024-01-01", ["x", "y"])
+    post(site, "b", "2024-02-01", ["x"])
+    post(site, "c", "2023-05-01", ["z"])
+    post(site, "d", "2024-03-01", ["x"], extra="draft: true\n")
+    return site
+
+
+def related(site, name):
+    path = os.path.join(site, "data", "related", f"{name}.json")
+    if not os.path.exists(path):
+        return None
+    with open(path) as file:
+        return [(entry["path"], entry["score"]) for entry in json.load(file)]
+
+
+def test_helpers():
+    assert anchor("Hello, World Again") == "hello-world-again"
+    assert date_keyword("2024-03-05T10:00:00Z", "2006-01") == "2024-03"
+
+
+def test_scores_skip_drafts_and_unrelated_posts(tmp_path):
+    site = make_site(tmp_path)
+    RelatedPosts(site, cache_path=str(tmp_path / "related.json")).update()
+    assert related(site, "a") == [("/posts/b", 110)]
+    assert related(site, "b") == [("/posts/a", 110)]
+    assert related(site, "c") == []
+    assert related(site, "d") is None
+
+
+def test_only_older_posts_without_include_newer(tmp_path):
+    site = make_site(tmp_path, include_newer="false")
+    RelatedPosts(site, cache_path=str(tmp_path / "related.json")).update()
+    assert related(site, "a") == []
+    assert related(site, "b") == [("/posts/a", 110)]
+
+
+def test_incremental_update_matches_full(tmp_path):
+    site = make_site(tmp_path)
+    cache = str(tmp_path / "related.json")
+    RelatedPosts(site, cache_path=cache).update()
+    assert RelatedPosts(site, cache_path=cache).update() == []
+
+    post(site, "c", "2023-05-01", ["y"])
+    changed = RelatedPosts(site, cache_path=cache).update()
+    folder = os.path.join(site, "data", "related")
+    # b shares no tag with c, old or new, so it is not rescored
+    assert sorted(changed) == [os.path.join(folder, "a.json"), os.path.join(folder, "c.json")]
+    assert related(site, "c") == [("/posts/a", 100)]
+    incremental = {name: related(site, name) for name in "abcd"}
+
+    RelatedPosts(site, cache_path=str(tmp_path / "fresh.json")).update(everything=True)
+    assert {name: related(site, name) for name in "abcd"} == incremental
+
+
+def test_removed_post_drops_its_file(tmp_path):
+    site = make_site(tmp_path)
+    cache = str(tmp_path / "related.json")
+    RelatedPosts(site, cache_path=cache).update()
+    os.remove(os.path.join(site, "content", "posts", "b", "index.md"))
+    os.rmdir(os.path.join(site, "content", "posts", "b"))
+    RelatedPosts(site, cache_path=cache).update()
+    assert related(site, "b") is None
+    assert related(site, "a") == []
@@ -0,0 +1,64 @@
+import os
+
+import pytest
+
+pytest.importorskip("markdown")
+
+from conftest import write
+from render import Renderer
+
+SHELL = ('<html><head><title>404</title><link rel="canonical" href="https://example.com/404.html"></head>'
+         '<body><main id="main-content" class="grow">Not found</main></body></html>')
+
+
+@pytest.fixture
+def site(tmp_path):
+    site = str(tmp_path / "site")
+    write(os.path.join(site, "hugo.toml"), 'title = "Test"\n')
+    write(os.path.join(site, "public", "404.html"), SHELL)
+    post = os.path.join(site, "content", "posts", "first")
+    write(os.path.join(post, "index.md"),
+          "---\ntitle: First\ndate: 2024-01-02\n---\n![a](assets/x.png) ![b](y.png)\n")
+    write(os.path.join(post, "y.png"), "top")
+    write(os.path.join(post, "assets", "x.png"), "nested")
+    return site
+
+
+def test_render_post_copies_nested_bundle_resources(site, tmp_path):
+    changed = Renderer(site, str(tmp_path / "render.json")).render()
+    public_post = os.path.join(site, "public", "posts", "first")
+    assert os.path.join(public_post, "index.html") in changed
+    with open(os.path.join(public_post, "assets", "x.png")) as file:
+        assert file.read() == "nested"
+    assert os.path.exists(os.path.join(public_post, "y.png"))
+    assert not os.path.exists(os.path.join(public_post, "index.md"))
+
+
+def test_render_writes_nothing_when_unchanged(site, tmp_path):
+    cache = str(tmp_path / "render.json")
+    Renderer(site, cache).render()
+    assert Renderer(site, cache).render() == []
+
+
+def test_render_removes_outputs_whose_source_is_gone(site, tmp_path):
+    cache = str(tmp_path / "render.json")
+    Renderer(site, cache).render()
+    post = os.path.join(site, "content", "posts", "first")
+    os.rename(os.path.join(post, "y.png"), os.path.join(post, "z.png"))
+    os.remove(os.path.join(post, "assets", "x.png"))
+    os.rmdir(os.path.join(post, "assets"))
+    changed = Renderer(site, cache).render()
+    public_post = os.path.join(site, "public", "posts", "first")
+    assert os.path.join(public_post, "y.png") in changed
+    assert sorted(os.listdir(public_post)) == ["index.html", "z.png"]
+
+
+def test_render_removes_the_old_slug(site, tmp_path):
+    cache = str(tmp_path / "render.json")
+    Renderer(site, cache).render()
+    write(os.path.join(site, "content", "posts", "first", "index.md"),
+          "---\ntitle: First\ndate: 2024-01-02\nslug: renamed\n---\n![b](y.png)\n")
+    Renderer(site, cache).render()
+    posts = os.path.join(site, "public", "posts")
+    assert not os.path.exists(os.path.join(posts, "first"))
+    assert sorted(os.listdir(os.path.join(posts, "renamed"))) == ["assets", "index.html", "y.png"]
@@ -0,0 +1,80 @@
+import json
+import os
+
+import pytest
+
+from conftest import write
+from search_index import SearchIndex, missing_shards, shard_key, tokenize
+
+
+def post(site, name, title, body, extra=""):
+    return write(os.path.join(site, "content", "posts", name, "index.md"),
+                 f"---\ntitle: {title}\ndate: 2024-03-05\n{extra}---\n{body}\n")
+
+
+@pytest.fixture
+def site(tmp_path):
+    site = str(tmp_path / "site")
+    post(site, "alpha", "Alpha", "Obsidian notes about gardening")
+    post(site, "beta", "Beta", "Cooking with obsidian knives")
+    return site
+
+
+def shards(site):
+    folder = os.path.join(site, "static", "search")
+    return {name: json.load(open(os.path.join(folder, name))) for name in sorted(os.listdir(folder))}
+
+
+def test_tokenize():
+    assert tokenize("A bb, BB cc_d!") == {"bb": 2, "cc_d": 1}
+    assert shard_key("obsidian") == "ob"
+
+
+def test_build(site, tmp_path):
+    changed = SearchIndex.load(site, str(tmp_path / "search.json")).update()
+    data = shards(site)
+    assert os.path.join(site, "static", "search", "manifest.json") in changed
+    assert data["ob.json"]["terms"]["obsidian"] == {"alpha": 1, "beta": 1}
+    assert data["ob.json"]["docs"]["alpha"] == ["Alpha", "/posts/alpha/", "5 March 2024"]
+    # Title words outweigh body words
+    assert data["al.json"]["terms"]["alpha"] == {"alpha": 5}
+    assert sorted(data["manifest.json"]["shards"]) == sorted(name[:-5] for name in data if name != "manifest.json")
+    assert missing_shards(os.path.join(site, "static", "search")) == []
+
+
+def test_incremental_update_matches_rebuild(site, tmp_path):
+    cache = str(tmp_path / "search.json")
+    SearchIndex.load(site, cache).update()
+    assert SearchIndex.load(site, cache).update() == []
+
+    post(site, "beta", "Beta", "Baking bread")
+    post(site, "gamma", "Gamma", "Hidden", extra="draft: true\n")
+    changed = SearchIndex.load(site, cache).update()
+    folder = os.path.join(site, "static", "search")
+    # Only the shards beta's old and new words live in are touched
+    assert os.path.join(folder, "al.json") not in changed
+    assert os.path.join(folder, "co.json") in changed and not os.path.exists(os.path.join(folder, "co.json"))
+    assert "hidden" not in shards(site).get("hi.json", {"terms": {}})["terms"]
+    incremental = shards(site)
+
+    SearchIndex.load(site, str(tmp_path / "fresh.json")).update(rebuild=True)
+    assert shards(site) == incremental
+
+
+def test_removed_post_leaves_the_index(site, tmp_path):
+    cache = str(tmp_path / "search.json")
+    SearchIndex.load(site, cache).update()
+    os.remove(os.path.join(site, "content", "posts", "alpha", "index.md"))
+    SearchIndex.load(site, cache).update()
+    data = shards(site)
+    assert data["ob.json"]["terms"]["obsidian"] == {"beta": 1}
+    assert "alpha" not in data["ob.json"]["docs"]
+    assert "ga.json" not in data
+
+
+def test_missing_shards(site, tmp_path):
+    folder = os.path.join(site, "static", "search")
+    assert missing_shards(folder) == ["manifest.json"]
+    SearchIndex.load(site, str(tmp_path / "search.json")).update()
+    os.remove(os.path.join(folder, "ob.json"))
+    assert missing_shards(folder) == ["ob.json"]
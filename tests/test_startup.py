@@ -0,0 +1,29 @@
+import subprocess
+import sys
+
+import pytest
+
+from conftest import ROOT
+
+# The image, rendering and index stages load on first use, not at startup
+HEAVY = ("PIL", "markdown", "images", "image_cache", "media", "link_graph", "search_index", "related", "minify",
+         "sqlite3", "tkinterdnd2")
+
+
+def loaded_after(statement: str) -> list[str]:
+    code = f"import sys; {statement}; print(' '.join(name for name in {HEAVY!r} if name in sys.modules))"
+    result = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+    return result.stdout.split()
+
+
+@pytest.mark.parametrize("statement", ["import engine", "import engine, post_index, tracing, virtual_list",
+                                       "import mala", "import publish"])
+def test_entry_points_defer_the_pipeline(statement):
+    if "virtual_list" in statement:
+        pytest.importorskip("tkinter")
+    assert loaded_after(statement) == []
+
+
+def test_blog_obsidian_builds_no_window_on_import():
+    pytest.importorskip("tkinter")
+    assert loaded_after("import blog_obsidian; assert blog_obsidian.root is None") == []
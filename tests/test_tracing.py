@@ -0,0 +1,61 @@
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import tracing
+from tracing import Tracer, merge_traced, traced_call
+
+
+def work(value):
+    with tracing.span("square", value=value):
+        return value * value
+
+
+def test_disabled_spans_record_nothing():
+    tracer = Tracer()
+    with tracer.span("ignored"):
+        pass
+    assert tracer.events == []
+
+
+def test_export_is_chrome_trace_json(tmp_path):
+    tracer = Tracer()
+    tracer.enable()
+    with tracer.span("outer", note="a.md"):
+        with tracer.span("inner", size=3):
+            pass
+    path = str(tmp_path / "trace.json")
+    tracer.export(path)
+    with open(path) as file:
+        trace = json.load(file)
+
+    assert trace["displayTimeUnit"] == "ms"
+    events = {event["name"]: event for event in trace["traceEvents"]}
+    assert set(events) == {"outer", "inner"}
+    for event in events.values():
+        assert event["ph"] == "X"
+        assert isinstance(event["ts"], float) and event["dur"] >= 0
+        assert event["pid"] == os.getpid() and isinstance(event["tid"], int)
+        assert all(isinstance(value, str) for value in event["args"].values())
+    outer, inner = events["outer"], events["inner"]
+    # Complete events nest by time on one thread
+    assert outer["ts"] <= inner["ts"] and inner["ts"] + inner["dur"] <= outer["ts"] + outer["dur"]
+    assert outer["args"] == {"note": "a.md"} and inner["args"] == {"size": "3"}
+    assert [line.split()[0] for line in tracer.summary().splitlines()] == ["span", "outer", "inner"]
+
+
+def test_worker_spans_come_back_with_results(monkeypatch):
+    monkeypatch.setattr(tracing.tracer, "enabled", True)
+    monkeypatch.setattr(tracing.tracer, "events", [])
+    with ProcessPoolExecutor(max_workers=2) as executor:
+        results = list(merge_traced(executor.map(partial(traced_call, work, True), [2, 3])))
+    assert results == [4, 9]
+    events = tracing.tracer.drain()
+    assert sorted(event["args"]["value"] for event in events) == ["2", "3"]
+    assert all(event["pid"] != os.getpid() for event in events)
+    json.dumps({"traceEvents": events})
+
+
+def test_traced_call_without_tracing():
+    assert traced_call(work, False, 4) == (16, [])
@@ -0,0 +1,13 @@
+import pytest
+
+virtual_list = pytest.importorskip("virtual_list")
+
+
+def test_prefix_index():
+    items = ["Roman Holiday", "Oslo in Winter", "Rome again"]
+    index = virtual_list.PrefixIndex(items, lambda item: [item])
+    assert index.find("rom") == [0, 2]
+    assert index.find("ro ag") == [2]
+    assert index.find("in wi") == [1]
+    assert index.find("paris") == []
+    assert index.find("  ") == [0, 1, 2]
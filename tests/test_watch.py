@@ -0,0 +1,75 @@
+import os
+import sys
+
+import pytest
+
+import watch
+from conftest import write
+
+
+@pytest.fixture
+def inotify(tmp_path):
+    if not sys.platform.startswith("linux"):
+        pytest.skip("inotify is only available on Linux")
+    vault = tmp_path / "vault"
+    write(str(vault / "Trips" / "Rome.md"), "Rome\n")
+    write(str(vault / "Trips" / "2024" / "Oslo.md"), "Oslo\n")
+    write(str(vault / "Home.md"), "Home\n")
+    watcher = watch.InotifyWatcher(str(vault))
+    yield watcher
+    watcher.close()
+
+
+def test_folder_moved_out_reports_its_files(inotify, tmp_path):
+    trips = os.path.join(inotify.root, "Trips")
+    os.rename(trips, str(tmp_path / "Trips"))
+    assert watch.next_batch(inotify, 0.05) == {os.path.join(trips, "Rome.md"),
+                                               os.path.join(trips, "2024", "Oslo.md")}
+    assert inotify.files == {os.path.join(inotify.root, "Home.md")}
+    # Saves in the moved folder no longer belong to the vault
+    write(str(tmp_path / "Trips" / "Rome.md"), "Rome again\n")
+    assert inotify.read(0.05) == set()
+
+
+def test_folder_moved_in_reports_its_files(inotify, tmp_path):
+    write(str(tmp_path / "Work" / "Plan.md"), "Plan\n")
+    os.rename(str(tmp_path / "Work"), os.path.join(inotify.root, "Work"))
+    plan = os.path.join(inotify.root, "Work", "Plan.md")
+    assert watch.next_batch(inotify, 0.05) == {plan}
+    write(plan, "Plan v2\n")
+    assert watch.next_batch(inotify, 0.05) == {plan}
+
+
+class FakeWatcher:
+    overflowed = False
+
+    def __init__(self, batches):
+        self.batches = list(batches)
+
+    def read(self, timeout):
+        if timeout is not None:
+            return set()
+        if not self.batches:
+            raise KeyboardInterrupt
+        return self.batches.pop(0)
+
+    def close(self):
+        pass
+
+
+def test_failed_batch_keeps_watching(monkeypatch, capsys):
+    imported = []
+
+    def import_changes(vault, site_repo, batch, **kwargs):
+        if "broken.md" in batch:
+            raise UnicodeDecodeError("utf-8", b"\xff", 0, 1, "invalid start byte")
+        imported.append(batch)
+        return []
+
+    monkeypatch.setattr(watch, "import_vault", lambda *args, **kwargs: [])
+    monkeypatch.setattr(watch, "import_changes", import_changes)
+    monkeypatch.setattr(watch, "make_watcher", lambda vault, poll: FakeWatcher([{"broken.md"}, {"fine.md"}]))
+    with pytest.raises(KeyboardInterrupt):
+        watch.watch("vault", "site")
+    assert imported == [{"fine.md"}]
+    assert "1 vault changes not published: UnicodeDecodeError" in capsys.readouterr().err
@@ -0,0 +1,48 @@
+from wikilinks import LinkRewriter, rewrite_links, slugify, split_link
+
+
+def test_slugify():
+    assert slugify("My Trip: Rome & Oslo!") == "my-trip-rome-oslo"
+    assert slugify("???") == "untitled"
+
+
+def test_split_link():
+    assert split_link("Note#^block|Alias") == ("Note", "block", "Alias")
+
+
+def test_images_and_attachments():
+    content, attachments = rewrite_links("![[a b.png]] ![[a b.png|300x200]] ![[c.jpg|A cat]] ![[paper.pdf]]")
+    assert content == ('![Image Description](a%20b.png) '
+                       '<img src="a%20b.png" alt="Image Description" width="300" height="200"> '
+                       '![A cat](c.jpg) [paper.pdf](paper.pdf)')
+    # Each attachment is listed once, in order of first use
+    assert attachments == ["a b.png", "c.jpg", "paper.pdf"]
+
+
+def test_legacy_image_link_renders_as_image():
+    assert rewrite_links("[[x.png]]")[0] == "![Image Description](x.png)"
+
+
+def test_note_links():
+    content, attachments = rewrite_links("[[My Note]] [[My Note|alias]] [[My Note#Some Part]] [[#Top]]")
+    assert content == ("[My Note](../my-note/) [alias](../my-note/) "
+                       "[My Note > Some Part](../my-note/#some-part) [Top](#top)")
+    assert attachments == []
+
+
+def test_code_is_left_alone():
+    text = "`[[inline]]`\n```\n![[x.png]]\n```\n[[Real]]"
+    assert rewrite_links(text)[0] == "`[[inline]]`\n```\n![[x.png]]\n```\n[Real](../real/)"
+    # An unclosed fence runs to the end of the note
+    assert rewrite_links("```\n[[Still code]]")[0] == "```\n[[Still code]]"
+
+
+def test_unresolved_links():
+    rewriter = LinkRewriter(resolve_attachment=lambda name: None, resolve_note=lambda target, heading: None)
+    content, attachments = rewriter.rewrite("![[missing.png]] [[Gone|the gone note]]")
+    assert content == "![[missing.png]] the gone note"
+    assert attachments == []
+
+
+def test_links_do_not_span_lines():
+    assert rewrite_links("[[a\nb]]")[0] == "[[a\nb]]"
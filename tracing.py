@@ -0,0 +1,136 @@
+"""
+Lightweight spans for timing the importer and deploy stages.
+
+    from tracing import span, tracer
+
+    with span("rewrite links", note=path):
+        ...
+
+Spans cost one attribute check while tracing is off. Turn it on with
+tracer.enable() (the --trace flags do) or by setting
+MARKDOWN_PROCESSOR_TRACE to a file name, which also works for the GUI.
+On exit the collected spans are written there as Chrome trace JSON (open
+it in chrome://tracing or https://ui.perfetto.dev) and a summary table
+is printed.
+
+Spans recorded inside ProcessPoolExecutor workers are shipped back with
+the results by wrapping the worker in traced_call.
+"""
+import atexit
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+TRACE_ENV = "MARKDOWN_PROCESSOR_TRACE"
+
+
+class Tracer:
+    def __init__(self):
+        self.enabled = False
+        self.path = None
+        self.owner = None
+        self.events = []
+        self._lock = threading.Lock()
+
+    def enable(self, path: str | None = None):
+        """Start recording; with a path, export the trace and print a summary at exit"""
+        if path and not self.path:
+            atexit.register(self.finish)
+            self.owner = os.getpid()
+        self.enabled = True
+        self.path = path or self.path
+
+    def add(self, name: str, start: float, duration: float, /, tid=None, **args):
+        """Record a finished span from perf_counter() start and duration, in seconds"""
+        if not self.enabled:
+            return
+        event = {"name": name, "ph": "X", "ts": start * 1e6, "dur": duration * 1e6,
+                 "pid": os.getpid(), "tid": tid if tid is not None else threading.get_ident()}
+        if args:
+            event["args"] = {key: str(value) for key, value in args.items()}
+        with self._lock:
+            self.events.append(event)
+
+    @contextmanager
+    def _span(self, name, args, /):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, start, time.perf_counter() - start, **args)
+
+    def span(self, name: str, /, **args):
+        if not self.enabled:
+            return nullcontext()
+        return self._span(name, args)
+
+    def drain(self) -> list[dict]:
+        with self._lock:
+            events, self.events = self.events, []
+        return events
+
+    def merge(self, events: list[dict]):
+        with self._lock:
+            self.events.extend(events)
+
+    def summary(self) -> str:
+        """Count, total, mean and max duration per span name, slowest total first"""
+        rows = {}
+        for event in self.events:
+            row = rows.setdefault(event["name"], [0, 0.0, 0.0])
+            row[0] += 1
+            row[1] += event["dur"]
+            row[2] = max(row[2], event["dur"])
+        lines = [f"{'span':<40}{'count':>7}{'total ms':>12}{'mean ms':>10}{'max ms':>10}"]
+        for name, (count, total, longest) in sorted(rows.items(), key=lambda item: -item[1][1]):
+            lines.append(f"{name[:40]:<40}{count:>7}{total / 1000:>12.1f}{total / count / 1000:>10.2f}"
+                         f"{longest / 1000:>10.1f}")
+        return "\n".join(lines)
+
+    def export(self, path: str):
+        """Write the spans as Chrome trace event JSON"""
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as file:
+            file.write(json.dumps({"traceEvents": self.events, "displayTimeUnit": "ms"}))
+        os.replace(tmp_path, path)
+
+    def finish(self):
+        # Spawned pool workers import this module too; only the process that enabled tracing reports
+        if not self.events or os.getpid() != self.owner:
+            return
+        print(self.summary())
+        if self.path:
+            self.export(self.path)
+            print(f"Trace written to {self.path}")
+
+
+tracer = Tracer()
+if os.environ.get(TRACE_ENV):
+    tracer.enable(os.environ[TRACE_ENV])
+
+
+def span(name: str, /, **args):
+    """Time the enclosed block as a span of the module's tracer"""
+    return tracer.span(name, **args)
+
+
+def traced_call(func, enabled: bool, *args):
+    """
+    Worker wrapper for process pools: run func(*args) with tracing on if it
+    was on in the parent and return (result, spans recorded in the worker).
+    """
+    if not enabled:
+        return func(*args), []
+    tracer.enabled = True
+    tracer.drain()
+    result = func(*args)
+    return result, tracer.drain()
+
+
+def merge_traced(outcomes):
+    """Yield the results of traced_call outcomes, adding their spans to this process's tracer"""
+    for result, events in outcomes:
+        tracer.merge(events)
+        yield result
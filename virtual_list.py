@@ -0,0 +1,128 @@
+"""
+Virtualized list widget and prefix index for very large post lists.
+
+A Tk Listbox holding 10k rows costs one Tcl round-trip per insert and
+keeps every row alive. VirtualList instead keeps the items in Python and
+only renders the rows currently in view into a fixed-height Listbox; the
+scrollbar, mouse wheel and arrow keys move a window over the items.
+PrefixIndex answers type-ahead queries with two bisects over a sorted
+token list instead of scanning every title.
+"""
+from bisect import bisect_left
+from tkinter import Frame, Listbox, Scrollbar
+
+
+class PrefixIndex:
+    """Maps word prefixes to the positions of the items containing them"""
+
+    def __init__(self, items, keys):
+        pairs = sorted(
+            (token, position)
+            for position, item in enumerate(items)
+            for token in {word for key in keys(item) for word in key.lower().split()}
+        )
+        self.tokens = [token for token, _ in pairs]
+        self.positions = [position for _, position in pairs]
+        self.size = len(items)
+
+    def find(self, text: str) -> list[int]:
+        """Positions of items where every word of text prefixes one of their words"""
+        result = None
+        for word in text.lower().split():
+            lo = bisect_left(self.tokens, word)
+            hi = bisect_left(self.tokens, word + "\uffff", lo)
+            matches = set(self.positions[lo:hi])
+            result = matches if result is None else result & matches
+        if result is None:
+            return list(range(self.size))
+        return sorted(result)
+
+
+class VirtualList(Frame):
+    def __init__(self, master, width=50, height=10, **kwargs):
+        super().__init__(master, **kwargs)
+        self.items = []
+        self.render = str
+        self.offset = 0
+        self.selected = None
+        self.rows = height
+
+        self.listbox = Listbox(self, width=width, height=height, activestyle="none", exportselection=False)
+        self.scrollbar = Scrollbar(self, orient="vertical", command=self._on_scroll)
+        self.listbox.pack(side="left", fill="y")
+        self.scrollbar.pack(side="right", fill="y")
+
+        self.listbox.bind("<<ListboxSelect>>", self._on_select)
+        self.listbox.bind("<MouseWheel>", self._on_wheel)
+        self.listbox.bind("<Button-4>", lambda _: self._scroll_by(-3))
+        self.listbox.bind("<Button-5>", lambda _: self._scroll_by(3))
+        self.listbox.bind("<Up>", lambda _: self._move_selection(-1))
+        self.listbox.bind("<Down>", lambda _: self._move_selection(1))
+        self.listbox.bind("<Prior>", lambda _: self._move_selection(-self.rows))
+        self.listbox.bind("<Next>", lambda _: self._move_selection(self.rows))
+
+    def set_items(self, items, render=str):
+        """Show a new sequence of items; render(item) gives the row text"""
+        self.items = items
+        self.render = render
+        self.offset = 0
+        self.selected = None
+        self._draw()
+
+    def selected_item(self):
+        if self.selected is None or self.selected >= len(self.items):
+            return None
+        return self.items[self.selected]
+
+    def see(self, position: int):
+        """Scroll so the item at position is in view and select it"""
+        self.selected = position
+        if position < self.offset:
+            self.offset = position
+        elif position >= self.offset + self.rows:
+            self.offset = position - self.rows + 1
+        self._draw()
+
+    def _draw(self):
+        total = len(self.items)
+        self.offset = max(0, min(self.offset, total - self.rows))
+        window = [self.render(item) for item in self.items[self.offset:self.offset + self.rows]]
+        self.listbox.delete(0, "end")
+        if window:
+            self.listbox.insert("end", *window)
+        if self.selected is not None and self.offset <= self.selected < self.offset + len(window):
+            self.listbox.selection_set(self.selected - self.offset)
+        if total:
+            self.scrollbar.set(self.offset / total, min(1.0, (self.offset + self.rows) / total))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+
+    def _scroll_by(self, rows: int):
+        self.offset += rows
+        self._draw()
+        return "break"
+
+    def _on_scroll(self, action, *args):
+        if action == "moveto":
+            self.offset = int(float(args[0]) * len(self.items))
+        elif action == "scroll":
+            step = self.rows if args[1] == "pages" else 1
+            self.offset += int(args[0]) * step
+        self._draw()
+
+    def _on_wheel(self, event):
+        # Windows reports multiples of 120, macOS small deltas
+        steps = max(1, abs(event.delta) // 40)
+        return self._scroll_by(-steps if event.delta > 0 else steps)
+
+    def _on_select(self, _):
+        selection = self.listbox.curselection()
+        if selection:
+            self.selected = self.offset + selection[0]
+
+    def _move_selection(self, delta: int):
+        if not self.items:
+            return "break"
+        current = self.selected if self.selected is not None else self.offset - (1 if delta > 0 else 0)
+        self.see(max(0, min(len(self.items) - 1, current + delta)))
+        return "break"
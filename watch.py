@@ -0,0 +1,296 @@
+"""
+Watch an Obsidian vault and republish notes as they are saved.
+
+Uses inotify on Linux (through ctypes, no extra dependency) and falls back
+to polling the vault with os.scandir elsewhere. Bursts of editor saves are
+debounced and coalesced, then only the affected page bundles are
+re-rendered. With --serve a `hugo server` runs alongside, so the local
+preview reloads within a second of hitting save:
+
+    python watch.py --vault ~/Obsidian --site ~/Projects/site --serve
+"""
+import argparse
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import subprocess
+import sys
+import time
+
+from engine import SKIPPED_DIRS, import_changes, import_vault, load_paths
+from image_cache import ImageCache
+from images import ImageOptions
+from manifest import Manifest
+from related import RelatedPosts
+from search_index import SearchIndex
+from tracing import span, tracer
+
+DEFAULT_DEBOUNCE = 0.3
+DEFAULT_POLL_INTERVAL = 1.0
+IGNORED_SUFFIXES = (".tmp", ".swp", ".swx", "~", ".crdownload")
+
+# From linux/inotify.h
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_ATTRIB | IN_DELETE_SELF
+EVENT_HEADER = struct.Struct("iIII")
+
+
+def is_ignored(path: str) -> bool:
+    """Obsidian's config folder, hidden files and editor temp files never publish"""
+    parts = path.split(os.sep)
+    if any(part in SKIPPED_DIRS or part.startswith(".") for part in parts):
+        return True
+    return path.endswith(IGNORED_SUFFIXES)
+
+
+class InotifyWatcher:
+    """Recursive inotify watch of a directory tree"""
+
+    def __init__(self, root: str):
+        self.root = os.path.abspath(root)
+        libc_name = ctypes.util.find_library("c")
+        if not sys.platform.startswith("linux") or libc_name is None:
+            raise OSError("inotify is only available on Linux")
+        self.libc = ctypes.CDLL(libc_name, use_errno=True)
+        self.fd = self.libc.inotify_init1(IN_NONBLOCK)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.watches = {}
+        # Every file under the watches, so a folder that leaves the vault can report what it took along
+        self.files = set()
+        self.overflowed = False
+        self._add_tree(self.root)
+
+    def _add_tree(self, top: str) -> set[str]:
+        """Watch a folder and its subfolders. Returns the files found in them."""
+        found = set()
+        for dirpath, dirnames, filenames in os.walk(top):
+            dirnames[:] = [d for d in dirnames if not is_ignored(d)]
+            wd = self.libc.inotify_add_watch(self.fd, os.fsencode(dirpath), WATCH_MASK)
+            if wd >= 0:
+                self.watches[wd] = dirpath
+            found.update(os.path.join(dirpath, filename) for filename in filenames
+                         if not is_ignored(os.path.relpath(os.path.join(dirpath, filename), self.root)))
+        self.files |= found
+        return found
+
+    def _remove_tree(self, top: str) -> set[str]:
+        """Forget a folder that was deleted or moved away. Returns the files it held."""
+        prefix = top + os.sep
+        gone = {path for path in self.files if path.startswith(prefix)}
+        self.files -= gone
+        # A folder moved out of the vault keeps reporting under its old path, so its watches go too
+        for wd, directory in list(self.watches.items()):
+            if directory == top or directory.startswith(prefix):
+                self.libc.inotify_rm_watch(self.fd, wd)
+                del self.watches[wd]
+        return gone
+
+    def read(self, timeout: float | None) -> set[str]:
+        """Paths changed within timeout seconds (None blocks until something happens)"""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return set()
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return set()
+
+        changed = set()
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b"\0").decode("utf-8", "surrogateescape")
+            offset += length
+
+            if mask & IN_Q_OVERFLOW:
+                self.overflowed = True
+                continue
+            directory = self.watches.get(wd)
+            if directory is None:
+                continue
+            if mask & IN_IGNORED:
+                del self.watches[wd]
+                continue
+            path = os.path.join(directory, name) if name else directory
+            if mask & IN_ISDIR:
+                if mask & (IN_DELETE | IN_MOVED_FROM):
+                    # Its notes are gone from the vault, so their bundles must go as well
+                    changed.update(self._remove_tree(path))
+                elif mask & (IN_CREATE | IN_MOVED_TO) and not is_ignored(os.path.relpath(path, self.root)):
+                    # New folders need their own watch; files already inside them count as changed
+                    changed.update(self._add_tree(path))
+                continue
+            if not is_ignored(os.path.relpath(path, self.root)):
+                if mask & (IN_DELETE | IN_MOVED_FROM):
+                    self.files.discard(path)
+                else:
+                    self.files.add(path)
+                changed.add(path)
+        return changed
+
+    def close(self):
+        os.close(self.fd)
+
+
+class PollingWatcher:
+    """Fallback: compare (mtime, size) snapshots of the tree every interval"""
+
+    def __init__(self, root: str, interval: float = DEFAULT_POLL_INTERVAL):
+        self.root = os.path.abspath(root)
+        self.interval = interval
+        self.overflowed = False
+        self.snapshot = self._scan()
+
+    def _scan(self) -> dict[str, tuple[int, int]]:
+        snapshot = {}
+        pending = [self.root]
+        while pending:
+            directory = pending.pop()
+            try:
+                with os.scandir(directory) as entries:
+                    for entry in entries:
+                        if entry.name in SKIPPED_DIRS or entry.name.startswith("."):
+                            continue
+                        if entry.is_dir(follow_symlinks=False):
+                            pending.append(entry.path)
+                        elif not entry.name.endswith(IGNORED_SUFFIXES):
+                            stat = entry.stat()
+                            snapshot[entry.path] = (stat.st_mtime_ns, stat.st_size)
+            except FileNotFoundError:
+                continue
+        return snapshot
+
+    def read(self, timeout: float | None) -> set[str]:
+        time.sleep(self.interval if timeout is None else min(timeout, self.interval))
+        snapshot = self._scan()
+        changed = {path for path in snapshot.keys() | self.snapshot.keys()
+                   if snapshot.get(path) != self.snapshot.get(path)}
+        self.snapshot = snapshot
+        return changed
+
+    def close(self):
+        pass
+
+
+def make_watcher(root: str, poll: bool = False, interval: float = DEFAULT_POLL_INTERVAL):
+    if not poll:
+        try:
+            return InotifyWatcher(root)
+        except (OSError, AttributeError):
+            print("inotify unavailable, polling the vault instead")
+    return PollingWatcher(root, interval)
+
+
+def next_batch(watcher, debounce: float) -> set[str]:
+    """Block for the first change, then keep collecting until debounce seconds pass quietly"""
+    batch = set()
+    while not batch:
+        batch = watcher.read(None)
+    while True:
+        more = watcher.read(debounce)
+        if not more:
+            return batch
+        batch |= more
+
+
+def watch(vault, site_repo, debounce=DEFAULT_DEBOUNCE, poll=False, image_options=None, image_cache=None,
+          hardlink=False, shared_media=False):
+    """Import the vault once, then republish affected bundles on every batch of saves"""
+    manifest = Manifest.load()
+    import_vault(vault, site_repo, manifest=manifest, image_options=image_options,
+                 image_cache=image_cache, hardlink=hardlink, shared_media=shared_media)
+    watcher = make_watcher(vault, poll)
+    print(f"Watching {vault} for changes (Ctrl+C to stop)")
+    try:
+        while True:
+            batch = next_batch(watcher, debounce)
+            start = time.perf_counter()
+            try:
+                with span("import batch", changes=len(batch)):
+                    if watcher.overflowed:
+                        # The kernel dropped events, fall back to a full incremental import
+                        watcher.overflowed = False
+                        changed = import_vault(vault, site_repo, manifest=manifest, image_options=image_options,
+                                               image_cache=image_cache, hardlink=hardlink,
+                                               shared_media=shared_media)
+                    else:
+                        changed = import_changes(vault, site_repo, batch, manifest=manifest,
+                                                 image_options=image_options, image_cache=image_cache,
+                                                 hardlink=hardlink, shared_media=shared_media)
+                    if changed:
+                        with span("search index"):
+                            changed.extend(SearchIndex.load(site_repo).update())
+                        with span("related posts"):
+                            changed.extend(RelatedPosts(site_repo).update())
+            except Exception as e:
+                # A half-saved or broken note must not stop the watch; its next save is retried
+                print(f"{len(batch)} vault changes not published: {type(e).__name__}: {e}", file=sys.stderr)
+                continue
+            elapsed = (time.perf_counter() - start) * 1000
+            for path in changed:
+                print(f"Updated {path}")
+            print(f"{len(batch)} vault changes -> {len(changed)} files updated in {elapsed:.0f} ms")
+    finally:
+        watcher.close()
+
+
+def main(argv=None):
+    paths = load_paths()
+    parser = argparse.ArgumentParser(description="Republish an Obsidian vault into a Hugo site as notes change")
+    parser.add_argument("--vault", default=paths.get("obsidian_vault"),
+                        help="Obsidian vault to watch (default: configured vault)")
+    parser.add_argument("--site", default=paths.get("site_repo"),
+                        help="Hugo site repository (default: configured site repo)")
+    parser.add_argument("--debounce", type=float, default=DEFAULT_DEBOUNCE,
+                        help="Seconds of quiet before a burst of saves is published")
+    parser.add_argument("--poll", action="store_true", help="Poll the vault instead of using inotify")
+    parser.add_argument("--optimize-images", action="store_true",
+                        help="Ship resized WebP/AVIF variants instead of the original images")
+    parser.add_argument("--hardlink", action="store_true",
+                        help="Hardlink attachments into the site instead of copying them")
+    parser.add_argument("--shared-media", action="store_true",
+                        help="Store each embedded attachment once under static/media, named by its hash")
+    parser.add_argument("--serve", action="store_true", help="Run `hugo server` for a live local preview")
+    parser.add_argument("--trace", metavar="FILE",
+                        help="Write a Chrome trace of every batch to FILE and print a timing summary on exit")
+    args = parser.parse_args(argv)
+    if args.trace:
+        tracer.enable(args.trace)
+
+    if not args.vault or not os.path.isdir(args.vault):
+        parser.error("vault path does not exist, pass --vault")
+    if not args.site or not os.path.isdir(args.site):
+        parser.error("site repository does not exist, pass --site")
+
+    server = None
+    if args.serve:
+        server = subprocess.Popen(["hugo", "server", "--buildDrafts", "--source", args.site])
+    try:
+        watch(args.vault, args.site, args.debounce, args.poll,
+              ImageOptions() if args.optimize_images else None, ImageCache(), args.hardlink,
+              args.shared_media)
+    except KeyboardInterrupt:
+        print("Stopped watching")
+    finally:
+        if server is not None:
+            server.terminate()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
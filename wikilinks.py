@@ -0,0 +1,115 @@
+"""
+Single-pass rewriter for Obsidian wikilinks and embeds.
+
+Every ``[[...]]`` / ``![[...]]`` in a note is rewritten in one linear
+re.sub scan. Fenced and inline code is matched by the same pattern and
+passed through untouched. Supported forms:
+
+    ![[photo.png]]            image embed
+    ![[photo.png|300]]        image with a width (or 300x200) size hint
+    ![[photo.png|a caption]]  image with alt text
+    [[photo.png]]             legacy image link, rendered as an image
+    ![[paper.pdf]]            attachment, rendered as a link
+    [[Note]] [[Note|alias]]   note link
+    [[Note#Heading]]          note link to a heading ([[#Heading]] in-page)
+"""
+import re
+from urllib.parse import quote
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".gif", ".webp", ".svg")
+ATTACHMENT_EXTENSIONS = IMAGE_EXTENSIONS + (".pdf",)
+DEFAULT_ALT = "Image Description"
+
+TOKEN_RE = re.compile(
+    r"(?P<code>```.*?(?:```|\Z)|`[^`\n]*`)"
+    r"|(?P<embed>!?)\[\[(?P<inner>[^\[\]\n]+)\]\]",
+    re.DOTALL,
+)
+SIZE_RE = re.compile(r"^(\d+)(?:x(\d+))?$")
+
+
+def slugify(name: str) -> str:
+    """Turn a note title into a URL-safe post folder name"""
+    slug = re.sub(r"[^\w]+", "-", name.lower()).strip("-")
+    return slug or "untitled"
+
+
+def encode_url(path: str) -> str:
+    """URL-encode a bundle-relative path (spaces become %20)"""
+    return quote(path.replace("\\", "/"), safe="/#")
+
+
+def split_link(inner: str) -> tuple[str, str, str]:
+    """Split the inside of [[...]] into (target, heading, label)"""
+    target, _, label = inner.partition("|")
+    target, _, heading = target.partition("#")
+    return target.strip(), heading.strip().lstrip("^"), label.strip()
+
+
+def default_note_url(target: str, heading: str) -> str:
+    anchor = f"#{slugify(heading)}" if heading else ""
+    return f"../{slugify(target)}/{anchor}" if target else anchor
+
+
+class LinkRewriter:
+    """
+    Rewrites wikilinks with pluggable resolution.
+
+    ``resolve_attachment(name)`` returns the URL path an attachment is
+    published under (None leaves the link as-is); ``resolve_note(target,
+    heading)`` returns the URL of another note (None renders plain text);
+    ``render_image(target, alt, width, height)`` may return custom HTML for
+    an image embed (None falls back to markdown).
+    """
+
+    def __init__(self, resolve_attachment=None, resolve_note=None, render_image=None):
+        self.resolve_attachment = resolve_attachment or (lambda name: name)
+        self.resolve_note = resolve_note or default_note_url
+        self.render_image = render_image
+
+    def rewrite(self, content: str) -> tuple[str, list[str]]:
+        """Return the rewritten content and the attachments it references, in order"""
+        attachments = {}
+
+        def replace(match):
+            if match.group("code"):
+                return match.group(0)
+            target, heading, label = split_link(match.group("inner"))
+            if target.lower().endswith(ATTACHMENT_EXTENSIONS):
+                url = self.resolve_attachment(target)
+                if url is None:
+                    return match.group(0)
+                attachments.setdefault(target, None)
+                return self._render_attachment(target, encode_url(url), label)
+            return self._render_note(target, heading, label)
+
+        return TOKEN_RE.sub(replace, content), list(attachments)
+
+    def _render_attachment(self, target: str, url: str, label: str) -> str:
+        if not target.lower().endswith(IMAGE_EXTENSIONS):
+            return f"[{label or target.rsplit('/', 1)[-1]}]({url})"
+        size = SIZE_RE.match(label)
+        width, height = size.groups() if size else (None, None)
+        if self.render_image is not None:
+            html = self.render_image(target, DEFAULT_ALT if size else label or DEFAULT_ALT, width, height)
+            if html is not None:
+                return html
+        if size:
+            height_attr = f' height="{height}"' if height else ""
+            return f'<img src="{url}" alt="{DEFAULT_ALT}" width="{width}"{height_attr}>'
+        return f"![{label or DEFAULT_ALT}]({url})"
+
+    def _render_note(self, target: str, heading: str, label: str) -> str:
+        text = label or (f"{target} > {heading}" if target and heading else target or heading)
+        url = self.resolve_note(target, heading)
+        if url is None:
+            return text
+        return f"[{text}]({url})"
+
+
+def rewrite_links(content: str) -> tuple[str, list[str]]:
+    """Rewrite with the default resolvers: attachments sit next to index.md"""
+    return _default_rewriter.rewrite(content)
+
+
+_default_rewriter = LinkRewriter()